@@ -1,583 +1,1235 @@
-from flask import Flask, render_template_string, render_template , redirect, url_for, session, request, flash, jsonify
-from functools import wraps
-import smtplib
-import logging
-from email.mime.text import MIMEText
-from datetime import datetime
-from werkzeug.exceptions import BadRequest
-from werkzeug.security import generate_password_hash, check_password_hash
-import os
-import boto3
-import uuid
-
-
-# -------------------- Config --------------------
-
-app = Flask(__name__)
-app.secret_key = 'your_secret_key_here'
-
-# AWS configuration
-region = 'ap-south-1'  # Change if needed
-DYNAMODB_TABLE = 'PickleOrders'
-
-# Email settings
-EMAIL_HOST = 'smtp.@gmail.com'
-EMAIL_PORT = 587
-EMAIL_USER = '@gmail.com'
-EMAIL_PASSWORD = ""
-
-
-# -------------------- Logger Setup --------------------
-
-log_folder = 'logs'
-log_file = os.path.join(log_folder, 'app.log')
-
-if os.path.exists(log_folder):
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
-else:
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s'
-    )
-
-logger = logging.getLogger(__name__)
-
-# -------------------- AWS Setup --------------------
-
-dynamodb = boto3.resource('dynamodb', region_name=region)
-orders_table = dynamodb.Table(DYNAMODB_TABLE)
-users_table = dynamodb.Table('users')
-
-# SNS Setup
-
-sns = boto3.client('sns', region_name=region)
-
-# -------------------- Helper Functions --------------------
-
-def send_order_email(to_email, order_summary):
-    try:
-        msg = MIMEText(order_summary)
-        msg['Subject'] = 'Your Order Confirmation'
-        msg['From'] = EMAIL_USER
-        msg['To'] = to_email
-
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.send_message(msg)
-
-        logger.info("Order email sent to %s", to_email)
-    except Exception as e:
-        logger.error("Failed to send email: %s", e)
-def save_order_to_dynamodb(order_data):
-    try:
-        orders_table.put_item(Item=order_data)
-        logger.info("Order saved to DynamoDB: %s", order_data['order_id'])
-    except Exception as e:
-        logger.error("DynamoDB error: %s", e)
-
-def send_sns_notification(message, phone_number=None, topic_arn=None):
-    try:
-        if phone_number:
-            sns.publish(PhoneNumber=phone_number, Message=message)
-            logger.info(f"SNS SMS sent to {phone_number}")
-        elif topic_arn:
-            sns.publish(TopicArn=topic_arn, Message=message)
-            logger.info(f"SNS message published to topic {topic_arn}")
-        else:
-            logger.info("SNS notification skipped (no phone number or topic)")
-    except Exception as e:
-        logger.error("SNS send failed: %s", e)
-
-# DynamoDB tables
-contacts_table = dynamodb.Table('contacts')
-reviews_table = dynamodb.Table('reviews')
-
- # Simple in-memory user storage
-users = {}
-
-# Store reviews and contacts in files
-REVIEWS_FILE = 'reviews.txt'
-CONTACTS_FILE = 'contacts.txt'
-
-# Product List with Online Image URLs
-products = [
-    # Non-Veg Pickles
-    {
-        "id": 1,
-        "name": "chicken pickle",
-        "price": 350,
-        "image": "https://i0.wp.com/ahahomefoods.com/wp-content/uploads/2024/06/chicken-pickle-with-bone.jpeg?fit=2491%2C2560&ssl=1",
-        "description": "We sell authentic , Spicy, Meaty pickles . We are known for our soul melting taste and high quality and organic ingredients"
-    },
-    {
-        "id": 2,
-        "name": "Gongura Mutton Pickle",
-        "price": 320,
-        "image": "https://andhrapachallu.com/cdn/shop/files/Image-50-scaled.png?v=1721547061",
-        "description": "Similar to the chicken version, this pickle combines mutton with gongura."
-    },
-    {
-        "id": 3,
-        "name": "Boti Pickle",
-        "price": 400,
-        "image": "https://chefsarufoods.com/wp-content/uploads/2024/10/gongura-boti-product-image-scaled.jpg",
-        "description": "newly introduced pickle made with boti (tripe)."
-    },
-    {
-        "id": 4,
-        "name": "Fish Pickle",
-        "price": 380,
-        "image": "https://5.imimg.com/data5/ANDROID/Default/2022/1/ZG/CF/RB/145196166/product-jpeg-500x500.jpg",
-        "description": "Juicy fish pieces."
-    },
-
-    # Veg Pickles
-    {
-        "id": 5,
-        "name": "Mango Pickle",
-        "price": 280,
-        "image": "https://i0.wp.com/binjalsvegkitchen.com/wp-content/uploads/2024/04/Instant-Mango-Pickle-H1.jpg?resize=600%2C900&ssl=1",
-        "description": "A classic Andhra-style pickle made with raw mangoes, mustard seeds, and spices."
-    },
-    {
-        "id": 6,
-        "name": "Mixed Veg Pickle",
-        "price": 280,
-        "image": "https://s3-ap-south-1.amazonaws.com/betterbutterbucket-silver/divya-r20180620215346113.jpeg",
-        "description": "Carrot, cauliflower, lime and mango combo"
-    },
-    {
-        "id": 7,
-        "name": "Tomato Pickle",
-        "price": 250,
-        "image": "https://www.indianhealthyrecipes.com/wp-content/uploads/2020/06/tomato-pickle-recipe.jpg",
-        "description": "Ripe tomatoes with a blend of spices"
-    },
-    {
-        "id": 8,
-        "name": "Gongura Pickle",
-        "price": 220,
-        "image": "https://vellankifoods.com/cdn/shop/products/gongura_pickle_2.jpg?v=1680180278",
-        "description": "Tangy sorrel leaves with special spice"
-    },
-
-    # Snacks
-    {
-        "id": 9,
-        "name": "Madras Mixture",
-        "price": 230,
-        "image": "https://masalamonk.com/wp-content/uploads/2025/02/Unusual-Indian-Pickles.jpg",
-        "description": "A spicy and crunchy snack mix from South India."
-    },
-    {
-        "id": 10,
-        "name": "Murkku chakki",
-        "price": 300,
-        "image": "https://5.imimg.com/data5/SELLER/Default/2025/3/497746042/ZR/YQ/CF/67465829/muruk-condiments-500x500.pn",
-        "description": "Roasted murkku with delicious taste"
-    },
-    {
-        "id": 11,
-        "name": "Net Based Snacks",
-        "price": 220,
-        "image": "https://girijapaati.com/cdn/shop/collections/enh_classicribbon.jpg?v=1691556230",
-        "description": "Tasty GirijaPaati"
-    },
-    {
-        "id": 12,
-        "name": "Bombay Mixture",
-        "price": 150,
-        "image": "https://karaikaliyangars.com/cdn/shop/products/BombayMixture.jpg?v=1628014057",
-        "description": "Crunchy Bombay Mixture"
-    }
-]
-
-def login_required(f):
-    @wraps(f)
-    def wrapper(*args, **kwargs):
-        if 'username' not in session:
-            flash("Please log in to continue.", "error")
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return wrapper
-
-
-# Contact Page
-@app.route('/contact', methods=['GET', 'POST'])
-def contact():
-    if request.method == 'POST':
-        name = request.form['name']
-        email = request.form['email']
-        message = request.form['message']
-        with open(CONTACTS_FILE, 'a') as f:
-            f.write(f"{name} ({email}): {message}\n")
-        flash("Thank you for contacting us!", "success")
-        return redirect(url_for('contact'))
-    try:
-        with open(CONTACTS_FILE, 'r') as f:
-            contacts = f.readlines()
-    except FileNotFoundError:
-        contacts = []
-
-    return render_template_string("""
-    <body style="background-image: url('{{ url_for('static', filename='images/bg-new.jpg') }}');
-             background-size: contain;
-             background-position: top center;
-             background-repeat: no-repeat;
-             font-family: 'Open Sans', sans-serif;
-             padding: 40px 20px;">
-    <h2 style="color:#2c3e50;">Contact Us</h2>
-    <form method="POST">
-        Name: <input type="text" name="name" required><br><br>
-        Email: <input type="email" name="email" required><br><br>
-        Message: <br><textarea name="message" rows="5" cols="40" required></textarea><br><br>
-        <button type="submit">Send</button>
-    </form>
-    <ul style="list-style:none;">                              
-     {% for line in contacts %}
-    <li  style="margin-bottom:25px; padding:10px; background:#fff; border-radius:10px; box-shadow: 0 2px 6px rgba(0,0,0,0.1);">{{ line }}</li>
-    {% endfor %}
-    </ul>
-
-    <a href="{{ url_for('products_page') }}">⬅ Back to Products</a>
-    """,contacts=contacts)
-
-# Reviews Page
-@app.route('/reviews', methods=['GET', 'POST'])
-def product_reviews():
-    if request.method == 'POST':
-        user = session.get('username', 'Guest')
-        review = request.form['review']
-        reviews_table.put_item(Item={
-            'id': str(uuid.uuid4()),
-            'user': user,
-            'review': review
-         })
-        with open(REVIEWS_FILE, 'a') as f:
-            f.write(f"{user}: {review}\n")
-        flash("Thanks for your review!", "success")
-        return redirect(url_for('product_reviews'))
-   # DynamoDB doesn't support scan() without provisioned throughput in free tier well
-    reviews = []
-    try:
-        response = reviews_table.scan()
-        reviews = [item['user'] + ': ' + item['review'] for item in response.get('Items', [])]
-    except Exception as e:
-        reviews = ["Error fetching reviews: " + str(e)]
-
-
-    return render_template_string("""
-    <body style="background-image: url('{{ url_for('static', filename='images/bg-new.jpg') }}');
-             background-size: contain;
-             background-position: top center;
-             background-repeat: no-repeat;
-             font-family: 'Open Sans', sans-serif;
-             padding: 40px 20px;">
-    <h2 style="color:#2c3e50;">Leave a Review</h2>
-    <form method="POST">
-        <textarea name="review" rows="4" cols="50" placeholder="Write your review here..." required></textarea><br><br>
-        <button type="submit">Submit Review</button>
-    </form>
-    <h3 style="color:#34495e;">All Reviews</h3>
-    <ul style="list-style:none;" >
-    {% for r in reviews %}
-    <li style="margin-bottom:25px; padding:10px; background:#fff; border-radius:10px; box-shadow: 0 2px 6px rgba(0,0,0,0.1);"> {{ r }}</li>
-    {% endfor %}
-    </ul>
-    <a href="{{ url_for('products_page') }}">⬅ Back to Products</a>
-    """, reviews=reviews)
-
-@app.route('/about')
-def about():
-    return render_template('about.html')
-   
-@app.route('/')
-@login_required
-def products_page():
-    return render_template_string("""
-    <body style="background-image: url('{{ url_for('static', filename='images/bg-new.jpg') }}');
-             background-size: contain;
-             background-position: top center;
-             background-repeat: no-repeat;
-             font-family: 'Open Sans', sans-serif;
-             padding: 40px 20px;">
-    <h1 style="color:#2c3e50;">Welcome, {{ session['username'] }}!</h1>
-    <a href="{{ url_for('logout') }}">Logout</a><br><br>                             
-    <a href="{{ url_for('contact') }}">📬 Contact</a> |
-    <a href="{{ url_for('product_reviews') }}">⭐ Reviews</a> |
-    <a href="{{ url_for('about') }}"> ℹAbout</a><br><br>   
-                                                                          
-    <h2 style="color:#34495e;">Products</h2>
-    <ul style="list-style:none;">
-        {% for product in products %}
-        <li>
-            <img src="{{ product.image }}" width="100" style="border-radius:8px;"><br>
-            <b>{{ product.name }}</b><br>
-            ₹{{ product.price }}<br>
-            <a href="{{ url_for('add_to_cart', product_id=product.id) }}">Add to Cart</a>
-        </li><br>
-        {% endfor %}
-    </ul>
-    <a href="{{ url_for('cart') }}">Go to Cart</a>
-    """, products=products)
-
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    if request.method == 'POST':
-        username = request.form['username'].strip()
-        password = request.form['password'].strip()
-        if username in users:
-            flash("Username already exists.", "error")
-        elif not username or not password:
-            flash("Please enter both username and password.", "error")
-        else:
-            users[username] = password
-            flash("Registered successfully. Please login.", "success")
-            return redirect(url_for('login'))
-    return render_template_string("""
-    <body style="background-image: url('{{ url_for('static', filename='images/bg-new.jpg') }}');
-             background-size: contain;
-             background-position: top center;
-             background-repeat: no-repeat;
-             font-family: 'Open Sans', sans-serif;
-             padding: 40px 20px;">
-    <h2 style="color:#2c3e50;">Register</h2>
-    <form method="POST">
-        Username: <input type="text" name="username"><br><br>
-        Password: <input type="password" name="password"><br><br>
-        <button type="submit">Register</button>
-    </form>
-    <a href="{{ url_for('login') }}">Already registered? Login</a>
-    """)
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        username = request.form['username'].strip()
-        password = request.form['password'].strip()
-        if users.get(username) == password:
-            session['username'] = username
-            flash("Logged in successfully!", "success")
-            return redirect(url_for('products_page'))
-        else:
-            flash("Invalid username or password.", "error")
-    return render_template_string("""
-    <body style="background-image: url('{{ url_for('static', filename='images/bg-new.jpg') }}');
-             background-size: contain;
-             background-position: top center;
-             background-repeat: no-repeat;
-             font-family: 'Open Sans', sans-serif;
-             padding: 40px 20px;">                          
-    <h2 style="color:#2c3e50;">Login</h2>
-    <form method="POST">
-        Username: <input type="text" name="username"><br><br>
-        Password: <input type="password" name="password"><br><br>
-        <button type="submit">Login</button>
-    </form>
-    <a href="{{ url_for('register') }}">Don't have an account? Register</a>
-    """)
-
-@app.route('/logout')
-def logout():
-    session.clear()
-    flash("Logged out successfully.", "success")
-    return redirect(url_for('login'))
-
-@app.route('/add_to_cart/<int:product_id>')
-@login_required
-def add_to_cart(product_id):
-    product = next((p for p in products if p['id'] == product_id), None)
-    if not product:
-        flash('Product not found', 'error')
-        return redirect(url_for('products_page'))
-
-    cart = session.get('cart', {})
-    key = str(product_id)
-    cart[key] = cart.get(key, 0) + 1
-    session['cart'] = cart
-    session.modified = True
-    flash(f'{product["name"]} added to cart', 'success')
-    return redirect(url_for('products_page'))
-
-@app.route('/update_cart/<int:product_id>/<int:change>')
-@login_required
-def update_cart(product_id, change):
-    if change not in (-1, 1):
-        raise BadRequest("Invalid quantity change")
-
-    cart = session.get('cart', {})
-    key = str(product_id)
-
-    if key in cart:
-        cart[key] += change
-        if cart[key] <= 0:
-            del cart[key]
-    session['cart'] = cart
-    session.modified = True
-    return redirect(url_for('cart'))
-
-@app.route('/remove_from_cart/<int:product_id>')
-@login_required
-def remove_from_cart(product_id):
-    cart = session.get('cart', {})
-    key = str(product_id)
-    if key in cart:
-        del cart[key]
-    session['cart'] = cart
-    session.modified = True
-    return redirect(url_for('cart'))
-
-@app.route('/cart')
-@login_required
-def cart():
-    cart_items = []
-    subtotal = 0
-
-    for product_id, quantity in session.get('cart', {}).items():
-        product = next((p for p in products if p['id'] == int(product_id)), None)
-        if product:
-            item_total = product['price'] * quantity
-            cart_items.append({
-                'id': product['id'],
-                'name': product['name'],
-                'quantity': quantity,
-                'price': product['price'],
-                'image': product['image'],
-                'total': item_total
-            })
-            subtotal += item_total
-
-    shipping = 50 if subtotal > 0 else 0
-    total = subtotal + shipping
-
-    return render_template_string("""
-    <body style="background-image: url('{{ url_for('static', filename='images/bg-new.jpg') }}');
-             background-size: contain;
-             background-position: top center;
-             background-repeat: no-repeat;
-             font-family: 'Open Sans', sans-serif;
-             padding: 40px 20px;">                             
-    <h1 style="color:#2c3e50;">Your Cart ({{ session['username'] }})</h1>
-    <a href="{{ url_for('logout') }}">Logout</a><br><br>
-    {% if cart_items %}
-        <ul style="list-style:none;">
-        {% for item in cart_items %}
-            <li>
-                <img src="{{ item.image }}" width="100"><br>
-                {{ item.name }} (x{{ item.quantity }}) - ₹{{ item.total }}<br>
-                <a href="{{ url_for('update_cart', product_id=item.id, change=1) }}">➕</a>
-                <a href="{{ url_for('update_cart', product_id=item.id, change=-1) }}">➖</a>
-                <a href="{{ url_for('remove_from_cart', product_id=item.id) }}">🗑 Remove</a>
-            </li><br>
-        {% endfor %}
-        </ul>
-        <p>Subtotal: ₹{{ subtotal }}</p>
-        <p>Shipping: ₹{{ shipping }}</p>
-        <p><strong>Total: ₹{{ total }}</strong></p>
-        <br>
-        <a href="{{ url_for('checkout') }}">🛒 Proceed to Checkout</a><br>
-        <a href="{{ url_for('products_page') }}">⬅ Back to Products</a>
-    {% else %}
-        <p>Your cart is empty.</p>
-        <a href="{{ url_for('products_page') }}">⬅ Browse Products</a>
-    {% endif %}
-    """, cart_items=cart_items, subtotal=subtotal, shipping=shipping, total=total)
-
-@app.route('/checkout')
-@login_required
-def checkout():
-    cart_items = []
-    total = 0
-
-    for product_id, quantity in session.get('cart', {}).items():
-        product = next((p for p in products if p['id'] == int(product_id)), None)
-        if product:
-            cart_items.append({
-                'name': product['name'],
-                'quantity': quantity,
-                'items': cart,
-                'price': product['price']
-            })
-            total += product['price'] * quantity
-
-    return render_template_string("""
-    <body style="background-image: url('{{ url_for('static', filename='images/bg-new.jpg') }}');
-             background-size: contain;
-             background-position: top center;
-             background-repeat: no-repeat;
-             font-family: 'Open Sans', sans-serif;
-             padding: 40px 20px;">                              
-    <h1  style="color:#2c3e50;">Checkout</h1>
-    {% if cart_items %}
-        <ul style="list-style:none;">
-            {% for item in cart_items %}
-                <li>{{ item.name }} × {{ item.quantity }} — ₹{{ item.quantity * item.price }}</li>
-            {% endfor %}
-        </ul>
-        <p><strong>Total: ₹{{ total }}</strong></p>
-        <form method="POST" action="{{ url_for('place_order') }}">
-        Name:<input name="name"><br>
-        Address:<input name="address"><br>
-        email:<input name="email"><br>                         
-        phone:=<input name="phone"><br> action="{{ url_for('place_order') }}">
-        <button type="submit">✅ Place Order</button>
-        </form>
-    {% else %}
-        <p>Your cart is empty.</p>
-    {% endif %}
-     save_order_to_dynamodb(order_data)
-     send_order_email(email, summary)
-
-        # (Optional) SNS call is defined but not triggered here
-        # send_sns_notification("New order received.")
-
-    <a href="{{ url_for('cart') }}">← Back to Cart</a>
-    """, cart_items=cart_items, total=total)
-
-@app.route('/place_order', methods=['POST'])
-@login_required
-def place_order():
-    session['cart'] = {}
-    flash("🎉 Your order has been placed successfully!", "success")
-    session.pop('cart', None)
-    logger.info("Order placed and cart cleared.")
-    return redirect(url_for('order_success'))
-
-@app.route('/success')
-@login_required
-def order_success():
-    return render_template_string("""
-    <body style="background-image: url('{{ url_for('static', filename='images/bg-new.jpg') }}');
-             background-size: contain;
-             background-position: top center;
-             background-repeat: no-repeat;
-             font-family: 'Open Sans', sans-serif;
-             padding: 40px 20px;">                             
-    <h2>✅ Order Successful!</h2>
-    <p>Thank you for your order, {{ session['username'] }}! 😊</p>
-    <a href="{{ url_for('products_page') }}">← Back to Products</a><br>
-    <a href="{{ url_for('logout') }}">🚪 Logout</a>
-    """)
-
-# -------------------- Error Pages --------------------
-
-@app.errorhandler(404)
-def not_found_error(e):
-    return render_template('404.html'), 404
-
-@app.errorhandler(500)
-def internal_error(e):
-    return render_template('500.html'), 500
-
-
-
-if __name__ == '__main__':
-    app.run(debug=False, host='0.0.0.0', port=int(os.environ.get("PORT",5000)))
\ No newline at end of file
+from flask import Flask, render_template , redirect, url_for, session, request, flash, jsonify, g, has_request_context
+from flask import before_render_template, template_rendered
+from functools import partial, wraps
+import atexit
+import logging
+import math
+from datetime import date, datetime, timedelta
+from werkzeug.exceptions import BadRequest, Forbidden
+from werkzeug.middleware.proxy_fix import ProxyFix
+import hmac
+import os
+import random
+import signal
+import sys
+import threading
+import time
+import uuid
+
+from catalog import Catalog
+from catalog_io import CatalogWatcher
+from pricing import PricingEngine, load_rules
+from search import InvalidQuery, SearchIndex
+from template_registry import init_templates, render_page, stream_fragment, stream_page
+from assets import init_assets
+from compression import CompressionMiddleware
+from response_cache import ResponseCache, conditional_response, make_etag, with_validators
+from reviews import REVIEWS_INDEX, InvalidCursor, ReviewStore
+from ratings import InvalidRating, RatingAggregates, parse_rating
+from notifications import NotificationDispatcher, SMTPConnection
+from orders import ORDERS_BY_USER_INDEX, InvalidCursor as InvalidOrderCursor, OrderClaims, OrderHistory, OrderWriter
+from sales import SalesRollups
+from inventory import EXPIRY_INDEX, Inventory, OutOfStock, ReservationConflict
+from local_store import open_store
+from cart_store import CartStore, SQLiteCartBackend
+from users import AttemptThrottle, DynamoUserBackend, LoginBusy, SQLiteUserBackend, UserStore
+from aws import AWSClients
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from profiler import StackSampler
+from log_pipeline import ContextFilter, LogPipeline, SamplingFilter, build_handlers
+from markupsafe import Markup
+
+
+# -------------------- Config --------------------
+
+app = Flask(__name__)
+app.secret_key = 'your_secret_key_here'
+
+# Rendered pages/fragments that change rarely (seconds)
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+
+# Optional on-disk Jinja bytecode cache so cold workers skip compiling templates
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR')
+
+# AWS configuration
+region = 'ap-south-1'  # Change if needed
+DYNAMODB_TABLE = 'PickleOrders'
+# Point DynamoDB/SNS at a local endpoint (e.g. http://localhost:8000 for
+# DynamoDB Local), or "inprocess" for the in-memory stand-ins in local_aws
+AWS_ENDPOINT_URL = os.environ.get('AWS_ENDPOINT_URL') or None
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 50))
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', 5))
+
+# Email settings (override with env vars, e.g. a local SMTP sink on localhost:1025)
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.@gmail.com')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+EMAIL_USER = os.environ.get('EMAIL_USER', '@gmail.com')
+EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD', "")
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '1') != '0'
+
+# Background notification workers
+NOTIFY_WORKERS = int(os.environ.get('NOTIFY_WORKERS', 2))
+NOTIFY_QUEUE_SIZE = int(os.environ.get('NOTIFY_QUEUE_SIZE', 1000))
+NOTIFY_DEAD_LETTER_FILE = os.environ.get('NOTIFY_DEAD_LETTER_FILE', 'notifications_dead_letter.jsonl')
+ORDER_TOPIC_ARN = os.environ.get('ORDER_TOPIC_ARN')
+
+# Local contact/review storage: sqlite:///path or file://directory
+LOCAL_STORE_URL = os.environ.get('LOCAL_STORE_URL', 'sqlite:///local_store.db')
+
+# List page sizes; pages stream, so large pages cost memory only per chunk
+CONTACTS_PAGE_SIZE = int(os.environ.get('CONTACTS_PAGE_SIZE', 50))
+REVIEWS_PAGE_SIZE = int(os.environ.get('REVIEWS_PAGE_SIZE', 20))
+ORDERS_PAGE_SIZE = int(os.environ.get('ORDERS_PAGE_SIZE', 20))
+
+# Catalog snapshot written by "python catalog_io.py import"; workers check it
+# for changes every CATALOG_RELOAD_INTERVAL seconds. Until the first import
+# the products list below is the catalog.
+CATALOG_FILE = os.environ.get('CATALOG_FILE', 'catalog.jsonl')
+CATALOG_RELOAD_INTERVAL = float(os.environ.get('CATALOG_RELOAD_INTERVAL', 5))
+
+# Discounts, coupons and shipping (a JSON list of rules, see pricing.py);
+# without it shipping is a flat ₹50
+PRICING_RULES_FILE = os.environ.get('PRICING_RULES_FILE')
+
+# Seconds between re-reads of the product rating aggregates written by other workers
+RATINGS_REFRESH_INTERVAL = float(os.environ.get('RATINGS_REFRESH_INTERVAL', 30))
+
+# Usernames allowed to see the sales dashboard (comma separated)
+ADMIN_USERS = frozenset(name.strip() for name in os.environ.get('ADMIN_USERS', '').split(',') if name.strip())
+
+# Seconds each background queue (orders, notifications) gets to drain on shutdown
+DRAIN_TIMEOUT = float(os.environ.get('DRAIN_TIMEOUT', 20))
+
+# Response compression for text bodies of at least COMPRESS_MIN_BYTES
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+
+# Server-side cart storage (SQLite, shared by all workers on the host)
+CART_DB_PATH = os.environ.get('CART_DB_PATH', 'carts.db')
+# Carts not written for this long are deleted (default: the session lifetime)
+CART_MAX_AGE = float(os.environ.get('CART_MAX_AGE', app.permanent_session_lifetime.total_seconds()))
+CART_SWEEP_INTERVAL = float(os.environ.get('CART_SWEEP_INTERVAL', 3600))
+
+# Users: "dynamodb" (users table) or sqlite:///path as a local fallback
+USER_STORE_URL = os.environ.get('USER_STORE_URL', 'dynamodb')
+# werkzeug hash spec; raise the work factor here (e.g. pbkdf2:sha256:600000)
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+LOGIN_ATTEMPTS_PER_IP = int(os.environ.get('LOGIN_ATTEMPTS_PER_IP', 30))
+LOGIN_FAILURES_PER_USER = int(os.environ.get('LOGIN_FAILURES_PER_USER', 5))
+# Reverse proxies / load balancers in front of the app that append to
+# X-Forwarded-For; 0 trusts none and uses the socket peer as the client
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+
+# Write-behind order persistence
+ORDER_JOURNAL_DIR = os.environ.get('ORDER_JOURNAL_DIR', 'order_journal')
+ORDER_JOURNAL_FSYNC = os.environ.get('ORDER_JOURNAL_FSYNC', '0') == '1'
+# How long a checkout's idempotency key stays claimed (order_claims TTL)
+ORDER_CLAIM_TTL = int(os.environ.get('ORDER_CLAIM_TTL', 7 * 24 * 3600))
+
+# Stock: units each worker takes from the inventory table per refill, how
+# long an unused pool is kept, and how long a cart holds its units
+INVENTORY_BATCH_SIZE = int(os.environ.get('INVENTORY_BATCH_SIZE', 20))
+INVENTORY_POOL_IDLE = float(os.environ.get('INVENTORY_POOL_IDLE', 2.0))
+RESERVATION_TTL = int(os.environ.get('RESERVATION_TTL', 15 * 60))
+
+# Per-request stack sampling, written to PROFILE_DIR as collapsed stacks:
+# PROFILE_SAMPLE_RATE profiles that fraction of all requests; with
+# PROFILE_TOKEN set, any request sent with "X-Profile: <token>" is profiled
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+
+
+# -------------------- Logger Setup --------------------
+
+log_folder = 'logs'
+log_file = os.path.join(log_folder, 'app.log')
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # or "text"
+# "external" (logrotate moves logs/app.log, workers reopen it) or "size"
+# (rotate in-process; only safe with a single process, e.g. python app.py)
+LOG_ROTATION = os.environ.get('LOG_ROTATION', 'external')
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+LOG_CONSOLE = os.environ.get('LOG_CONSOLE', '1') != '0'
+# Fraction of routine per-order lines kept; warnings and errors are never sampled
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.1))
+# Fraction of per-request access lines kept (0 turns them off)
+ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE', 1.0))
+
+SAMPLED_LOG_MESSAGES = (
+    "Order placed and cart cleared.",
+    "Order accepted: %s",
+    "Order email queued for %s",
+    "SNS notification queued",
+    "SNS notification skipped (no phone number or topic)",
+    "Flushed %d orders to DynamoDB in %.1f ms",
+)
+
+def _log_context():
+    if has_request_context() and 'request_id' in g:
+        return {'request_id': g.request_id}
+    return {}
+
+sample_rates = dict.fromkeys(SAMPLED_LOG_MESSAGES, LOG_SAMPLE_RATE)
+sample_rates["%s %s -> %s"] = ACCESS_LOG_SAMPLE_RATE
+log_pipeline = LogPipeline(
+    build_handlers(
+        log_file if os.path.exists(log_folder) else None,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+        console=LOG_CONSOLE,
+        json_format=LOG_FORMAT == 'json',
+        rotation=LOG_ROTATION
+    ),
+    level=LOG_LEVEL,
+    filters=[ContextFilter(_log_context), SamplingFilter(sample_rates)]
+).start()
+atexit.register(log_pipeline.stop)
+
+logger = logging.getLogger(__name__)
+
+# -------------------- AWS Setup --------------------
+
+# Clients are created on first use (or in gunicorn's post_fork pre-warm),
+# so importing the app never resolves endpoints
+aws = AWSClients(
+    region,
+    endpoint_url=AWS_ENDPOINT_URL,
+    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+    max_attempts=AWS_MAX_ATTEMPTS,
+    table_schemas={
+        DYNAMODB_TABLE: ('order_id', None, {ORDERS_BY_USER_INDEX: ('username', 'created_at')}),
+        'order_claims': ('order_id', None, None),
+        'users': ('username', None, None),
+        'contacts': ('id', None, None),
+        'reviews': ('id', None, {REVIEWS_INDEX: ('feed', 'created_at')}),
+        'product_ratings': ('product_id', None, None),
+        'inventory': ('product_id', None, None),
+        'sales_rollups': ('day', 'product_id', None),
+        'stock_reservations': ('cart_id', 'product_id', {EXPIRY_INDEX: ('expiry_bucket', 'expires_at')}),
+    }
+)
+orders_table = aws.table(DYNAMODB_TABLE)
+users_table = aws.table('users')
+
+# SNS Setup
+
+sns = aws.lazy_client('sns')
+
+
+def prewarm_aws():
+    aws.prewarm(tables=(DYNAMODB_TABLE, 'order_claims', 'users', 'contacts', 'reviews', 'product_ratings', 'inventory',
+                        'stock_reservations', 'sales_rollups'), clients=('sns',))
+
+# -------------------- Metrics --------------------
+
+metrics = Registry()
+request_latency = metrics.histogram(
+    'http_request_duration_seconds', 'Time to build the response, by route', ('route', 'method', 'status'))
+call_latency = metrics.histogram(
+    'storefront_call_duration_seconds', 'Time spent in instrumented I/O calls', ('call',))
+render_latency = metrics.histogram(
+    'template_render_duration_seconds', 'Jinja render time per template', ('template',))
+cart_operations = metrics.counter('cart_operations_total', 'Cart mutations by kind', ('operation',))
+orders_placed = metrics.counter('orders_total', 'Order submissions by outcome', ('outcome',))
+stock_shortages = metrics.counter('stock_shortages_total', 'Cart or order changes refused for lack of stock',
+                                  ('stage',))
+
+# -------------------- Helper Functions --------------------
+
+@metrics.timed(call_latency, call='send_order_email')
+def send_order_email(to_email, order_summary):
+    # Queued; a notifier worker delivers it over its pooled SMTP connection
+    if notifier.email(to_email, 'Your Order Confirmation', order_summary):
+        logger.info("Order email queued for %s", to_email)
+
+@metrics.timed(call_latency, call='save_order_to_dynamodb')
+def save_order_to_dynamodb(order_data):
+    # Journaled locally, then written to DynamoDB in batches by order_writer
+    try:
+        if order_writer.submit(order_data):
+            logger.info("Order accepted: %s", order_data['order_id'])
+            return True
+        logger.info("Duplicate order submission ignored: %s", order_data['order_id'])
+    except Exception as e:
+        logger.error("Order could not be accepted: %s", e)
+    return False
+
+@metrics.timed(call_latency, call='send_sns_notification')
+def send_sns_notification(message, phone_number=None, topic_arn=None):
+    if not phone_number and not topic_arn:
+        logger.info("SNS notification skipped (no phone number or topic)")
+        return
+    if notifier.sns(message, phone_number=phone_number, topic_arn=topic_arn):
+        logger.info("SNS notification queued")
+
+# -------------------- Orders --------------------
+
+order_writer = OrderWriter(orders_table, ORDER_JOURNAL_DIR, fsync=ORDER_JOURNAL_FSYNC)
+
+def stop_order_writer(timeout=30):
+    order_writer.stop(timeout)
+    # Rollup deltas whose update failed are otherwise only retried with the next batch
+    sales_rollups.flush()
+
+atexit.register(stop_order_writer)
+order_claims = OrderClaims(aws.table('order_claims'), ttl_seconds=ORDER_CLAIM_TTL)
+order_history = OrderHistory(orders_table, page_size=ORDERS_PAGE_SIZE)
+
+# Revenue and units per product per day, updated from each flushed batch
+sales_rollups = SalesRollups(aws.table('sales_rollups'))
+order_writer.on_flush(sales_rollups.apply)
+
+# -------------------- Inventory --------------------
+
+inventory = Inventory(
+    aws.table('inventory'),
+    aws.table('stock_reservations'),
+    batch_size=INVENTORY_BATCH_SIZE,
+    pool_idle=INVENTORY_POOL_IDLE,
+    reservation_ttl=RESERVATION_TTL
+)
+atexit.register(inventory.stop)
+
+# -------------------- Notifications --------------------
+
+notifier = NotificationDispatcher(
+    smtp_factory=lambda: SMTPConnection(EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD, use_tls=EMAIL_USE_TLS),
+    sns_client=sns,
+    sender=EMAIL_USER,
+    workers=NOTIFY_WORKERS,
+    queue_size=NOTIFY_QUEUE_SIZE,
+    dead_letter_file=NOTIFY_DEAD_LETTER_FILE
+)
+atexit.register(notifier.stop)
+
+# DynamoDB tables
+contacts_table = aws.table('contacts')
+reviews_table = aws.table('reviews')
+review_store = ReviewStore(reviews_table, page_size=REVIEWS_PAGE_SIZE)
+
+# Hashed credentials in DynamoDB (or a local SQLite file)
+if USER_STORE_URL.startswith('sqlite:///'):
+    user_backend = SQLiteUserBackend(USER_STORE_URL[len('sqlite:///'):])
+else:
+    user_backend = DynamoUserBackend(users_table)
+user_store = UserStore(user_backend, hash_method=PASSWORD_HASH_METHOD, hash_workers=PASSWORD_HASH_WORKERS)
+
+# Per-IP limit on all attempts, per-user limit on failures
+login_throttle_ip = AttemptThrottle(limit=LOGIN_ATTEMPTS_PER_IP, window=60)
+login_throttle_user = AttemptThrottle(limit=LOGIN_FAILURES_PER_USER, window=300)
+
+# Contacts and a local copy of reviews ("python local_store.py migrate"
+# imports the old contacts.txt / reviews.txt files)
+local_store = open_store(LOCAL_STORE_URL)
+
+# Server-side carts shared by all workers
+cart_store = CartStore(SQLiteCartBackend(CART_DB_PATH), max_age=CART_MAX_AGE, sweep_interval=CART_SWEEP_INTERVAL)
+
+# Product List with Online Image URLs
+products = [
+    # Non-Veg Pickles
+    {
+        "id": 1,
+        "category": "nonveg",
+        "name": "chicken pickle",
+        "price": 350,
+        "image": "https://i0.wp.com/ahahomefoods.com/wp-content/uploads/2024/06/chicken-pickle-with-bone.jpeg?fit=2491%2C2560&ssl=1",
+        "description": "We sell authentic , Spicy, Meaty pickles . We are known for our soul melting taste and high quality and organic ingredients"
+    },
+    {
+        "id": 2,
+        "category": "nonveg",
+        "name": "Gongura Mutton Pickle",
+        "price": 320,
+        "image": "https://andhrapachallu.com/cdn/shop/files/Image-50-scaled.png?v=1721547061",
+        "description": "Similar to the chicken version, this pickle combines mutton with gongura."
+    },
+    {
+        "id": 3,
+        "category": "nonveg",
+        "name": "Boti Pickle",
+        "price": 400,
+        "image": "https://chefsarufoods.com/wp-content/uploads/2024/10/gongura-boti-product-image-scaled.jpg",
+        "description": "newly introduced pickle made with boti (tripe)."
+    },
+    {
+        "id": 4,
+        "category": "nonveg",
+        "name": "Fish Pickle",
+        "price": 380,
+        "image": "https://5.imimg.com/data5/ANDROID/Default/2022/1/ZG/CF/RB/145196166/product-jpeg-500x500.jpg",
+        "description": "Juicy fish pieces."
+    },
+
+    # Veg Pickles
+    {
+        "id": 5,
+        "category": "veg",
+        "name": "Mango Pickle",
+        "price": 280,
+        "image": "https://i0.wp.com/binjalsvegkitchen.com/wp-content/uploads/2024/04/Instant-Mango-Pickle-H1.jpg?resize=600%2C900&ssl=1",
+        "description": "A classic Andhra-style pickle made with raw mangoes, mustard seeds, and spices."
+    },
+    {
+        "id": 6,
+        "category": "veg",
+        "name": "Mixed Veg Pickle",
+        "price": 280,
+        "image": "https://s3-ap-south-1.amazonaws.com/betterbutterbucket-silver/divya-r20180620215346113.jpeg",
+        "description": "Carrot, cauliflower, lime and mango combo"
+    },
+    {
+        "id": 7,
+        "category": "veg",
+        "name": "Tomato Pickle",
+        "price": 250,
+        "image": "https://www.indianhealthyrecipes.com/wp-content/uploads/2020/06/tomato-pickle-recipe.jpg",
+        "description": "Ripe tomatoes with a blend of spices"
+    },
+    {
+        "id": 8,
+        "category": "veg",
+        "name": "Gongura Pickle",
+        "price": 220,
+        "image": "https://vellankifoods.com/cdn/shop/products/gongura_pickle_2.jpg?v=1680180278",
+        "description": "Tangy sorrel leaves with special spice"
+    },
+
+    # Snacks
+    {
+        "id": 9,
+        "category": "snacks",
+        "name": "Madras Mixture",
+        "price": 230,
+        "image": "https://masalamonk.com/wp-content/uploads/2025/02/Unusual-Indian-Pickles.jpg",
+        "description": "A spicy and crunchy snack mix from South India."
+    },
+    {
+        "id": 10,
+        "category": "snacks",
+        "name": "Murkku chakki",
+        "price": 300,
+        "image": "https://5.imimg.com/data5/SELLER/Default/2025/3/497746042/ZR/YQ/CF/67465829/muruk-condiments-500x500.png",
+        "description": "Roasted murkku with delicious taste"
+    },
+    {
+        "id": 11,
+        "category": "snacks",
+        "name": "Net Based Snacks",
+        "price": 220,
+        "image": "https://girijapaati.com/cdn/shop/collections/enh_classicribbon.jpg?v=1691556230",
+        "description": "Tasty GirijaPaati"
+    },
+    {
+        "id": 12,
+        "category": "snacks",
+        "name": "Bombay Mixture",
+        "price": 150,
+        "image": "https://karaikaliyangars.com/cdn/shop/products/BombayMixture.jpg?v=1628014057",
+        "description": "Crunchy Bombay Mixture"
+    }
+]
+
+catalog = Catalog(products)
+catalog_watcher = CatalogWatcher(catalog, CATALOG_FILE, interval=CATALOG_RELOAD_INTERVAL)
+catalog_watcher.check()
+atexit.register(catalog_watcher.stop)
+product_search = SearchIndex(catalog)
+
+DEFAULT_PRICING_RULES = [{'id': 'standard-shipping', 'kind': 'shipping', 'amount': 50}]
+pricing = PricingEngine(catalog, load_rules(PRICING_RULES_FILE) if PRICING_RULES_FILE else DEFAULT_PRICING_RULES)
+# Review count and average stars per product, kept in memory beside the catalog
+product_ratings = RatingAggregates(aws.table('product_ratings'), refresh_interval=RATINGS_REFRESH_INTERVAL)
+
+# -------------------- Response Cache --------------------
+
+response_cache = ResponseCache(max_entries=256, ttl=RESPONSE_CACHE_TTL)
+
+@catalog.on_change
+@product_ratings.on_change
+def invalidate_product_grid(_source):
+    response_cache.invalidate('product_grid')
+
+# -------------------- Instrumentation --------------------
+
+metrics.gauge('order_queue_depth', 'Orders accepted but not yet in DynamoDB',
+              lambda: order_writer.stats()['queue_depth'])
+metrics.counter_func('order_flush_errors_total', 'Failed DynamoDB batch writes', lambda: order_writer.flush_errors)
+metrics.gauge('order_flush_latency_avg_seconds', 'Mean DynamoDB batch write time',
+              lambda: order_writer.stats()['flush_latency_avg_ms'] / 1e3)
+metrics.gauge('order_flush_latency_max_seconds', 'Slowest DynamoDB batch write',
+              lambda: order_writer.stats()['flush_latency_max_ms'] / 1e3)
+metrics.gauge('notification_queue_depth', 'Emails and SNS messages waiting', lambda: notifier.queue_depth())
+metrics.counter_func('notifications_sent_total', 'Notifications delivered by this worker', lambda: notifier.sent)
+metrics.counter_func('notifications_failed_total', 'Notifications dead-lettered by this worker', lambda: notifier.failed)
+metrics.counter_func('response_cache_hits_total', 'Response cache hits', lambda: response_cache.hits)
+metrics.counter_func('response_cache_misses_total', 'Response cache misses', lambda: response_cache.misses)
+metrics.gauge('catalog_products', "Products in this worker's catalog", lambda: len(catalog))
+metrics.counter_func('catalog_reloads_total', 'Catalog snapshots applied by this worker', lambda: catalog_watcher.reloads)
+metrics.counter_func('pricing_memo_hits_total', 'Cart quotes reused for an unchanged cart', lambda: pricing.hits)
+metrics.counter_func('pricing_memo_misses_total', 'Carts priced from scratch', lambda: pricing.misses)
+metrics.gauge('inventory_pooled_units', 'Units this worker has taken from the inventory table but not reserved',
+              lambda: inventory.stats()['pooled_units'])
+metrics.counter_func('inventory_refills_total', 'Batched takes from the inventory table', lambda: inventory.pool.refills)
+metrics.counter_func('carts_expired_total', 'Abandoned carts deleted by this worker', lambda: cart_store.expired)
+metrics.counter_func('inventory_expired_reservations_total', 'Cart reservations returned to stock by this worker',
+                     lambda: inventory.expired)
+
+_render_started = threading.local()
+
+@before_render_template.connect_via(app)
+def _start_render_timer(sender, template, context, **extra):
+    _render_started.__dict__.setdefault('stack', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def _stop_render_timer(sender, template, context, **extra):
+    started = _render_started.stack.pop()
+    render_latency.observe(time.perf_counter() - started, template=template.name)
+
+def _profile_requested():
+    if PROFILE_TOKEN and hmac.compare_digest(request.headers.get('X-Profile', ''), PROFILE_TOKEN):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    catalog_watcher.start()
+    # Reuse the caller's id (load balancer, upstream service) so log lines correlate
+    request_id = request.headers.get('X-Request-ID', '')
+    g.request_id = request_id if 0 < len(request_id) <= 64 and request_id.isprintable() else uuid.uuid4().hex
+    # Drop timers orphaned by a render that raised
+    _render_started.stack = []
+    if (PROFILE_TOKEN or PROFILE_SAMPLE_RATE) and _profile_requested():
+        g.profiler = StackSampler(interval=PROFILE_INTERVAL_MS / 1e3).start()
+
+def _finish_request(started, profiler, route, method, path, status, endpoint, request_id):
+    """Record the request's latency and access line, and save its profile; returns the profile's sample count."""
+    if started is not None:
+        duration = time.perf_counter() - started
+        request_latency.observe(duration, route=route, method=method, status=status)
+        logger.info("%s %s -> %s", method, path, status,
+                    extra={'route': route, 'status': status, 'duration_ms': round(duration * 1e3, 3),
+                           'request_id': request_id})
+    if profiler is None:
+        return None
+    dump = profiler.stop().dump(PROFILE_DIR, endpoint or 'unmatched')
+    logger.info("Profiled %s %s: %d samples in %.1f ms -> %s",
+                method, path, profiler.samples, profiler.elapsed * 1e3, dump, extra={'request_id': request_id})
+    return profiler.samples
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    finish = partial(
+        _finish_request, g.pop('request_started', None), g.pop('profiler', None),
+        request.url_rule.rule if request.url_rule else 'unmatched', request.method, request.path,
+        response.status_code, request.endpoint, g.get('request_id'))
+    if response.is_streamed:
+        # Streamed pages render while the body is sent, after this hook;
+        # time them until the server closes the response
+        response.call_on_close(finish)
+        return response
+    samples = finish()
+    if samples is not None:
+        response.headers['X-Profile-Samples'] = str(samples)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return metrics.exposition(), 200, {'Content-Type': METRICS_CONTENT_TYPE, 'Cache-Control': 'no-store'}
+
+def login_required(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if 'username' not in session:
+            flash("Please log in to continue.", "error")
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    return wrapper
+
+def admin_required(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if session.get('username') not in ADMIN_USERS:
+            raise Forbidden()
+        return f(*args, **kwargs)
+    return wrapper
+
+
+# -------------------- Cart Helpers --------------------
+
+# The session cookie only carries the cart id and the version last written;
+# the items live in cart_store
+
+def get_cart():
+    cart_id = session.get('cart_id')
+    if not cart_id:
+        return {}
+    return cart_store.get(cart_id, session.get('cart_v'))
+
+def price_current_cart(coupon=None):
+    """This session's cart priced with its coupon; reused until the cart, rules or catalog change."""
+    coupon = coupon or session.get('coupon')
+    cart_id = session.get('cart_id')
+    if not cart_id:
+        return pricing.quote({}, coupon)
+    version, items = cart_store.load(cart_id, session.get('cart_v'))
+    return pricing.quote(items, coupon, cart_key=(cart_id, version))
+
+def current_cart_id():
+    cart_id = session.get('cart_id')
+    if not cart_id:
+        cart_id = session['cart_id'] = uuid.uuid4().hex
+    return cart_id
+
+def change_cart(mutator):
+    cart_id = current_cart_id()
+    version, items = cart_store.mutate(cart_id, mutator, session.get('cart_v'))
+    session['cart_v'] = version
+    return items
+
+def discard_cart():
+    # Ids are never reused, so other workers' cached copies can't be mistaken for a new cart
+    cart_id = session.pop('cart_id', None)
+    session.pop('cart_v', None)
+    session.pop('coupon', None)
+    if cart_id:
+        cart_store.clear(cart_id)
+
+def reserve_stock(quantities):
+    """Hold stock for new cart line quantities ({product_id: qty}) before the cart changes.
+
+    On a shortage, or a concurrent change to the same reservation, the
+    lines already re-held go back to their old quantities and OutOfStock
+    or ReservationConflict propagates.
+    """
+    cart_id = current_cart_id()
+    current = get_cart()
+    done = []
+    try:
+        for key, quantity in quantities.items():
+            inventory.hold(cart_id, int(key), quantity)
+            done.append(key)
+    except (OutOfStock, ReservationConflict):
+        for key in done:
+            inventory.hold(cart_id, int(key), current.get(key, 0))
+        raise
+
+CART_CONFLICT_MESSAGE = "Your cart was being changed elsewhere at the same time. Please try again."
+
+def shortage_message(e):
+    product = catalog.get(e.product_id)
+    name = product['name'] if product else 'This product'
+    if e.available <= 0:
+        return f'Sorry, {name} is sold out.'
+    return f'Sorry, only {e.available} more {name} available.'
+
+
+# Contact Page
+@app.route('/contact', methods=['GET', 'POST'])
+def contact():
+    if request.method == 'POST':
+        name = request.form['name']
+        email = request.form['email']
+        message = request.form['message']
+        local_store.append('contacts', f"{name} ({email}): {message}")
+        flash("Thank you for contacting us!", "success")
+        return redirect(url_for('contact'))
+    try:
+        contacts, next_cursor = local_store.latest('contacts', limit=CONTACTS_PAGE_SIZE, cursor=request.args.get('cursor'))
+    except ValueError:
+        raise BadRequest("Invalid cursor")
+
+    return stream_page('contact', contacts=contacts, next_cursor=next_cursor)
+
+def review_line(item):
+    if 'product_id' not in item or 'rating' not in item:
+        return item['user'] + ': ' + item['review']
+    product = catalog.get(int(item['product_id']))
+    name = product['name'] if product else 'a discontinued product'
+    rating = int(item['rating'])
+    return f"{item['user']} rated {name} {'★' * rating}{'☆' * (5 - rating)}: {item['review']}"
+
+# Reviews Page
+@app.route('/reviews', methods=['GET', 'POST'])
+def product_reviews():
+    if request.method == 'POST':
+        user = session.get('username', 'Guest')
+        review = request.form['review']
+        # Reviews without a product are shop-wide comments and carry no rating
+        rated = {}
+        if request.form.get('product_id'):
+            try:
+                product_id = int(request.form['product_id'])
+                rated = {'product_id': product_id, 'rating': parse_rating(request.form.get('rating'))}
+            except (InvalidRating, ValueError):
+                raise BadRequest("Choose a product and a rating from 1 to 5")
+            if catalog.get(product_id) is None:
+                raise BadRequest("Unknown product")
+        with call_latency.time(call='reviews_write'):
+            review_store.add(user, review, **rated)
+            if rated:
+                product_ratings.record(rated['product_id'], rated['rating'])
+        local_store.append('reviews', review_line(dict(rated, user=user, review=review)))
+        response_cache.invalidate('review_list')
+        flash("Thanks for your review!", "success")
+        return redirect(url_for('product_reviews'))
+
+    cursor = request.args.get('cursor')
+    # Only the newest page is shared between visitors, so only it is cached
+    fragment = None if cursor else response_cache.get('review_list')
+    if fragment is None:
+        reservation = None if cursor else response_cache.reserve('review_list')
+        try:
+            with call_latency.time(call='reviews_read'):
+                items, next_cursor = review_store.page(cursor)
+        except InvalidCursor:
+            raise BadRequest("Invalid cursor")
+        except Exception as e:
+            # Errors are rendered but never cached
+            reviews = ["Error fetching reviews: " + str(e)]
+            return render_page('reviews', products=catalog.all(),
+                               review_list=[Markup(render_page('_review_list', reviews=reviews))])
+
+        reviews = (review_line(item) for item in items)
+        review_list = stream_fragment('_review_list', reviews=reviews, next_cursor=next_cursor)
+        if cursor:
+            return stream_page('reviews', products=catalog.all(), review_list=review_list)
+        review_list = response_cache.tee('review_list', review_list, reservation, ttl=review_store.refresh_interval)
+        return with_validators(stream_page('reviews', products=catalog.all(), review_list=review_list),
+                               make_etag(reservation.etag, catalog.version), reservation.last_modified)
+
+    # The page also lists the catalog in its product picker
+    return conditional_response(
+        make_etag(fragment.etag, catalog.version), fragment.last_modified,
+        lambda: stream_page('reviews', products=catalog.all(), review_list=[Markup(fragment.body)])
+    )
+
+@app.route('/about')
+def about():
+    page = response_cache.get_or_render('about', lambda: render_template('about.html'))
+    return conditional_response(page.etag, page.last_modified, lambda: page.body, private=False)
+   
+@app.route('/')
+@login_required
+def products_page():
+    # Re-reads other workers' rating counts when due; a change drops the cached grid
+    product_ratings.refresh()
+    grid = response_cache.get('product_grid')
+    if grid is None:
+        # Stream the grid into the page as it renders; it is cached for the next visitor
+        reservation = response_cache.reserve('product_grid')
+        chunks = response_cache.tee('product_grid', stream_fragment(
+            '_product_grid', products=catalog.all(), ratings=product_ratings.summaries()), reservation)
+        return with_validators(stream_page('products', product_grid=chunks),
+                               make_etag(reservation.etag, session['username']), reservation.last_modified)
+    # The grid is shared; only the welcome header is filled in per user
+    return conditional_response(
+        make_etag(grid.etag, session['username']), grid.last_modified,
+        lambda: stream_page('products', product_grid=[Markup(grid.body)])
+    )
+
+API_PRODUCT_FIELDS = ('id', 'name', 'category', 'price', 'description', 'image')
+
+@app.route('/api/products')
+def api_products():
+    # ?q=mango&category=veg&min_price=100&max_price=300&sort=price_asc&limit=20&cursor=...
+    args = request.args
+    try:
+        limit = int(args.get('limit', 20))
+        min_price = float(args['min_price']) if args.get('min_price') else None
+        max_price = float(args['max_price']) if args.get('max_price') else None
+    except ValueError:
+        return jsonify(error="limit, min_price and max_price must be numbers"), 400
+    if not 1 <= limit <= 100:
+        return jsonify(error="limit must be between 1 and 100"), 400
+    if any(price is not None and not math.isfinite(price) for price in (min_price, max_price)):
+        return jsonify(error="min_price and max_price must be finite numbers"), 400
+
+    try:
+        found, next_cursor = product_search.search(
+            q=args.get('q'),
+            category=args.get('category') or None,
+            min_price=min_price,
+            max_price=max_price,
+            sort=args.get('sort') or None,
+            limit=limit,
+            cursor=args.get('cursor') or None
+        )
+    except InvalidQuery as e:
+        return jsonify(error=str(e)), 400
+
+    items = [{field: product.get(field) for field in API_PRODUCT_FIELDS} for product in found]
+    return jsonify(items=items, next_cursor=next_cursor)
+
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form['username'].strip()
+        password = request.form['password'].strip()
+        if not username or not password:
+            flash("Please enter both username and password.", "error")
+        elif login_throttle_ip.blocked(request.remote_addr):
+            flash("Too many attempts. Please try again later.", "error")
+            return render_page('register'), 429
+        else:
+            login_throttle_ip.record(request.remote_addr)
+            try:
+                created = user_store.create(username, password)
+            except LoginBusy:
+                flash("We're busy right now. Please try again in a moment.", "error")
+                return render_page('register'), 503
+            if not created:
+                flash("Username already exists.", "error")
+            else:
+                flash("Registered successfully. Please login.", "success")
+                return redirect(url_for('login'))
+    return render_page('register')
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username'].strip()
+        password = request.form['password'].strip()
+        ip = request.remote_addr
+        # Throttled attempts are rejected before any hashing work is done
+        if login_throttle_ip.blocked(ip) or login_throttle_user.blocked(username):
+            logger.warning("Login throttled for user %s from %s", username, ip)
+            flash("Too many login attempts. Please try again later.", "error")
+            return render_page('login'), 429
+        login_throttle_ip.record(ip)
+        try:
+            valid = user_store.verify(username, password)
+        except LoginBusy:
+            flash("We're busy right now. Please try again in a moment.", "error")
+            return render_page('login'), 503
+        if valid:
+            login_throttle_user.reset(username)
+            session['username'] = username
+            flash("Logged in successfully!", "success")
+            return redirect(url_for('products_page'))
+        else:
+            login_throttle_user.record(username)
+            flash("Invalid username or password.", "error")
+    return render_page('login')
+
+@app.route('/logout')
+def logout():
+    session.clear()
+    flash("Logged out successfully.", "success")
+    return redirect(url_for('login'))
+
+@app.route('/add_to_cart/<int:product_id>')
+@login_required
+def add_to_cart(product_id):
+    product = catalog.get(product_id)
+    if not product:
+        flash('Product not found', 'error')
+        return redirect(url_for('products_page'))
+
+    key = str(product_id)
+    try:
+        reserve_stock({key: get_cart().get(key, 0) + 1})
+    except OutOfStock as e:
+        stock_shortages.inc(stage='cart')
+        flash(shortage_message(e), 'error')
+        return redirect(url_for('products_page'))
+    except ReservationConflict:
+        flash(CART_CONFLICT_MESSAGE, 'error')
+        return redirect(url_for('products_page'))
+    change_cart(lambda cart: cart.__setitem__(key, cart.get(key, 0) + 1))
+    cart_operations.inc(operation='add')
+    flash(f'{product["name"]} added to cart', 'success')
+    return redirect(url_for('products_page'))
+
+@app.route('/update_cart/<int:product_id>/<int:change>')
+@login_required
+def update_cart(product_id, change):
+    if change not in (-1, 1):
+        raise BadRequest("Invalid quantity change")
+
+    key = str(product_id)
+    quantity = get_cart().get(key)
+    if quantity is None:
+        return redirect(url_for('cart'))
+    try:
+        reserve_stock({key: quantity + change})
+    except OutOfStock as e:
+        stock_shortages.inc(stage='cart')
+        flash(shortage_message(e), 'error')
+        return redirect(url_for('cart'))
+    except ReservationConflict:
+        flash(CART_CONFLICT_MESSAGE, 'error')
+        return redirect(url_for('cart'))
+
+    def apply(cart):
+        if key in cart:
+            cart[key] += change
+            if cart[key] <= 0:
+                del cart[key]
+    change_cart(apply)
+    cart_operations.inc(operation='increment' if change > 0 else 'decrement')
+    return redirect(url_for('cart'))
+
+@app.route('/remove_from_cart/<int:product_id>')
+@login_required
+def remove_from_cart(product_id):
+    key = str(product_id)
+    try:
+        reserve_stock({key: 0})
+    except ReservationConflict:
+        flash(CART_CONFLICT_MESSAGE, 'error')
+        return redirect(url_for('cart'))
+    change_cart(lambda cart: cart.pop(key, None))
+    cart_operations.inc(operation='remove')
+    return redirect(url_for('cart'))
+
+@app.route('/cart/update', methods=['POST'])
+@login_required
+def update_cart_quantities():
+    # Batch update: set several line quantities in one round trip, either
+    # from the cart form (qty-<product_id>=N) or a JSON {"items": {id: N}}
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        changes = payload.get('items')
+        if not isinstance(changes, dict):
+            raise BadRequest("Expected {\"items\": {product_id: quantity}}")
+    else:
+        changes = {key[len('qty-'):]: value for key, value in request.form.items() if key.startswith('qty-')}
+
+    quantities = {}
+    for product_id, quantity in changes.items():
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise BadRequest("Invalid quantity")
+        if quantity < 0 or catalog.get(product_id) is None:
+            raise BadRequest("Invalid cart line")
+        quantities[str(int(product_id))] = quantity
+
+    try:
+        reserve_stock(quantities)
+    except OutOfStock as e:
+        stock_shortages.inc(stage='cart')
+        if request.is_json:
+            return jsonify(error=shortage_message(e), product_id=e.product_id, available=e.available), 409
+        flash(shortage_message(e), 'error')
+        return redirect(url_for('cart'))
+    except ReservationConflict:
+        if request.is_json:
+            return jsonify(error=CART_CONFLICT_MESSAGE), 409
+        flash(CART_CONFLICT_MESSAGE, 'error')
+        return redirect(url_for('cart'))
+
+    def apply(cart):
+        for key, quantity in quantities.items():
+            if quantity:
+                cart[key] = quantity
+            else:
+                cart.pop(key, None)
+    items = change_cart(apply)
+    cart_operations.inc(operation='batch_update')
+
+    if request.is_json:
+        return jsonify(items=items)
+    return redirect(url_for('cart'))
+
+@app.route('/cart')
+@login_required
+def cart():
+    return render_page('cart', quote=price_current_cart())
+
+@app.route('/cart/coupon', methods=['POST'])
+@login_required
+def apply_coupon():
+    code = request.form.get('coupon', '').strip()
+    if not code:
+        session.pop('coupon', None)
+        return redirect(url_for('cart'))
+    # Kept even when it doesn't apply, so the cart can say why
+    session['coupon'] = code
+    quote = price_current_cart()
+    if quote['coupon_error']:
+        flash(quote['coupon_error'], 'error')
+    else:
+        flash(f"Coupon {quote['coupon']} applied: you save ₹{quote['coupon_discount']}.", 'success')
+    return redirect(url_for('cart'))
+
+@app.route('/checkout')
+@login_required
+def checkout():
+    quote = price_current_cart()
+    if quote['items']:
+        # Keep the cart's units held while the form is being filled in
+        inventory.touch(session['cart_id'])
+    return render_page('checkout', quote=quote, idempotency_key=str(uuid.uuid4()))
+
+@app.route('/place_order', methods=['POST'])
+@login_required
+def place_order():
+    # The checkout form carries an idempotency key, so a resubmitted or
+    # retried form maps to the same order_id instead of a second order
+    order_id = request.form.get('idempotency_key') or str(uuid.uuid4())
+    try:
+        order_id = str(uuid.UUID(order_id))
+    except ValueError:
+        raise BadRequest("Invalid idempotency key")
+
+    quote = price_current_cart()
+    cart_items = quote['items']
+    # A resubmission usually arrives after the first submission cleared the
+    # cart, possibly on another worker or after a restart
+    if order_writer.is_duplicate(order_id) or (not cart_items and order_claims.claimed(order_id)):
+        return duplicate_order()
+    if not cart_items:
+        flash("Your cart is empty.", "error")
+        return redirect(url_for('cart'))
+
+    # Claim the key in shared storage before touching stock or notifying anyone
+    try:
+        if not order_claims.claim(order_id, session['username']):
+            return duplicate_order()
+    except Exception as e:
+        logger.error("Order key could not be claimed: %s", e)
+        orders_placed.inc(outcome='failed')
+        flash("We couldn't place your order right now. Please try again.", "error")
+        return redirect(url_for('checkout'))
+
+    try:
+        sold = inventory.checkout(session['cart_id'], {item['id']: item['quantity'] for item in cart_items})
+    except OutOfStock as e:
+        order_claims.release(order_id)
+        stock_shortages.inc(stage='order')
+        flash(shortage_message(e), 'error')
+        return redirect(url_for('cart'))
+    except ReservationConflict:
+        order_claims.release(order_id)
+        flash("Your cart changed while the order was being placed. Please try again.", "error")
+        return redirect(url_for('checkout'))
+
+    order_data = {
+        'order_id': order_id,
+        'username': session['username'],
+        'name': request.form.get('name', '').strip(),
+        'address': request.form.get('address', '').strip(),
+        'email': request.form.get('email', '').strip(),
+        'phone': request.form.get('phone', '').strip(),
+        # price is the list price; discount is the line's offer plus its share of the coupon
+        'items': [{'id': item['id'], 'name': item['name'], 'quantity': item['quantity'], 'price': item['price'],
+                   'discount': item['discount'] + item['coupon_discount']}
+                  for item in cart_items],
+        'subtotal': quote['subtotal'],
+        'discount': quote['discount'],
+        'shipping': quote['shipping'],
+        'total': quote['total'],
+        'coupon': quote['coupon'] or '',
+        'created_at': datetime.utcnow().isoformat()
+    }
+    if not save_order_to_dynamodb(order_data):
+        inventory.restock(sold)
+        if order_writer.is_duplicate(order_id):
+            return duplicate_order()
+        order_claims.release(order_id)
+        orders_placed.inc(outcome='failed')
+        flash("We couldn't place your order right now. Please try again.", "error")
+        return redirect(url_for('checkout'))
+
+    summary = "\n".join(f"{item['name']} x {item['quantity']} - ₹{item['total']}" for item in cart_items)
+    if quote['discount']:
+        summary += f"\nYou saved: ₹{quote['discount']}"
+    total = order_data['total']
+    summary = f"Order {order_data['order_id']}\n{summary}\nShipping: ₹{quote['shipping']}\nTotal: ₹{total}"
+    # Both only enqueue; delivery happens on the notifier workers
+    if order_data['email']:
+        send_order_email(order_data['email'], summary)
+    send_sns_notification(f"New order received: {order_data['order_id']} (₹{total})", topic_arn=ORDER_TOPIC_ARN)
+
+    orders_placed.inc(outcome='placed')
+    discard_cart()
+    flash("🎉 Your order has been placed successfully!", "success")
+    logger.info("Order placed and cart cleared.")
+    return redirect(url_for('order_success'))
+
+def duplicate_order():
+    orders_placed.inc(outcome='duplicate')
+    discard_cart()
+    return redirect(url_for('order_success'))
+
+@app.route('/success')
+@login_required
+def order_success():
+    return render_page('success')
+
+# -------------------- Order History --------------------
+
+def order_view(order):
+    return {
+        'order_id': order['order_id'],
+        'created_at': order['created_at'],
+        'total': int(order['total']),
+        'items': [{'id': int(item['id']), 'name': item['name'], 'quantity': int(item['quantity']),
+                   'price': int(item['price'])} for item in order.get('items', ())],
+    }
+
+def user_orders(cursor, limit=None):
+    username = session['username']
+    orders, next_cursor = order_history.page(username, cursor, limit)
+    if not cursor:
+        # Orders this worker accepted that the writer hasn't flushed yet
+        known = {order['order_id'] for order in orders}
+        pending = [order for order in order_writer.pending_for(username) if order['order_id'] not in known]
+        if pending:
+            orders = sorted(pending + orders, key=lambda order: order['created_at'], reverse=True)
+    return [order_view(order) for order in orders], next_cursor
+
+@app.route('/orders')
+@login_required
+def my_orders():
+    try:
+        orders, next_cursor = user_orders(request.args.get('cursor'))
+    except InvalidOrderCursor:
+        raise BadRequest("Invalid cursor")
+    return render_page('orders', orders=orders, next_cursor=next_cursor)
+
+@app.route('/api/orders')
+@login_required
+def api_orders():
+    try:
+        limit = int(request.args.get('limit', ORDERS_PAGE_SIZE))
+    except ValueError:
+        return jsonify(error="limit must be a number"), 400
+    if not 1 <= limit <= 100:
+        return jsonify(error="limit must be between 1 and 100"), 400
+    try:
+        orders, next_cursor = user_orders(request.args.get('cursor'), limit)
+    except InvalidOrderCursor:
+        return jsonify(error="Invalid cursor"), 400
+    return jsonify(items=orders, next_cursor=next_cursor)
+
+def sales_report(args):
+    # ?from=2024-01-01&to=2024-01-31, or ?days=30 ending today (UTC)
+    today = datetime.utcnow().date()
+    if args.get('from') or args.get('to'):
+        start = date.fromisoformat(args.get('from') or today.isoformat())
+        end = date.fromisoformat(args.get('to') or today.isoformat())
+    else:
+        end = today
+        start = end - timedelta(days=int(args.get('days', 30)) - 1)
+    if not timedelta(0) <= end - start <= timedelta(days=366):
+        raise ValueError("range must be 1 to 367 days")
+    report = sales_rollups.report(start, end)
+    names = catalog.get_many(row['product_id'] for row in report['products'])
+    for row in report['products']:
+        product = names.get(row['product_id'])
+        row['name'] = product['name'] if product else f"#{row['product_id']}"
+    return report
+
+@app.route('/admin/sales')
+@login_required
+@admin_required
+def sales_dashboard():
+    try:
+        report = sales_report(request.args)
+    except ValueError:
+        raise BadRequest("Invalid date range")
+    return render_page('sales', report=report)
+
+@app.route('/api/sales')
+@login_required
+@admin_required
+def api_sales():
+    try:
+        report = sales_report(request.args)
+    except ValueError as e:
+        return jsonify(error=f"Invalid date range: {e}"), 400
+    return jsonify(report)
+
+init_assets(app)
+init_templates(app, cache_dir=TEMPLATE_CACHE_DIR)
+if TRUSTED_PROXY_HOPS:
+    # remote_addr (and so the per-IP login throttle) becomes the client
+    # the trusted proxies saw, not the load balancer's address
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+app.wsgi_app = CompressionMiddleware(
+    app.wsgi_app,
+    min_size=COMPRESS_MIN_BYTES,
+    gzip_level=COMPRESS_GZIP_LEVEL,
+    brotli_quality=COMPRESS_BROTLI_QUALITY
+)
+
+# -------------------- Error Pages --------------------
+
+@app.errorhandler(404)
+def not_found_error(e):
+    return render_template('404.html'), 404
+
+@app.errorhandler(500)
+def internal_error(e):
+    return render_template('500.html'), 500
+
+# -------------------- Serving --------------------
+
+# Set by warm_up() in each worker; cleared as soon as the worker starts draining
+ready = threading.Event()
+draining = threading.Event()
+
+def warm_up():
+    """Get this worker ready before it accepts traffic (gunicorn post_fork / ASGI startup).
+
+    Templates, catalog and search index are built at import, so with
+    preload they are already shared from the master. What can't cross a
+    fork is opened here: AWS connections and the background threads. The
+    order writer's start also replays journals left by crashed workers.
+    """
+    started = time.perf_counter()
+    prewarm_aws()
+    catalog_watcher.start()
+    order_writer.start()
+    notifier.start()
+    inventory.start()
+    # One request through the full stack: url map, session, hooks
+    app.test_client().get('/healthz')
+    ready.set()
+    logger.info("Worker %s ready in %.0f ms", os.getpid(), (time.perf_counter() - started) * 1e3)
+
+def drain(timeout=DRAIN_TIMEOUT):
+    """Flush background work after the server stops handing out requests (gunicorn worker_exit / ASGI shutdown)."""
+    draining.set()
+    ready.clear()
+    started = time.perf_counter()
+    # Orders first: their flush also feeds the sales rollups
+    stop_order_writer(timeout)
+    notifier.stop(timeout)
+    inventory.stop()
+    catalog_watcher.stop()
+    logger.info("Worker %s drained in %.0f ms", os.getpid(), (time.perf_counter() - started) * 1e3)
+    log_pipeline.stop()
+
+@app.route('/healthz')
+def liveness():
+    return 'ok', 200, {'Content-Type': 'text/plain', 'Cache-Control': 'no-store'}
+
+@app.route('/readyz')
+def readiness():
+    if draining.is_set() or not ready.is_set():
+        return 'not ready', 503, {'Content-Type': 'text/plain', 'Cache-Control': 'no-store'}
+    return 'ready', 200, {'Content-Type': 'text/plain', 'Cache-Control': 'no-store'}
+
+
+if __name__ == '__main__':
+    # Development server; in production use gunicorn -c gunicorn.conf.py app:app
+    warm_up()
+    # Let SIGTERM unwind through the finally below so queues still drain
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        app.run(debug=False, host='0.0.0.0', port=int(os.environ.get("PORT",5000)))
+    finally:
+        drain()
\ No newline at end of file
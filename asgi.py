@@ -0,0 +1,218 @@
+"""ASGI serving mode for the storefront.
+
+    uvicorn asgi:app --workers 2 --port 8000
+
+The event loop owns every connection: reading request bodies, writing
+responses and idling keep-alive clients cost no threads. The Flask
+handler runs on a per-process thread pool (ASGI_THREADS, default 128)
+that is far larger than a sync worker's single slot, so a request
+blocked on DynamoDB or SMTP stalls one cheap thread instead of the
+whole worker. Response bodies (including stream_with_context) are
+relayed chunk by chunk with back-pressure.
+
+Lifespan startup runs app.warm_up() before the server accepts requests;
+shutdown (after uvicorn has let in-flight requests finish) runs
+app.drain() to flush the order, notification and inventory queues.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import app as storefront
+
+
+logger = logging.getLogger(__name__)
+
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 128))
+# Larger request bodies are rejected with 413
+ASGI_MAX_BODY = int(os.environ.get('ASGI_MAX_BODY', 1024 * 1024))
+
+
+class ClientDisconnected(Exception):
+    """Raised in the handler thread once nobody will send what it writes."""
+
+
+class WSGIToASGI:
+    """Runs a WSGI app under an ASGI server, one pool thread per in-flight request."""
+
+    def __init__(self, wsgi_app, threads=128, max_body=1024 * 1024, on_startup=None, on_shutdown=None,
+                 queue_size=8):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.max_body = max_body
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+        self.queue_size = queue_size
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # ASGI servers fork workers too; never reuse a parent's pool
+        with self._lock:
+            if self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='asgi')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.on_startup is not None:
+                    await asyncio.get_running_loop().run_in_executor(self._pool(), self.on_startup)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.on_shutdown is not None:
+                    await asyncio.get_running_loop().run_in_executor(self._pool(), self.on_shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body += message.get('body', b'')
+            if len(body) > self.max_body:
+                return False
+            if not message.get('more_body', False):
+                return bytes(body)
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            return
+        if body is False:
+            await send({'type': 'http.response.start', 'status': 413,
+                        'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b'Request body too large'})
+            return
+
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(self.queue_size)
+        cancelled = threading.Event()
+
+        def put(message):
+            if cancelled.is_set():
+                raise ClientDisconnected()
+            # Blocks the handler thread while the client is slow to read
+            asyncio.run_coroutine_threadsafe(chunks.put(message), loop).result()
+
+        def run():
+            started = []
+
+            def start_response(status, headers, exc_info=None):
+                if exc_info and started:
+                    raise exc_info[1].with_traceback(exc_info[2])
+                started.append((int(status.split(' ', 1)[0]), [
+                    (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+                ]))
+                return lambda data: put(('body', data))
+
+            try:
+                result = self.wsgi_app(build_environ(scope, body), start_response)
+                try:
+                    sent_start = False
+                    for data in result:
+                        if not data:
+                            continue
+                        if not sent_start:
+                            put(('start', started[0]))
+                            sent_start = True
+                        put(('body', data))
+                    if not sent_start:
+                        put(('start', started[0]))
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+                put(('end', None))
+            except ClientDisconnected:
+                pass
+            except BaseException as e:
+                try:
+                    put(('error', e))
+                except ClientDisconnected:
+                    pass
+
+        future = loop.run_in_executor(self._pool(), run)
+        response_started = False
+        try:
+            while True:
+                kind, value = await chunks.get()
+                if kind == 'start':
+                    status, headers = value
+                    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+                    response_started = True
+                elif kind == 'body':
+                    await send({'type': 'http.response.body', 'body': value, 'more_body': True})
+                elif kind == 'end':
+                    await send({'type': 'http.response.body', 'body': b''})
+                    break
+                else:
+                    logger.error("Unhandled error in request %s", scope.get('path'), exc_info=value)
+                    if not response_started:
+                        await send({'type': 'http.response.start', 'status': 500,
+                                    'headers': [(b'content-type', b'text/plain')]})
+                    await send({'type': 'http.response.body', 'body': b'' if response_started else b'Internal Server Error'})
+                    break
+        finally:
+            # If send() raised (client gone), the handler may be blocked on a
+            # full queue: stop further puts, keep draining until it has
+            # closed its WSGI iterable and returned
+            cancelled.set()
+            while not future.done():
+                while not chunks.empty():
+                    chunks.get_nowait()
+                await asyncio.wait({future}, timeout=0.05)
+            await future
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = 'HTTP_' + name
+            if key in environ:
+                value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+            environ[key] = value
+    return environ
+
+
+app = WSGIToASGI(storefront.app, threads=ASGI_THREADS, max_body=ASGI_MAX_BODY, on_startup=storefront.warm_up,
+                 on_shutdown=storefront.drain)
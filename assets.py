@@ -0,0 +1,304 @@
+"""Static asset pipeline.
+
+    python assets.py build [--static static] [--width 100]
+
+Writes fingerprinted copies of everything under static/ to static/dist/,
+downloads each product image in the live catalog (CATALOG_FILE) once and
+resizes it to 1x and 2x thumbnails of the width the pages render, and pre-compresses text assets to .gz
+(and .br when the brotli package is installed). static/dist/manifest.json
+maps logical names to the hashed files; pages go through asset_url() and
+product_thumbnail(), which fall back to the original URLs for anything
+the manifest doesn't know.
+
+Hashed files never change, so /assets/ serves them with an immutable
+one-year Cache-Control and picks the .br/.gz sibling the client accepts.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import urllib.request
+
+from flask import abort, request, send_from_directory, url_for
+
+from compression import accepted_encodings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+TEXT_TYPES = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# Below this, compression headers cost more than they save
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{w}" viewBox="0 0 {w} {w}">'
+    '<rect width="100%" height="100%" rx="8" fill="#f3e9dc"/>'
+    '<text x="50%" y="50%" font-family="sans-serif" font-size="11" fill="#8a6d4b" '
+    'text-anchor="middle" dominant-baseline="middle">No image</text></svg>'
+)
+
+
+# -------------------- Build --------------------
+
+def _hashed_name(name, data):
+    root, ext = os.path.splitext(name)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+class AssetBuilder:
+
+    def __init__(self, static_dir, width=100, timeout=10, opener=None):
+        self.static_dir = static_dir
+        self.dist_dir = os.path.join(static_dir, DIST_DIR)
+        self.width = width
+        self.timeout = timeout
+        self.opener = opener or self._download
+        self.previous = load_manifest(static_dir)
+        self.manifest = {'files': {}, 'products': {}}
+        self.before = 0
+        self.after = 0
+        self.compressed = {'gzip': 0, 'br': 0}
+        self.failed = []
+
+    def _download(self, url):
+        req = urllib.request.Request(url, headers={'User-Agent': 'asset-pipeline'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            return response.read()
+
+    def _write(self, name, data):
+        path = os.path.join(self.dist_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path):
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return name
+
+    def _precompress(self, name, data):
+        if len(data) < MIN_COMPRESS_BYTES:
+            return
+        gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(gzipped) < len(data):
+            self._write(name + '.gz', gzipped)
+            self.compressed['gzip'] += len(gzipped)
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+            if len(compressed) < len(data):
+                self._write(name + '.br', compressed)
+                self.compressed['br'] += len(compressed)
+
+    def add_file(self, logical_name, data):
+        hashed = self._write(_hashed_name(logical_name, data), data)
+        self.manifest['files'][logical_name] = hashed
+        self.before += len(data)
+        self.after += len(data)
+        if logical_name.endswith(TEXT_TYPES):
+            self._precompress(hashed, data)
+        return hashed
+
+    def static_files(self):
+        for root, dirs, files in os.walk(self.static_dir):
+            if os.path.abspath(root) == os.path.abspath(self.static_dir):
+                dirs[:] = [d for d in dirs if d != DIST_DIR]
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, self.static_dir).replace(os.sep, '/'), path
+
+    def build_static(self):
+        for logical_name, path in self.static_files():
+            with open(path, 'rb') as f:
+                self.add_file(logical_name, f.read())
+
+    def _thumbnail(self, data, width):
+        from PIL import Image
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        if image.mode not in ('RGB', 'L'):
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.convert('RGBA').split()[-1])
+            image = background
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, 'JPEG', quality=82, optimize=True, progressive=True)
+        return out.getvalue(), height
+
+    def build_product(self, product):
+        product_id = str(product['id'])
+        url = product.get('image')
+        previous = self.previous.get('products', {}).get(product_id)
+        if previous and previous.get('source') == url and not previous.get('placeholder') and all(
+                os.path.exists(os.path.join(self.dist_dir, previous[k])) for k in ('1x', '2x')):
+            # Same source URL as the last build: reuse the thumbnails
+            self.manifest['products'][product_id] = previous
+            self.before += previous.get('source_bytes', 0)
+            self.after += previous.get('bytes', 0)
+            return
+
+        try:
+            original = self.opener(url)
+            entry = {'source': url, 'source_bytes': len(original), 'width': self.width}
+            for scale in (1, 2):
+                thumb, height = self._thumbnail(original, self.width * scale)
+                entry[f'{scale}x'] = self._write(_hashed_name(f'products/{product_id}.jpg', thumb), thumb)
+                entry['bytes'] = entry.get('bytes', 0) + len(thumb)
+                if scale == 1:
+                    entry['height'] = height
+        except ImportError:
+            raise SystemExit('Resizing product images needs Pillow (pip install Pillow)')
+        except Exception as e:
+            logger.warning("Product %s image %s unusable (%s); using a placeholder", product_id, url, e)
+            self.failed.append((product_id, url))
+            placeholder = PLACEHOLDER_SVG.format(w=self.width).encode('utf-8')
+            name = self._write(_hashed_name('products/placeholder.svg', placeholder), placeholder)
+            entry = {'source': url, 'source_bytes': 0, 'bytes': len(placeholder), 'width': self.width,
+                     'height': self.width, '1x': name, '2x': name, 'placeholder': True}
+        self.manifest['products'][product_id] = entry
+        self.before += entry['source_bytes']
+        self.after += entry['bytes']
+
+    def write_manifest(self):
+        os.makedirs(self.dist_dir, exist_ok=True)
+        path = os.path.join(self.dist_dir, MANIFEST)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    def prune(self):
+        """Delete hashed files no longer referenced by the manifest."""
+        keep = {MANIFEST}
+        for name in self.manifest['files'].values():
+            keep.update((name, name + '.gz', name + '.br'))
+        for entry in self.manifest['products'].values():
+            keep.update((entry['1x'], entry['2x']))
+        removed = 0
+        for root, _, files in os.walk(self.dist_dir):
+            for filename in files:
+                name = os.path.relpath(os.path.join(root, filename), self.dist_dir).replace(os.sep, '/')
+                if name not in keep:
+                    os.remove(os.path.join(root, filename))
+                    removed += 1
+        return removed
+
+
+def build(static_dir, products, width=100, opener=None, prune=True):
+    builder = AssetBuilder(static_dir, width=width, opener=opener)
+    builder.build_static()
+    for product in products:
+        builder.build_product(product)
+    builder.write_manifest()
+    if prune:
+        builder.prune()
+    return builder
+
+
+def load_manifest(static_dir):
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+# -------------------- Serving --------------------
+
+def init_assets(app):
+    """Load the manifest and register asset helpers plus the /assets/ route."""
+    manifest = load_manifest(app.static_folder)
+    app.extensions['asset_manifest'] = manifest
+    dist_dir = os.path.join(app.static_folder, DIST_DIR)
+
+    def asset_url(name):
+        hashed = manifest.get('files', {}).get(name)
+        if hashed is None:
+            return url_for('static', filename=name)
+        return url_for('hashed_asset', filename=hashed)
+
+    def product_thumbnail(product):
+        entry = manifest.get('products', {}).get(str(product['id']))
+        if entry is None or entry.get('source') != product.get('image'):
+            # Not built yet (or the image changed since): hot-link the original
+            return {'src': product['image'], 'srcset': None, 'width': 100, 'height': None}
+        return {
+            'src': url_for('hashed_asset', filename=entry['1x']),
+            'srcset': None if entry['1x'] == entry['2x'] else
+            f"{url_for('hashed_asset', filename=entry['1x'])} 1x, {url_for('hashed_asset', filename=entry['2x'])} 2x",
+            'width': entry['width'],
+            'height': entry.get('height'),
+        }
+
+    app.jinja_env.globals.update(asset_url=asset_url, product_thumbnail=product_thumbnail)
+
+    @app.route('/assets/<path:filename>')
+    def hashed_asset(filename):
+        if filename.endswith(('.gz', '.br')) or filename == MANIFEST:
+            abort(404)
+        codings = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        accepted = {'br': codings.get('br', 0) > 0, 'gzip': codings.get('gzip', codings.get('*', 0)) > 0}
+        served, encoding = filename, None
+        for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+            if accepted[name] and os.path.exists(os.path.join(dist_dir, filename + suffix)):
+                served, encoding = filename + suffix, name
+                break
+        response = send_from_directory(dist_dir, served, max_age=31536000, conditional=True, etag=True)
+        response.headers['Cache-Control'] = IMMUTABLE
+        response.headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        return response
+
+    return manifest
+
+
+# -------------------- CLI --------------------
+
+def _human(n):
+    return f'{n / 1024:,.1f} KiB'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build fingerprinted, compressed static assets')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_cmd = commands.add_parser('build', help='localize product images and fingerprint static/')
+    build_cmd.add_argument('--static', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    build_cmd.add_argument('--width', type=int, default=100, help='rendered thumbnail width in px')
+    build_cmd.add_argument('--clean', action='store_true', help='rebuild everything from scratch')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+    if args.clean:
+        shutil.rmtree(os.path.join(args.static, DIST_DIR), ignore_errors=True)
+    # The live catalog: the snapshot the workers load (CATALOG_FILE), or
+    # the built-in products when nothing has been imported yet
+    from app import catalog
+
+    builder = build(args.static, catalog.all(), width=args.width)
+    print(f"files:     {len(builder.manifest['files'])}")
+    print(f"products:  {len(builder.manifest['products'])} ({len(builder.failed)} with placeholders)")
+    print(f'before:    {_human(builder.before)}')
+    print(f'after:     {_human(builder.after)} ({1 - builder.after / builder.before:.0%} smaller)'
+          if builder.before else f'after:     {_human(builder.after)}')
+    print(f"gzip:      {_human(builder.compressed['gzip'])} of text assets after compression")
+    if brotli is not None:
+        print(f"brotli:    {_human(builder.compressed['br'])} of text assets after compression")
+    for product_id, url in builder.failed:
+        print(f'  product {product_id}: could not use {url}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+
+logger = logging.getLogger(__name__)
+
+
+class AWSClients:
+    """Lazily created, per-process boto3 clients sharing one tuned connection pool config.
+
+    Nothing is created until first use, so importing the app costs no
+    endpoint resolution. boto3 clients are thread-safe but must not cross
+    a fork, so everything is rebuilt when the pid changes.
+
+    endpoint_url points every service at a local endpoint (e.g. DynamoDB
+    Local on http://localhost:8000); "inprocess" swaps in the in-memory
+    stand-ins from local_aws, using `table_schemas` for key layouts.
+    """
+
+    def __init__(self, region, endpoint_url=None, max_pool_connections=50, max_attempts=5,
+                 connect_timeout=2, read_timeout=5, table_schemas=None):
+        self.region = region
+        self.endpoint_url = endpoint_url
+        self.table_schemas = table_schemas or {}
+        self.config = Config(
+            region_name=region,
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=True,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={'mode': 'adaptive', 'max_attempts': max_attempts}
+        )
+        self._lock = threading.Lock()
+        self._pid = None
+        self._session = None
+        self._resources = {}
+        self._clients = {}
+
+    def _reset_if_forked(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._session = None
+            self._resources = {}
+            self._clients = {}
+
+    def _kwargs(self):
+        kwargs = {'config': self.config}
+        if self.endpoint_url:
+            kwargs['endpoint_url'] = self.endpoint_url
+        return kwargs
+
+    def resource(self, name):
+        with self._lock:
+            self._reset_if_forked()
+            if name not in self._resources:
+                if self.endpoint_url == 'inprocess':
+                    self._resources[name] = self._inprocess_resource(name)
+                else:
+                    if self._session is None:
+                        self._session = boto3.session.Session(region_name=self.region)
+                    self._resources[name] = self._session.resource(name, **self._kwargs())
+            return self._resources[name]
+
+    def client(self, name):
+        with self._lock:
+            self._reset_if_forked()
+            if name not in self._clients:
+                if self.endpoint_url == 'inprocess':
+                    from local_aws import LocalSNS
+                    self._clients[name] = {'sns': LocalSNS}[name]()
+                else:
+                    if self._session is None:
+                        self._session = boto3.session.Session(region_name=self.region)
+                    self._clients[name] = self._session.client(name, **self._kwargs())
+            return self._clients[name]
+
+    def _inprocess_resource(self, name):
+        from local_aws import LocalDynamoDB
+        if name != 'dynamodb':
+            raise ValueError(f'No in-process stand-in for {name}')
+        dynamodb = LocalDynamoDB()
+        for table_name, (hash_key, range_key, indexes) in self.table_schemas.items():
+            dynamodb.create_table(table_name, hash_key, range_key, indexes)
+        return dynamodb
+
+    def table(self, name):
+        return LazyTable(self, name)
+
+    def lazy_client(self, name):
+        return LazyClient(self, name)
+
+    def prewarm(self, tables=(), clients=()):
+        """Create clients and open pooled connections before taking traffic."""
+        for name in tables:
+            try:
+                table = self.resource('dynamodb').Table(name)
+                if self.endpoint_url != 'inprocess':
+                    # Cheap call that resolves the endpoint and opens a keep-alive connection
+                    table.meta.client.describe_table(TableName=name)
+            except Exception as e:
+                logger.warning("Pre-warm of table %s failed: %s", name, e)
+        for name in clients:
+            try:
+                self.client(name)
+            except Exception as e:
+                logger.warning("Pre-warm of %s client failed: %s", name, e)
+
+
+class LazyTable:
+    """Stands in for dynamodb.Table(name) until an attribute is first used."""
+
+    def __init__(self, clients, name):
+        self._clients = clients
+        self._name = name
+        self._table = None
+        self._pid = None
+
+    def _resolve(self):
+        if self._table is None or self._pid != os.getpid():
+            self._table = self._clients.resource('dynamodb').Table(self._name)
+            self._pid = os.getpid()
+        return self._table
+
+    @property
+    def name(self):
+        return self._name
+
+    def __getattr__(self, attribute):
+        return getattr(self._resolve(), attribute)
+
+
+class LazyClient:
+
+    def __init__(self, clients, name):
+        self._clients = clients
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return getattr(self._clients.client(self._name), attribute)
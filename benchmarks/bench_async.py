@@ -0,0 +1,154 @@
+"""Sync (WSGI worker slots) vs async (ASGI) serving under slow DynamoDB.
+
+    python benchmarks/bench_async.py [latency-ms] [requests] [clients]
+
+Runs in-process against the local_aws stand-ins (AWS_ENDPOINT_URL=inprocess)
+with `latency-ms` added to every DynamoDB call. The request mix is login
+(users get_item), posting a review (put_item) and reading /reviews.
+
+    sync   clients queue for a fixed number of WSGI slots, as with
+           gunicorn's default 2 workers x 8 threads (SYNC_SLOTS)
+    async  clients drive asgi.app directly; the event loop holds every
+           request and handlers run on its ASGI_THREADS pool
+
+Both modes build identical WSGI environs, so the difference is only how
+many slow requests can be in flight at once.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+os.environ['AWS_ENDPOINT_URL'] = 'inprocess'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+os.chdir(tempfile.mkdtemp())
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as storefront
+import asgi
+
+
+SYNC_SLOTS = int(os.environ.get('SYNC_SLOTS', 16))
+USERS = 8
+
+
+def scope_for(i):
+    kind = i % 3
+    if kind == 0:
+        body = urlencode({'username': f'user{i % USERS}', 'password': 'secret'}).encode()
+        path, method = '/login', 'POST'
+    elif kind == 1:
+        body = urlencode({'review': f'review {i}'}).encode()
+        path, method = '/reviews', 'POST'
+    else:
+        body, path, method = b'', '/reviews', 'GET'
+    headers = [(b'host', b'localhost')]
+    if body:
+        headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': headers,
+             'client': ('127.0.0.1', 40000 + i % 1000), 'server': ('localhost', 8000)}
+    return scope, body
+
+
+def call_wsgi(scope, body):
+    status = []
+    result = storefront.app.wsgi_app(asgi.build_environ(scope, body), lambda s, h, e=None: status.append(s))
+    try:
+        b''.join(result)
+    finally:
+        result.close()
+    return int(status[0].split()[0])
+
+
+def run_sync(total, clients):
+    slots = threading.BoundedSemaphore(SYNC_SLOTS)
+    latencies = []
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            scope, body = scope_for(i)
+            started = time.perf_counter()
+            with slots:
+                status = call_wsgi(scope, body)
+            assert status < 500, status
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started
+
+
+async def call_asgi(scope, body):
+    received = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = []
+
+    async def receive():
+        return received.pop() if received else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await asgi.app(scope, receive, send)
+    return status[0]
+
+
+async def run_async(total, clients):
+    latencies = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            scope, body = scope_for(i)
+            started = time.perf_counter()
+            status = await call_asgi(scope, body)
+            assert status < 500, status
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, time.perf_counter() - started
+
+
+def report(mode, latencies, elapsed):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1e3
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1e3
+    print(f"{mode:<6} {len(latencies) / elapsed:>10.1f} {p50:>9.1f} {p99:>9.1f}")
+
+
+def main():
+    latency = float(sys.argv[1]) / 1e3 if len(sys.argv) > 1 else 0.05
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    storefront.prewarm_aws()
+    for name in (storefront.DYNAMODB_TABLE, 'users', 'contacts', 'reviews'):
+        storefront.aws.resource('dynamodb').Table(name).latency = latency
+    storefront.login_throttle_ip.limit = total + 1
+    for n in range(USERS):
+        storefront.user_store.create(f'user{n}', 'secret')
+
+    print(f"{total} requests, {clients} clients, {latency * 1e3:.0f} ms per DynamoDB call, "
+          f"{SYNC_SLOTS} sync slots, {asgi.ASGI_THREADS} ASGI threads")
+    print(f"{'mode':<6} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    report('sync', *run_sync(total, clients))
+    report('async', *asyncio.run(run_async(total, clients)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Cart render cost vs. catalog size.
+
+    python benchmarks/bench_cart.py
+
+Prices a fixed 10-line cart against catalogs of growing size, both directly
+through PricingEngine.quote() and through the /cart route with the Flask test client.
+The per-render time should stay flat as the catalog grows.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as storefront
+from catalog import CATEGORIES, Catalog
+from pricing import PricingEngine
+
+
+SIZES = (12, 1000, 10000, 100000)
+CART = {str(i): 2 for i in range(1, 11)}
+
+
+def synthetic_products(n):
+    return [{
+        'id': i,
+        'category': CATEGORIES[i % len(CATEGORIES)],
+        'name': f'Product {i}',
+        'price': 100 + (i * 37) % 400,
+        'image': f'https://example.invalid/{i}.jpg',
+        'description': f'Synthetic product {i}',
+    } for i in range(1, n + 1)]
+
+
+def linear_price(products, cart):
+    # The pre-catalog lookup, kept for comparison
+    subtotal = 0
+    for product_id, quantity in cart.items():
+        product = next((p for p in products if p['id'] == int(product_id)), None)
+        if product:
+            subtotal += product['price'] * quantity
+    return subtotal
+
+
+def main():
+    client = storefront.app.test_client()
+    version, _ = storefront.cart_store.mutate('bench-cart', lambda items: items.update(CART))
+    with client.session_transaction() as sess:
+        sess['username'] = 'bench'
+        sess['cart_id'] = 'bench-cart'
+        sess['cart_v'] = version
+
+    print(f"{'catalog':>8} {'linear us':>11} {'indexed us':>11} {'/cart us':>10}")
+    for size in SIZES:
+        products = synthetic_products(size)
+        catalog = Catalog(products)
+        pricing = PricingEngine(catalog, storefront.DEFAULT_PRICING_RULES)
+        # Worst case for the linear scan: ids at the end of the list
+        tail_cart = {str(i): 1 for i in range(size - 9, size + 1)}
+
+        n = 200
+        linear_n = max(5, 200000 // size)
+        linear = timeit.timeit(lambda: linear_price(products, tail_cart), number=linear_n) / linear_n
+        indexed = timeit.timeit(lambda: pricing.quote(tail_cart), number=n) / n
+
+        storefront.catalog.replace(products)
+        route = timeit.timeit(lambda: client.get('/cart'), number=n) / n
+
+        print(f'{size:>8} {linear * 1e6:>11.1f} {indexed * 1e6:>11.1f} {route * 1e6:>10.1f}')
+
+    storefront.catalog.replace(storefront.products)
+
+
+if __name__ == '__main__':
+    main()
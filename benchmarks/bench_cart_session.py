@@ -0,0 +1,77 @@
+"""Cookie size and add_to_cart latency: signed-cookie cart vs. server-side cart.
+
+    python benchmarks/bench_cart_session.py
+
+"cookie" replays the old add_to_cart, which kept the whole cart dict in
+Flask's signed session cookie. "server" is the app's CartStore path, where
+the cookie holds only the cart id and version. Carts are prefilled with N
+line items before timing.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask, redirect, session
+
+import app as storefront
+from cart_store import CartStore, SQLiteCartBackend
+
+
+LINES = (10, 100, 1000)
+REQUESTS = 300
+
+
+legacy = Flask('legacy_cart')
+legacy.secret_key = storefront.app.secret_key
+
+
+@legacy.route('/add_to_cart/<int:product_id>')
+def legacy_add_to_cart(product_id):
+    cart = session.get('cart', {})
+    key = str(product_id)
+    cart[key] = cart.get(key, 0) + 1
+    session['cart'] = cart
+    session.modified = True
+    return redirect('/')
+
+
+def measure(client):
+    cookie = client.get_cookie('session').value
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.get('/add_to_cart/1')
+    elapsed = (time.perf_counter() - started) / REQUESTS
+    return len(cookie), elapsed * 1e6
+
+
+def main():
+    storefront.cart_store = CartStore(SQLiteCartBackend(os.path.join(tempfile.mkdtemp(), 'carts.db')))
+    # Skip flash messages so only the cart contributes to the cookie
+    storefront.flash = lambda *args, **kwargs: None
+
+    print(f"{'lines':>6} {'cookie bytes':>13} {'cookie us':>10} {'server bytes':>13} {'server us':>10}")
+    for lines in LINES:
+        cart = {str(i): 1 for i in range(1, lines + 1)}
+
+        legacy_client = legacy.test_client()
+        with legacy_client.session_transaction() as sess:
+            sess['cart'] = dict(cart)
+        cookie_bytes, cookie_us = measure(legacy_client)
+
+        client = storefront.app.test_client()
+        with client.session_transaction() as sess:
+            sess['username'] = 'bench'
+            sess['cart_id'] = f'bench-{lines}'
+        storefront.cart_store.mutate(f'bench-{lines}', lambda items: items.update(cart))
+        with client.session_transaction() as sess:
+            sess['cart_v'] = storefront.cart_store.backend.load(f'bench-{lines}')[0]
+        server_bytes, server_us = measure(client)
+
+        print(f'{lines:>6} {cookie_bytes:>13} {cookie_us:>10.0f} {server_bytes:>13} {server_us:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
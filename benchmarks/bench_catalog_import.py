@@ -0,0 +1,119 @@
+"""Bulk catalog import of 500k rows: throughput, memory and live apply.
+
+    python benchmarks/bench_catalog_import.py [rows]
+
+Writes a synthetic CSV catalog to a temp directory and imports it into an
+empty snapshot. Then edits it the way a price update does (1% of prices
+changed, 1,000 products dropped, 1,000 added) and imports it again:
+
+    import    rows/s for the first load and for the update, plus the
+              traced peak memory of the update against what holding the
+              parsed rows in a list would take
+    apply     a worker with the 500k catalog and its search index picks
+              up the update through CatalogWatcher (only changed rows
+              touched) vs replacing the whole catalog
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from catalog import CATEGORIES, Catalog
+from catalog_io import FIELDS, CatalogWatcher, import_catalog, read_rows, read_snapshot, validate
+from search import SearchIndex
+
+
+CHANGED_SHARE = 0.01
+DROPPED = 1000
+ADDED = 1000
+
+
+def synthetic_rows(n, rng, start=1):
+    for i in range(start, start + n):
+        yield {'id': i, 'category': CATEGORIES[i % len(CATEGORIES)], 'name': f'Pickle {i}',
+               'price': 100 + (i * 37) % 400, 'image': f'https://example.invalid/{i}.jpg',
+               'description': f'Small batch pickle number {i}, {rng.choice(("spicy", "tangy", "sweet"))}'}
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def edited(rows, rng, n):
+    dropped = set(rng.sample(range(1, n + 1), DROPPED))
+    for row in rows:
+        if row['id'] in dropped:
+            continue
+        if rng.random() < CHANGED_SHARE:
+            row = dict(row, price=row['price'] + 10)
+        yield row
+    yield from synthetic_rows(ADDED, rng, start=n + 1)
+
+
+def report_line(label, report):
+    return (f"{label}: {report['rows']:,} rows in {report['seconds']:.1f} s "
+            f"({report['rows'] / report['seconds']:,.0f} rows/s): {report['added']:,} added, "
+            f"{report['changed']:,} changed, {report['removed']:,} removed, {report['unchanged']:,} unchanged")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = os.path.join(directory, 'catalog.jsonl')
+        first = os.path.join(directory, 'catalog.csv')
+        update = os.path.join(directory, 'update.csv')
+        write_csv(first, synthetic_rows(n, random.Random(1)))
+        write_csv(update, edited(synthetic_rows(n, random.Random(1)), random.Random(2), n))
+        print(f'{n:,}-row CSV: {os.path.getsize(first) / 2**20:.0f} MiB')
+
+        print(report_line('first import', import_catalog(first, snapshot)))
+
+        # A worker that loaded the first snapshot
+        catalog = Catalog(read_snapshot(snapshot))
+        search = SearchIndex(catalog)
+        watcher = CatalogWatcher(catalog, snapshot)
+        watcher.check()
+
+        report = import_catalog(update, snapshot, dry_run=True)
+        print(report_line('update dry run', report))
+        expected_changes = report['added'] + report['changed'] + report['removed']
+
+        tracemalloc.start()
+        report = import_catalog(update, snapshot)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(report_line('update import (traced, so slower)', report))
+
+        tracemalloc.start()
+        with open(update, encoding='utf-8', newline='') as f:
+            rows = [validate(line, raw) for line, raw in read_rows(f, 'csv')]
+        _, held = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del rows
+        print(f'import peak traced memory {peak / 2**20:.0f} MiB; the parsed rows alone in a list: '
+              f'{held / 2**20:.0f} MiB')
+
+        started = time.perf_counter()
+        changed = watcher.check()
+        print(f'worker apply of the new snapshot: {(time.perf_counter() - started) * 1e3:,.0f} ms, '
+              f'{len(changed):,} products changed, search index patched')
+        assert len(changed) == expected_changes, (len(changed), expected_changes)
+        assert len(catalog) == n - DROPPED + ADDED
+        assert search.search(q=str(n + ADDED))[0][0]['id'] == n + ADDED
+
+        products = list(read_snapshot(snapshot))
+        started = time.perf_counter()
+        catalog.replace(products)
+        print(f'full catalog replace + search rebuild: {(time.perf_counter() - started) * 1e3:,.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Flash sale on one SKU: thousands of concurrent checkouts, no overselling.
+
+    python benchmarks/bench_inventory.py [checkouts] [stock]
+
+Several simulated workers (separate Inventory instances, so separate
+hot-counter pools) share one in-memory inventory table and reservations
+table. Writes to any single table item are serialized with a fixed
+service time, the way DynamoDB throttles a hot partition key. Every
+shopper reserves 1-3 units and checks out; some abandon their carts,
+whose reservations expire and are swept back into stock.
+
+At the end every unit must be accounted for: sold + still in the table
+== initial stock, and nothing is left reserved. Run once with batched
+pools and once with batch_size=1 (every reservation a conditional update
+on the one inventory item) to compare throughput.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from inventory import EXPIRY_INDEX, Inventory, OutOfStock
+from local_aws import LocalTable
+
+
+PRODUCT_ID = 3
+WORKERS = 4
+THREADS_PER_WORKER = 32
+# Per-item write service time; ~1000 writes/s on one key
+ITEM_WRITE_SECONDS = 0.001
+ABANDON_RATE = 0.1
+
+
+class HotKeyTable:
+    """Wraps a LocalTable so writes to the same item queue up behind each other."""
+
+    def __init__(self, table, write_seconds):
+        self._table = table
+        self._write_seconds = write_seconds
+        self._locks = defaultdict(threading.Lock)
+
+    def _serialized(self, method, Key=None, Item=None, **kwargs):
+        key = Key if Key is not None else Item
+        with self._locks[tuple(sorted((k, str(key[k])) for k in (self._table.hash_key, self._table.range_key) if k))]:
+            time.sleep(self._write_seconds)
+            if Item is not None:
+                return method(Item=Item, **kwargs)
+            return method(Key=Key, **kwargs)
+
+    def update_item(self, **kwargs):
+        return self._serialized(self._table.update_item, **kwargs)
+
+    def put_item(self, **kwargs):
+        return self._serialized(self._table.put_item, **kwargs)
+
+    def delete_item(self, **kwargs):
+        return self._serialized(self._table.delete_item, **kwargs)
+
+    def __getattr__(self, attribute):
+        return getattr(self._table, attribute)
+
+
+def run(checkouts, stock, batch_size):
+    stock_table = LocalTable('inventory', 'product_id')
+    reservations = LocalTable('stock_reservations', 'cart_id', 'product_id',
+                              indexes={EXPIRY_INDEX: ('expiry_bucket', 'expires_at')})
+    hot_stock = HotKeyTable(stock_table, ITEM_WRITE_SECONDS)
+    workers = [Inventory(hot_stock, reservations, batch_size=batch_size, pool_idle=0.2, reservation_ttl=1,
+                         sweep_interval=0.2)
+               for _ in range(WORKERS)]
+    workers[0].set_stock(PRODUCT_ID, stock)
+
+    sold = []
+    refused = []
+    abandoned = []
+    lock = threading.Lock()
+    rng = random.Random(1)
+    plans = [(i % WORKERS, rng.randint(1, 3), rng.random() < ABANDON_RATE) for i in range(checkouts)]
+
+    def shopper(i):
+        worker, quantity, abandon = plans[i]
+        inventory = workers[worker]
+        cart_id = f'cart-{i}'
+        try:
+            inventory.hold(cart_id, PRODUCT_ID, quantity)
+            if abandon:
+                with lock:
+                    abandoned.append(quantity)
+                return
+            units = inventory.checkout(cart_id, {PRODUCT_ID: quantity})
+            with lock:
+                sold.append(units.get(PRODUCT_ID, 0))
+        except OutOfStock:
+            with lock:
+                refused.append(quantity)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(WORKERS * THREADS_PER_WORKER) as pool:
+        list(pool.map(shopper, range(checkouts)))
+    elapsed = time.perf_counter() - started
+
+    # Let abandoned reservations expire and come back, then drain every pool
+    time.sleep(1.5)
+    for inventory in workers:
+        inventory.sweep()
+        inventory.stop()
+
+    left = stock_table.get_item(Key={'product_id': PRODUCT_ID})['Item']['available']
+    units_sold = sum(sold)
+    print(f'batch_size={batch_size:<3} {checkouts} shoppers in {elapsed:.2f} s ({checkouts / elapsed:,.0f}/s): '
+          f'{len(sold)} orders, {units_sold} units sold, {len(refused)} refused, '
+          f'{len(abandoned)} abandoned carts expired; '
+          f'{stock_table.calls["UpdateItem"]} inventory item updates; {left} units left')
+    assert units_sold <= stock, 'oversold'
+    assert units_sold + left == stock, f'lost units: sold {units_sold} + left {left} != {stock}'
+    assert reservations.item_count() == 0, 'reservations left behind'
+
+
+def main():
+    checkouts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    stock = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    for batch_size in (1, 20):
+        run(checkouts, stock, batch_size)
+    print('no overselling; every unit accounted for')
+
+
+if __name__ == '__main__':
+    main()
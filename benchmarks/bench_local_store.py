@@ -0,0 +1,63 @@
+"""Read latency of the local contact store at 1k, 100k and 1M entries.
+
+    python benchmarks/bench_local_store.py
+
+Compares the old readlines() of the whole contacts file with the newest-50
+page from the SQLite (WAL) and text-file backends.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from local_store import SQLiteStore, TextFileStore
+
+
+SIZES = (1000, 100000, 1000000)
+PAGE = 50
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1e3, result
+
+
+def populate(store, n):
+    batch = 50000
+    for start in range(0, n, batch):
+        store.append_many('contacts', (f'Customer {i} (c{i}@example.com): message number {i}'
+                                       for i in range(start, min(n, start + batch))))
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='local-store-')
+    print(f"{'entries':>8} {'readlines ms':>13} {'sqlite ms':>10} {'sqlite p2':>10} {'file ms':>8} {'file p2':>8}")
+    try:
+        for size in SIZES:
+            sqlite_store = SQLiteStore(os.path.join(workdir, f'{size}.db'))
+            file_store = TextFileStore(os.path.join(workdir, str(size)))
+            populate(sqlite_store, size)
+            populate(file_store, size)
+            legacy_path = file_store._path('contacts')
+
+            def readlines():
+                with open(legacy_path) as f:
+                    return f.readlines()
+
+            legacy_ms, _ = timed(readlines, 3)
+            sqlite_ms, (_, sqlite_cursor) = timed(lambda: sqlite_store.latest('contacts', PAGE), 200)
+            sqlite_p2, _ = timed(lambda: sqlite_store.latest('contacts', PAGE, sqlite_cursor), 200)
+            file_ms, (_, file_cursor) = timed(lambda: file_store.latest('contacts', PAGE), 200)
+            file_p2, _ = timed(lambda: file_store.latest('contacts', PAGE, file_cursor), 200)
+            print(f'{size:>8} {legacy_ms:>13.2f} {sqlite_ms:>10.3f} {sqlite_p2:>10.3f} {file_ms:>8.3f} {file_p2:>8.3f}')
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
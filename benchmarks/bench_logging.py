@@ -0,0 +1,129 @@
+"""Request latency with logging off, synchronous handlers, and the queue pipeline.
+
+    python benchmarks/bench_logging.py [orders] [sink-delay-ms]
+
+Each order is one POST /place_order (4-5 log lines plus the access line)
+followed by GET /reviews. Log output goes to files in a temp directory;
+every flush to them is delayed by `sink-delay-ms` (default 0.5 ms), standing
+in for a busy disk or a console pipe that the log collector drains slowly.
+
+    off      logging disabled
+    sync     the previous setup: FileHandler + StreamHandler on the request thread
+    queued   log_pipeline: JSON records written by a listener thread
+    sampled  queued, plus LOG_SAMPLE_RATE sampling of routine order lines
+"""
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+os.environ['AWS_ENDPOINT_URL'] = 'inprocess'
+os.chdir(tempfile.mkdtemp())
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as storefront
+from log_pipeline import ContextFilter, LogPipeline, SamplingFilter, build_handlers
+
+
+class SlowFile:
+    def __init__(self, f, delay):
+        self.f = f
+        self.delay = delay
+
+    def write(self, data):
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+        time.sleep(self.delay)
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+def slow_handlers(directory, delay, pipeline):
+    if pipeline:
+        handlers = build_handlers(os.path.join(directory, 'app.log'), console=False)
+    else:
+        handlers = [logging.FileHandler(os.path.join(directory, 'app.log'))]
+    console = logging.StreamHandler(open(os.path.join(directory, 'console.log'), 'w'))
+    console.setFormatter(handlers[0].formatter)
+    handlers.append(console)
+    for handler in handlers:
+        handler.stream = SlowFile(handler.stream, delay)
+    return handlers
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging.disable(logging.NOTSET)
+
+
+def run(client, n):
+    latencies = []
+    for _ in range(n):
+        cart_id = uuid.uuid4().hex
+        version, _ = storefront.cart_store.mutate(cart_id, lambda items: items.update({'1': 1, '9': 2}))
+        with client.session_transaction() as sess:
+            sess['cart_id'] = cart_id
+            sess['cart_v'] = version
+            sess.pop('_flashes', None)
+        started = time.perf_counter()
+        client.post('/place_order', data={'name': 'Bench', 'email': 'bench@example.com',
+                                          'idempotency_key': str(uuid.uuid4())})
+        client.get('/reviews')
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return statistics.median(latencies) * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    delay = float(sys.argv[2]) / 1e3 if len(sys.argv) > 2 else 0.0005
+    storefront.log_pipeline.stop()
+    storefront.send_order_email = lambda to_email, summary: None
+
+    client = storefront.app.test_client()
+    with client.session_transaction() as sess:
+        sess['username'] = 'bench'
+    run(client, 50)
+
+    results = {}
+    for mode in ('off', 'sync', 'queued', 'sampled'):
+        reset_root()
+        directory = tempfile.mkdtemp(prefix=f'logs-{mode}-')
+        pipeline = None
+        if mode == 'off':
+            logging.disable(logging.CRITICAL)
+        elif mode == 'sync':
+            logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                                handlers=slow_handlers(directory, delay, pipeline=False), force=True)
+        else:
+            rates = dict.fromkeys(storefront.SAMPLED_LOG_MESSAGES, storefront.LOG_SAMPLE_RATE if mode == 'sampled' else 1)
+            pipeline = LogPipeline(slow_handlers(directory, delay, pipeline=True), level=logging.INFO,
+                                   filters=[ContextFilter(storefront._log_context), SamplingFilter(rates)]).start()
+        results[mode] = run(client, n)
+        drain_started = time.perf_counter()
+        if pipeline is not None:
+            pipeline.stop()
+        drained = time.perf_counter() - drain_started
+        lines = 0
+        if mode != 'off':
+            with open(os.path.join(directory, 'app.log')) as f:
+                lines = sum(1 for _ in f)
+        results[mode] += (lines, drained * 1e3)
+
+    reset_root()
+    print(f'{n} orders, {delay * 1e3:.1f} ms per log flush')
+    print(f"{'mode':<8} {'p50 ms':>8} {'p99 ms':>8} {'log lines':>10} {'drain ms':>9}")
+    for mode, (p50, p99, lines, drained) in results.items():
+        print(f'{mode:<8} {p50:>8.2f} {p99:>8.2f} {lines:>10} {drained:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Logins/sec at different password-hash work factors.
+
+    python benchmarks/bench_logins.py [seconds-per-case] [client-threads]
+
+Each case registers a few users with the given werkzeug hash method, then
+client threads call UserStore.verify() in a loop. "cold" disables the
+verification cache so every login pays the full hash; "cached" shows
+repeat logins within the cache TTL.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from users import SQLiteUserBackend, UserStore
+
+
+METHODS = (
+    'pbkdf2:sha256:10000',
+    'pbkdf2:sha256:100000',
+    'pbkdf2:sha256:600000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+)
+USERS = 8
+
+
+def logins_per_second(store, seconds, threads):
+    count = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def client(i):
+        username = f'user{i % USERS}'
+        while time.perf_counter() < deadline:
+            assert store.verify(username, f'password-{username}')
+            count[i] += 1
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(count) / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    workdir = tempfile.mkdtemp(prefix='users-')
+
+    print(f"{'hash method':<24} {'cold logins/s':>14} {'cached logins/s':>16}")
+    for n, method in enumerate(METHODS):
+        backend = SQLiteUserBackend(os.path.join(workdir, f'{n}.db'))
+        cold = UserStore(backend, hash_method=method, cache_ttl=0, max_pending=threads * 2)
+        for i in range(USERS):
+            cold.create(f'user{i}', f'password-user{i}')
+        cached = UserStore(backend, hash_method=method, max_pending=threads * 2)
+
+        cold_rate = logins_per_second(cold, seconds, threads)
+        cached_rate = logins_per_second(cached, seconds, threads)
+        print(f'{method:<24} {cold_rate:>14.1f} {cached_rate:>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
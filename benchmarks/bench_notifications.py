@@ -0,0 +1,85 @@
+"""place_order latency with inline vs. queued notifications.
+
+    python benchmarks/bench_notifications.py [orders]
+
+Runs a local SMTP sink (with 20 ms per message, roughly a fast relay) and a
+stubbed SNS client, then places orders through the Flask test client.
+"inline" sends each email over a fresh SMTP connection on the request
+thread, as the app used to; "queued" goes through the notifier. Reports
+request latency and confirms every message reached the sink.
+"""
+import logging
+import os
+import smtplib
+import sys
+import time
+import uuid
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as storefront
+from local_aws import LocalSNS, LocalTable
+from notifications import NotificationDispatcher, SMTPConnection
+from smtp_sink import SMTPSink
+
+
+def inline_send(sink):
+    def send_order_email(to_email, order_summary):
+        msg = MIMEText(order_summary)
+        msg['Subject'] = 'Your Order Confirmation'
+        msg['From'] = storefront.EMAIL_USER
+        msg['To'] = to_email
+        with smtplib.SMTP(sink.host, sink.port) as server:
+            server.send_message(msg)
+    return send_order_email
+
+
+def place_orders(client, n):
+    latencies = []
+    for _ in range(n):
+        cart_id = uuid.uuid4().hex
+        version, _ = storefront.cart_store.mutate(cart_id, lambda items: items.update({'1': 1, '5': 2}))
+        with client.session_transaction() as sess:
+            sess['cart_id'] = cart_id
+            sess['cart_v'] = version
+        started = time.perf_counter()
+        client.post('/place_order', data={'name': 'Bench', 'address': 'Here', 'email': 'bench@example.com'})
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    logging.disable(logging.INFO)
+    sink = SMTPSink(delay=0.02).start()
+    sns = LocalSNS()
+    storefront.orders_table = storefront.order_writer.table = LocalTable('PickleOrders', 'order_id')
+    storefront.ORDER_TOPIC_ARN = 'arn:aws:sns:local:000000000000:orders'
+    storefront.notifier = NotificationDispatcher(
+        smtp_factory=lambda: SMTPConnection(sink.host, sink.port, use_tls=False),
+        sns_client=sns, sender=storefront.EMAIL_USER, workers=4, dead_letter_file=None)
+
+    client = storefront.app.test_client()
+    with client.session_transaction() as sess:
+        sess['username'] = 'bench'
+
+    queued_send = storefront.send_order_email
+    storefront.send_order_email = inline_send(sink)
+    inline = place_orders(client, n)
+
+    storefront.send_order_email = queued_send
+    queued = place_orders(client, n)
+    storefront.notifier.stop(timeout=60)
+
+    print(f"{'mode':<8} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'inline':<8} {inline[0]:>8.2f} {inline[1]:>8.2f}")
+    print(f"{'queued':<8} {queued[0]:>8.2f} {queued[1]:>8.2f}")
+    print(f'emails received: {len(sink.messages)} / {2 * n} over {sink.connections} SMTP connections')
+    print(f'SNS messages published: {len(sns.published)} / {2 * n}')
+    sink.stop()
+
+
+if __name__ == '__main__':
+    main()
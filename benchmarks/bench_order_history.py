@@ -0,0 +1,164 @@
+"""Order history and sales dashboards over 1M synthetic orders.
+
+    python benchmarks/bench_order_history.py [orders] [users]
+
+Loads the orders into an in-process orders table with the
+username/created_at GSI, feeding them through SalesRollups in 500-order
+batches as the OrderWriter would. Then compares:
+
+    history   a user's newest page via the GSI (and paging through the
+              heaviest user) vs a filtered scan of the whole table
+    dashboard a 30-day report from the rollup rows vs recomputing it by
+              scanning every order
+
+Item reads are counted by the stand-in, and the 30-day report is checked
+against totals computed while generating the orders.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from boto3.dynamodb.conditions import Attr
+
+from local_aws import LocalTable
+from orders import ORDERS_BY_USER_INDEX, OrderHistory
+from sales import SalesRollups, order_deltas
+
+
+PRODUCTS = {i: 100 + 25 * i for i in range(1, 31)}
+DAYS = 365
+REPORT_DAYS = 30
+BATCH = 500
+
+
+def generate(n, users, table, rollups, today):
+    rng = random.Random(42)
+    start = datetime.combine(today - timedelta(days=DAYS - 1), datetime.min.time())
+    window = (today - timedelta(days=REPORT_DAYS - 1)).isoformat()
+    expected = Counter()
+    per_user = Counter()
+    batch = []
+    for i in range(n):
+        # Half the orders come from 1% of customers, who end up with hundreds each
+        user = f'user{rng.randrange(max(1, users // 100)) if i % 2 else rng.randrange(users)}'
+        # Orders arrive in time order, so each batch covers a few hours
+        created = start + timedelta(seconds=i * DAYS * 86400 // n)
+        items = [{'id': product_id, 'name': f'Product {product_id}', 'quantity': rng.randint(1, 3),
+                  'price': PRODUCTS[product_id]}
+                 for product_id in rng.sample(list(PRODUCTS), rng.randint(1, 3))]
+        order = {'order_id': str(uuid.UUID(int=rng.getrandbits(128))), 'username': user,
+                 'created_at': created.isoformat(), 'items': items,
+                 'total': sum(item['price'] * item['quantity'] for item in items) + 50}
+        per_user[user] += 1
+        if order['created_at'][:10] >= window:
+            expected['orders'] += 1
+            expected['revenue'] += order['total'] - 50
+            expected['units'] += sum(item['quantity'] for item in items)
+        batch.append(order)
+        if len(batch) == BATCH:
+            flush(table, rollups, batch)
+            batch = []
+    if batch:
+        flush(table, rollups, batch)
+    return expected, per_user
+
+
+def flush(table, rollups, batch):
+    with table.batch_writer() as writer:
+        for order in batch:
+            writer.put_item(Item=order)
+    rollups.apply(batch)
+
+
+def timed(fn, runs):
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return statistics.median(latencies) * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    today = date.today()
+    orders_table = LocalTable('PickleOrders', 'order_id', indexes={ORDERS_BY_USER_INDEX: ('username', 'created_at')})
+    rollups_table = LocalTable('sales_rollups', 'day', 'product_id')
+    rollups = SalesRollups(rollups_table)
+    history = OrderHistory(orders_table, page_size=20)
+
+    started = time.perf_counter()
+    expected, per_user = generate(n, users, orders_table, rollups, today)
+    print(f'{n:,} orders for {len(per_user):,} users loaded in {time.perf_counter() - started:.0f} s; '
+          f'{rollups.updates:,} rollup updates ({rollups_table.item_count():,} rollup rows)')
+
+    # -------- history --------
+    rng = random.Random(7)
+    sample = rng.sample(sorted(per_user), 1000)
+    p50, p99 = timed(lambda: history.page(sample[rng.randrange(len(sample))]), 1000)
+    print(f'history, first page of 20 via GSI: p50 {p50:.3f} ms, p99 {p99:.3f} ms')
+
+    heaviest, count = per_user.most_common(1)[0]
+    reads = orders_table.read_items
+    started = time.perf_counter()
+    cursor, pages, seen = None, 0, 0
+    while True:
+        page, cursor = history.page(heaviest, cursor)
+        pages += 1
+        seen += len(page)
+        if not cursor:
+            break
+    print(f'history, all {seen:,} orders of the heaviest user in {pages} pages: '
+          f'{(time.perf_counter() - started) * 1e3:.0f} ms, {orders_table.read_items - reads:,} items read')
+    assert seen == count
+
+    reads = orders_table.read_items
+    started = time.perf_counter()
+    kwargs, found = {'FilterExpression': Attr('username').eq(sample[0])}, 0
+    while True:
+        response = orders_table.scan(**kwargs)
+        found += len(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    print(f'history by table scan (one user, {found} orders): {(time.perf_counter() - started) * 1e3:,.0f} ms, '
+          f'{orders_table.read_items - reads:,} items read')
+
+    # -------- dashboard --------
+    start = today - timedelta(days=REPORT_DAYS - 1)
+    reads = rollups_table.read_items
+    p50, p99 = timed(lambda: rollups.report(start, today), 20)
+    report = rollups.report(start, today)
+    print(f'{REPORT_DAYS}-day dashboard from rollups: p50 {p50:.1f} ms, p99 {p99:.1f} ms, '
+          f'{(rollups_table.read_items - reads) // 21:,} rollup rows read per report')
+    assert (report['orders'], report['revenue'], report['units']) == \
+        (expected['orders'], expected['revenue'], expected['units']), (report, expected)
+
+    reads = orders_table.read_items
+    started = time.perf_counter()
+    window = start.isoformat()
+    kwargs, recent = {'FilterExpression': Attr('created_at').gte(window)}, []
+    while True:
+        response = orders_table.scan(**kwargs)
+        recent.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    deltas = order_deltas(recent)
+    print(f'{REPORT_DAYS}-day dashboard by scanning orders: {(time.perf_counter() - started) * 1e3:,.0f} ms, '
+          f'{orders_table.read_items - reads:,} items read')
+    assert sum(row['orders'] for (day, product_id), row in deltas.items() if product_id == 0) == report['orders']
+    print('rollup totals match the orders')
+
+
+if __name__ == '__main__':
+    main()
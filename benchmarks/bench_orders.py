@@ -0,0 +1,103 @@
+"""Place 10k orders through the write-behind order path.
+
+    python benchmarks/bench_orders.py [orders] [table-latency-ms]
+
+Orders go through /place_order with the Flask test client. The orders
+table is an in-process stand-in that adds the given latency to every
+DynamoDB call (default 2 ms). The baseline runs the same requests with
+one synchronous put_item per order, the way save_order_to_dynamodb used to. 100 orders are then
+resubmitted with their original idempotency keys to check that none are
+double-booked.
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as storefront
+from cart_store import CartStore, SQLiteCartBackend
+from local_aws import LocalSNS, LocalTable
+from orders import OrderWriter
+
+
+class SyncWriter:
+    # The old path: one put_item per order on the request thread
+    def __init__(self, table):
+        self.table = table
+
+    def submit(self, order):
+        self.table.put_item(Item=order)
+        return True
+
+    def is_duplicate(self, order_id):
+        return False
+
+
+def place_orders(client, keys, cart):
+    for key in keys:
+        cart_id = uuid.uuid4().hex
+        version, _ = storefront.cart_store.mutate(cart_id, lambda items: items.update(cart))
+        with client.session_transaction() as sess:
+            sess['cart_id'] = cart_id
+            sess['cart_v'] = version
+            # The pages never display flashes, so drop them before they pile up
+            sess.pop('_flashes', None)
+        client.post('/place_order', data={'name': 'Bench', 'idempotency_key': key})
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    latency = float(sys.argv[2]) / 1e3 if len(sys.argv) > 2 else 0.002
+    logging.disable(logging.INFO)
+
+    storefront.notifier.sns_client = LocalSNS()
+    storefront.cart_store = CartStore(SQLiteCartBackend(os.path.join(tempfile.mkdtemp(), 'carts.db')))
+    storefront.send_order_email = lambda to_email, summary: None
+    client = storefront.app.test_client()
+    with client.session_transaction() as sess:
+        sess['username'] = 'bench'
+    keys = [str(uuid.uuid4()) for _ in range(n)]
+
+    baseline_n = min(n, 2000)
+    storefront.order_writer = SyncWriter(LocalTable('PickleOrders', 'order_id', latency=latency))
+    started = time.perf_counter()
+    place_orders(client, keys[:baseline_n], {'1': 1, '9': 2})
+    baseline_rate = baseline_n / (time.perf_counter() - started)
+
+    journal_dir = tempfile.mkdtemp(prefix='order-journal-')
+    table = LocalTable('PickleOrders', 'order_id', latency=latency)
+    writer = OrderWriter(table, journal_dir)
+    storefront.order_writer = writer
+
+    started = time.perf_counter()
+    place_orders(client, keys, {'1': 1, '9': 2})
+    accepted_at = time.perf_counter()
+    depth = writer.stats()['queue_depth']
+
+    # Retries of already accepted checkouts must not create new rows
+    place_orders(client, keys[:100], {'1': 1})
+
+    writer.stop(timeout=120)
+    drained_at = time.perf_counter()
+    stats = writer.stats()
+
+    print(f'orders placed:          {n} (table latency {latency * 1e3:.0f} ms/call)')
+    print(f'sync put_item:          {baseline_rate:,.0f} orders/sec ({baseline_n} orders)')
+    print(f'write-behind accept:    {n / (accepted_at - started):,.0f} orders/sec')
+    print(f'write-behind flushed:   {n / (drained_at - started):,.0f} orders/sec (until drained)')
+    print(f'queue depth at end:     {depth}')
+    print(f'BatchWriteItem calls:   {table.calls["BatchWriteItem"]}')
+    print(f'flushes:                {stats["flushes"]}, avg {stats["flush_latency_avg_ms"]:.1f} ms, '
+          f'max {stats["flush_latency_max_ms"]:.1f} ms')
+    print(f'duplicates rejected:    {stats["orders_duplicate"]}')
+    print(f'rows in table:          {table.item_count()} (expected {n})')
+    shutil.rmtree(journal_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Pricing 100-line carts against 10k active promotion rules.
+
+    python benchmarks/bench_pricing.py [rules] [lines]
+
+Builds a 10k-product catalog and a rule set of product discounts,
+quantity tiers, category discounts, catch-all tiers, coupons and
+shipping tiers. Each cart is priced three ways:
+
+    linear    every rule checked against every line (what pricing looks
+              like without the index), also used to check the totals
+    indexed   PricingEngine.quote() with no memo key
+    memoized  PricingEngine.quote() for a cart version priced before
+
+Indexed and linear quotes must agree line for line.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from catalog import CATEGORIES, Catalog
+from pricing import PricingEngine
+
+
+PRODUCTS = 10000
+CARTS = 50
+
+
+def synthetic_products(n):
+    return [{'id': i, 'category': CATEGORIES[i % len(CATEGORIES)], 'name': f'Product {i}',
+             'price': 100 + (i * 37) % 400, 'image': f'https://example.invalid/{i}.jpg'}
+            for i in range(1, n + 1)]
+
+
+def synthetic_rules(n, rng):
+    rules = [{'id': 'standard-shipping', 'kind': 'shipping', 'amount': 50},
+             {'id': 'free-shipping', 'kind': 'shipping', 'amount': 0, 'min_subtotal': 2000}]
+    for i in range(n - len(rules)):
+        roll = rng.random()
+        rule = {'id': f'rule-{i}', 'kind': 'discount'}
+        if roll < 0.85:
+            rule['product_id'] = rng.randint(1, PRODUCTS)
+        elif roll < 0.95:
+            rule['category'] = rng.choice(CATEGORIES)
+        elif roll < 0.97:
+            pass
+        else:
+            rule.update(kind='coupon', code=f'SAVE{i}', min_subtotal=rng.choice((0, 500, 5000)))
+            if rng.random() < 0.5:
+                rule['category'] = rng.choice(CATEGORIES)
+        if rng.random() < 0.4:
+            rule['min_quantity'] = rng.randint(2, 10)
+        if rng.random() < 0.6:
+            rule['percent'] = rng.randint(1, 30)
+        else:
+            rule['amount_off'] = rng.randint(5, 60)
+        rules.append(rule)
+    return rules
+
+
+def linear_discounts(rules, catalog, cart):
+    # Best discount per line with every rule considered
+    best = {}
+    for product_id, quantity in cart.items():
+        product = catalog.get(product_id)
+        top = 0
+        for rule in rules:
+            if rule['kind'] != 'discount' or quantity < rule.get('min_quantity', 1):
+                continue
+            if rule.get('product_id') is not None and rule['product_id'] != product['id']:
+                continue
+            if rule.get('category') is not None and rule['category'] != product['category']:
+                continue
+            if 'percent' in rule:
+                amount = product['price'] * quantity * rule['percent'] // 100
+            else:
+                amount = min(rule['amount_off'], product['price']) * quantity
+            top = max(top, amount)
+        best[product['id']] = top
+    return best
+
+
+def timed(fn, carts, runs=1):
+    latencies = []
+    for cart in carts:
+        for _ in range(runs):
+            started = time.perf_counter()
+            fn(cart)
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return statistics.median(latencies) * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3
+
+
+def main():
+    n_rules = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rng = random.Random(5)
+    catalog = Catalog(synthetic_products(PRODUCTS))
+    rules = synthetic_rules(n_rules, rng)
+
+    started = time.perf_counter()
+    pricing = PricingEngine(catalog, rules)
+    print(f'{len(rules):,} rules compiled in {(time.perf_counter() - started) * 1e3:.0f} ms')
+
+    carts = [{str(product_id): rng.randint(1, 12) for product_id in rng.sample(range(1, PRODUCTS + 1), lines)}
+             for _ in range(CARTS)]
+    coupons = [rule['code'] for rule in rules if rule['kind'] == 'coupon']
+
+    p50, p99 = timed(lambda cart: linear_discounts(rules, catalog, cart), carts[:5])
+    print(f'{lines}-line cart, linear over all rules: p50 {p50:.1f} ms')
+
+    p50, p99 = timed(lambda cart: pricing.quote(cart, rng.choice(coupons)), carts, runs=20)
+    print(f'{lines}-line cart, indexed:               p50 {p50:.3f} ms, p99 {p99:.3f} ms')
+
+    for i, cart in enumerate(carts):
+        pricing.quote(cart, cart_key=('cart', i))
+    p50, p99 = timed(lambda pair: pricing.quote(pair[1], cart_key=('cart', pair[0])), list(enumerate(carts)),
+                     runs=20)
+    print(f'{lines}-line cart, memoized:              p50 {p50 * 1e3:.1f} us, p99 {p99 * 1e3:.1f} us '
+          f'({pricing.hits:,} hits, {pricing.misses:,} misses)')
+
+    for cart in carts[:5]:
+        quote = pricing.quote(cart)
+        assert {item['id']: item['discount'] for item in quote['items']} == linear_discounts(rules, catalog, cart)
+        coupon = pricing.quote(cart, coupons[0])
+        assert coupon['total'] == quote['total'] - coupon['coupon_discount'] + coupon['shipping'] - quote['shipping']
+        assert sum(item['coupon_discount'] for item in coupon['items']) == coupon['coupon_discount']
+    print('indexed discounts match the linear scan')
+
+
+if __name__ == '__main__':
+    main()
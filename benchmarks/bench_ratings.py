@@ -0,0 +1,112 @@
+"""Product-grid ratings from aggregates vs from the reviews themselves.
+
+    python benchmarks/bench_ratings.py [reviews] [products]
+
+Writes the reviews from several threads through RatingAggregates.record,
+as concurrent workers would, into in-process reviews and product_ratings
+tables. Then compares:
+
+    grid      average + count for every product from the in-memory
+              aggregates (and from a forced re-read of the aggregate table)
+              vs scanning every review
+    repair    check and rebuild, one streaming pass over the reviews, after
+              corrupting some aggregates; peak traced memory is reported to
+              show the pass holds a page of reviews, not the table
+
+The check must find nothing wrong after the concurrent writes, and
+nothing wrong again after the rebuild.
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from local_aws import LocalTable
+from ratings import RatingAggregates, aggregate, iter_reviews
+
+
+THREADS = 8
+CORRUPTED = 50
+
+
+def write_reviews(n, products, reviews_table, ratings):
+    def writer(offset):
+        rng = random.Random(offset)
+        for i in range(offset, n, THREADS):
+            product_id = rng.randint(1, products)
+            rating = rng.choice((1, 2, 3, 4, 4, 5, 5, 5))
+            reviews_table.put_item(Item={'id': str(uuid.UUID(int=rng.getrandbits(128))), 'user': f'user{i}',
+                                         'review': 'Tasty', 'product_id': product_id, 'rating': rating})
+            ratings.record(product_id, rating)
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(writer, range(THREADS)))
+
+
+def timed(fn, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        result = fn()
+    return (time.perf_counter() - started) / runs * 1e3, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    reviews_table = LocalTable('reviews', 'id')
+    ratings_table = LocalTable('product_ratings', 'product_id')
+    ratings = RatingAggregates(ratings_table, refresh_interval=3600)
+
+    started = time.perf_counter()
+    write_reviews(n, products, reviews_table, ratings)
+    elapsed = time.perf_counter() - started
+    print(f'{n:,} rated reviews of {products:,} products written from {THREADS} threads in {elapsed:.1f} s '
+          f'({n / elapsed:,.0f}/s)')
+    assert not ratings.check(reviews_table), 'aggregates drifted under concurrent writes'
+    print('aggregates match the reviews after concurrent writes')
+
+    # -------- grid --------
+    ms, summaries = timed(ratings.summaries, 1000)
+    print(f'grid ratings from memory: {ms * 1e3:.1f} us for {len(summaries):,} products')
+
+    reads = ratings_table.read_items
+    ms, _ = timed(lambda: ratings.refresh(force=True), 20)
+    print(f'grid ratings after re-reading the aggregate table: {ms:.1f} ms, '
+          f'{(ratings_table.read_items - reads) // 20:,} rows read')
+
+    reads = reviews_table.read_items
+    ms, rows = timed(lambda: aggregate(iter_reviews(reviews_table)), 1)
+    print(f'grid ratings by scanning reviews: {ms:,.0f} ms, {reviews_table.read_items - reads:,} reviews read')
+    assert {product_id: row['count'] for product_id, row in rows.items()} == \
+        {product_id: summary['count'] for product_id, summary in summaries.items()}
+
+    # -------- repair --------
+    rng = random.Random(3)
+    for product_id in rng.sample(range(1, products + 1), CORRUPTED):
+        ratings_table.update_item(Key={'product_id': product_id}, UpdateExpression='ADD rating_count :one',
+                                  ExpressionAttributeValues={':one': 1})
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    mismatches = ratings.check(reviews_table)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'check: {len(mismatches)} bad aggregates found in {elapsed:.1f} s ({n / elapsed:,.0f} reviews/s), '
+          f'peak {peak / 2**20:.1f} MiB traced')
+    assert len(mismatches) == CORRUPTED
+
+    started = time.perf_counter()
+    rewritten = ratings.rebuild(reviews_table)
+    print(f'rebuild: {rewritten} aggregates rewritten in {time.perf_counter() - started:.1f} s')
+    assert rewritten == CORRUPTED and not ratings.check(reviews_table)
+    print('aggregates match the reviews after rebuild')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Per-request cost of /reviews as the review count grows.
+
+    python benchmarks/bench_reviews.py
+
+Runs against an in-process reviews table (local_aws.LocalTable with the
+feed/created_at GSI). For each table size it reports time and items read
+per request for the old full scan, the cached first page (refreshed on every
+request, so each hit pays the incremental watermark query) and a deep
+?cursor= page. Items read is what DynamoDB would bill as read capacity.
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as storefront
+from local_aws import LocalTable
+from reviews import ALL_REVIEWS, REVIEWS_INDEX, TIMESTAMP_FORMAT, ReviewStore
+
+
+SIZES = (1000, 10000, 100000)
+REQUESTS = 200
+
+
+def populated_table(n):
+    table = LocalTable('reviews', 'id', indexes={REVIEWS_INDEX: ('feed', 'created_at')})
+    start = datetime.now(timezone.utc) - timedelta(seconds=n)
+    for i in range(n):
+        table.put_item(Item={
+            'id': f'review-{i}',
+            'feed': ALL_REVIEWS,
+            'created_at': (start + timedelta(seconds=i)).strftime(TIMESTAMP_FORMAT),
+            'user': f'user{i % 50}',
+            'review': f'Review number {i}'
+        })
+    return table
+
+
+def measure(table, fn, requests=REQUESTS):
+    reads = table.read_items
+    started = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    elapsed = time.perf_counter() - started
+    return elapsed / requests * 1e6, (table.read_items - reads) / requests
+
+
+def main():
+    client = storefront.app.test_client()
+    print(f"{'reviews':>8} {'scan us':>10} {'scan reads':>11} {'page1 us':>9} {'reads':>6} {'deep us':>8} {'reads':>6}")
+    for size in SIZES:
+        table = populated_table(size)
+        store = ReviewStore(table, refresh_interval=0)
+        storefront.review_store = store
+
+        scan_us, scan_reads = measure(table, table.scan, requests=5)
+
+        def first_page():
+            storefront.response_cache.invalidate('review_list')
+            client.get('/reviews')
+
+        first_us, first_reads = measure(table, first_page)
+
+        # A cursor well past the in-memory window forces a real GSI query
+        middle = table.get_item(Key={'id': f'review-{size // 2}'})['Item']
+        _, cursor = store._query_page({k: middle[k] for k in ('id', 'feed', 'created_at')}, 20)
+        deep_us, deep_reads = measure(table, lambda: client.get('/reviews', query_string={'cursor': cursor}))
+
+        print(f'{size:>8} {scan_us:>10.0f} {scan_reads:>11.0f} {first_us:>9.0f} {first_reads:>6.0f} {deep_us:>8.0f} {deep_reads:>6.0f}')
+
+
+if __name__ == '__main__':
+    main()
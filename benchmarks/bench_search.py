@@ -0,0 +1,105 @@
+"""Query latency for the product search index at 100k synthetic products.
+
+    python benchmarks/bench_search.py [products] [queries-per-case]
+
+Builds a Catalog of synthetic products (names and descriptions drawn from
+a small vocabulary, so common words match tens of thousands of rows),
+then times SearchIndex.search() for typical /api/products queries,
+following cursors for a few pages. Also reports index build time and the
+cost of one incremental upsert compared with a full rebuild.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from catalog import CATEGORIES, Catalog
+from search import SearchIndex
+
+
+FLAVOURS = ('mango', 'lemon', 'gongura', 'tomato', 'garlic', 'ginger', 'chilli', 'amla', 'chicken', 'mutton',
+            'prawn', 'fish', 'mixed', 'carrot', 'onion', 'brinjal', 'tamarind', 'coriander', 'curry', 'mint')
+KINDS = ('pickle', 'thokku', 'chutney', 'podi', 'mixture', 'murukku', 'chips', 'laddu')
+WORDS = ('spicy', 'tangy', 'sweet', 'homemade', 'andhra', 'classic', 'roasted', 'crunchy', 'fresh', 'aged',
+         'sesame', 'mustard', 'oil', 'jaggery', 'traditional', 'family', 'recipe', 'small', 'batch', 'village')
+
+
+def synthetic_products(n, seed=7):
+    rng = random.Random(seed)
+    products = []
+    for i in range(1, n + 1):
+        name = f'{rng.choice(FLAVOURS).title()} {rng.choice(KINDS).title()} {i}'
+        description = ' '.join(rng.choice(WORDS) for _ in range(8))
+        products.append({'id': i, 'category': rng.choice(CATEGORIES), 'name': name, 'price': rng.randint(50, 2000),
+                         'image': f'https://example.com/{i}.jpg', 'description': description})
+    return products
+
+
+CASES = (
+    ('q=mango', dict(q='mango')),
+    ('q=spicy pickle', dict(q='spicy pickle')),
+    ('q=gon (prefix)', dict(q='gon')),
+    ('q=mango&category=veg&price', dict(q='mango', category='veg', min_price=200, max_price=600, sort='price_asc')),
+    ('category=snacks&sort=price', dict(category='snacks', sort='price_asc')),
+    ('price 500-520&sort=desc', dict(min_price=500, max_price=520, sort='price_desc')),
+    ('sort=name', dict(sort='name')),
+    ('q=tangy&sort=name', dict(q='tangy', sort='name')),
+)
+
+
+def time_case(index, params, runs, pages=3):
+    latencies = []
+    for _ in range(runs):
+        cursor = None
+        for _ in range(pages):
+            started = time.perf_counter()
+            _, cursor = index.search(limit=20, cursor=cursor, **params)
+            latencies.append(time.perf_counter() - started)
+            if cursor is None:
+                break
+    latencies.sort()
+    return statistics.median(latencies) * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    products = synthetic_products(n)
+    catalog = Catalog(products)
+
+    started = time.perf_counter()
+    index = SearchIndex(catalog)
+    built = time.perf_counter() - started
+    print(f'{n} products, index built in {built * 1e3:.0f} ms, {len(index._state.postings)} distinct terms')
+
+    print(f"{'query':<30} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, params in CASES:
+        p50, p99 = time_case(index, params, runs)
+        print(f'{label:<30} {p50:>8.2f} {p99:>8.2f}')
+
+    # Time the index's own listener separately from the catalog's upsert
+    timings = []
+    listener = catalog._listeners[-1]
+
+    def timed_listener(changed):
+        started = time.perf_counter()
+        listener(changed)
+        timings.append(time.perf_counter() - started)
+
+    catalog._listeners[-1] = timed_listener
+    product = dict(products[n // 2], name='Kakarakaya Pickle Special', price=999)
+    started = time.perf_counter()
+    catalog.upsert(product)
+    upsert = time.perf_counter() - started
+    assert index.search(q='kakarakaya')[0][0]['id'] == product['id']
+    started = time.perf_counter()
+    index._rebuild()
+    rebuild = time.perf_counter() - started
+    print(f'index update for one upsert: {timings[0] * 1e3:.2f} ms (full rebuild {rebuild * 1e3:.0f} ms)')
+    print(f'catalog.upsert including the index update: {upsert * 1e3:.0f} ms')
+
+if __name__ == '__main__':
+    main()
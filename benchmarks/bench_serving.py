@@ -0,0 +1,196 @@
+"""Memory per worker and cold-start-to-ready: app.run vs a preloaded, forked server.
+
+    python benchmarks/bench_serving.py [workers] [catalog-products]
+
+Each mode starts in a fresh temp directory with the in-process AWS
+stand-ins and a catalog snapshot of `catalog-products` synthetic products
+(so the catalog and search index are big enough to matter):
+
+    app.run   python app.py, one process per worker needed
+    preload   the gunicorn.conf.py model: the app is imported once,
+              gc.freeze(), then `workers` forks each run app.warm_up() and
+              serve on the shared socket (werkzeug servers standing in for
+              gunicorn's, which this script uses too if it is installed)
+    gunicorn  gunicorn -c gunicorn.conf.py app:app, when available
+
+Ready means /readyz answered 200 from every worker (preload/gunicorn
+workers report in by pid). Memory comes from /proc/<pid>/smaps_rollup
+after a round of requests: USS is what the worker alone holds, PSS
+charges shared pages fractionally. Then SIGTERM is sent and the time to
+a clean exit (drained queues) is reported.
+"""
+import http.client
+import importlib.util
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+PATHS = ('/login', '/about', '/api/products?limit=50', '/api/products?q=pickle', '/reviews', '/healthz')
+
+PRELOAD = r'''
+import gc, logging, os, signal, socket, sys, threading
+sys.path.insert(0, sys.argv[1])
+import app as storefront
+from werkzeug.serving import make_server
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+sock.bind(('127.0.0.1', int(sys.argv[2])))
+sock.listen(1024)
+gc.freeze()
+children = []
+for _ in range(int(sys.argv[3])):
+    pid = os.fork()
+    if pid == 0:
+        storefront.warm_up()
+        server = make_server('127.0.0.1', int(sys.argv[2]), storefront.app, threaded=True, fd=sock.fileno())
+        def on_sigterm(signum, frame):
+            storefront.draining.set()
+            threading.Thread(target=server.shutdown).start()
+        signal.signal(signal.SIGTERM, on_sigterm)
+        print(f'ready {os.getpid()}', flush=True)
+        server.serve_forever()
+        storefront.drain()
+        os._exit(0)
+    children.append(pid)
+def forward(signum, frame):
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+signal.signal(signal.SIGTERM, forward)
+for pid in children:
+    os.waitpid(pid, 0)
+'''
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def wait_ready(port, started, timeout=120):
+    while time.monotonic() - started < timeout:
+        try:
+            if get(port, '/readyz') == 200:
+                return time.monotonic() - started
+        except OSError:
+            pass
+        time.sleep(0.02)
+    raise SystemExit(f'nothing ready on port {port}')
+
+
+def memory(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def write_catalog(directory, n):
+    categories = ('nonveg', 'veg', 'snacks')
+    with open(os.path.join(directory, 'catalog.jsonl'), 'w', encoding='utf-8') as f:
+        for i in range(1, n + 1):
+            f.write(json.dumps({'id': i, 'category': categories[i % 3], 'name': f'Pickle {i}',
+                                'price': 100 + (i * 37) % 400, 'image': f'https://example.invalid/{i}.jpg',
+                                'description': f'Small batch pickle number {i}'}) + '\n')
+
+
+def run(mode, workers, products):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as cwd:
+        write_catalog(cwd, products)
+        env = dict(os.environ, AWS_ENDPOINT_URL='inprocess', USER_STORE_URL='sqlite:///users.db', LOG_CONSOLE='0',
+                   PORT=str(port), BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY=str(workers),
+                   PYTHONPATH=ROOT)
+        if mode == 'app.run':
+            command = [sys.executable, os.path.join(ROOT, 'app.py')]
+        elif mode == 'preload':
+            command = [sys.executable, '-c', PRELOAD, ROOT, str(port), str(workers)]
+        else:
+            command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), 'app:app']
+        started = time.monotonic()
+        process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   text=True)
+        try:
+            first_ready = wait_ready(port, started)
+            if mode == 'preload':
+                for _ in range(workers):
+                    process.stdout.readline()
+            if mode != 'app.run':
+                # Every worker reports ready once its own /readyz would pass
+                while len(children(process.pid)) < workers:
+                    time.sleep(0.02)
+            all_ready = time.monotonic() - started
+
+            for _ in range(20):
+                for path in PATHS:
+                    get(port, path)
+            pids = [process.pid] if mode == 'app.run' else children(process.pid)
+            worker_memory = [memory(pid) for pid in pids]
+            master = None if mode == 'app.run' else memory(process.pid)
+
+            stopping = time.monotonic()
+            process.send_signal(signal.SIGTERM)
+            process.wait(60)
+            stopped = time.monotonic() - stopping
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+    return first_ready, all_ready, worker_memory, master, stopped, process.returncode
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    modes = ['app.run', 'preload']
+    if importlib.util.find_spec('gunicorn'):
+        modes.append('gunicorn')
+    else:
+        print('gunicorn is not installed; measuring its preload model with forked werkzeug workers')
+    print(f'{products:,}-product catalog, {workers} workers')
+    print(f"{'mode':<9} {'ready s':>8} {'all ready s':>12} {'USS/worker':>11} {'PSS/worker':>11} "
+          f"{'RSS/worker':>11} {'total for workers':>18} {'SIGTERM->exit s':>16}")
+    for mode in modes:
+        first, ready, per_worker, master, stopped, code = run(mode, workers, products)
+        uss = sum(m['uss'] for m in per_worker) / len(per_worker)
+        pss = sum(m['pss'] for m in per_worker) / len(per_worker)
+        rss = sum(m['rss'] for m in per_worker) / len(per_worker)
+        if mode == 'app.run':
+            # One single-process server per worker slot
+            total = pss * workers
+        else:
+            total = sum(m['pss'] for m in per_worker) + master['pss']
+        print(f'{mode:<9} {first:>8.2f} {ready:>12.2f} {uss:>9.0f} M {pss:>9.0f} M {rss:>9.0f} M '
+              f'{total:>16.0f} M {stopped:>15.2f}{"" if code == 0 else f"  (exit {code})"}')
+
+
+if __name__ == '__main__':
+    main()
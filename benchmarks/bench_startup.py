@@ -0,0 +1,65 @@
+"""Import-to-first-request time for a fresh worker process.
+
+    python benchmarks/bench_startup.py [runs]
+
+Each run starts a new interpreter, imports app and serves one request
+through the test client, reporting the median over `runs`:
+
+    lazy       AWS clients are created on first use; GET /login never needs them
+    eager      the old module-level setup: dynamodb resource, four tables and
+               the SNS client created at import
+    inprocess  AWS_ENDPOINT_URL=inprocess, first request is GET /reviews,
+               which creates the (in-memory) reviews table on demand
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import app as storefront
+imported = time.perf_counter()
+if sys.argv[2] == 'eager':
+    dynamodb = storefront.aws.resource('dynamodb')
+    for name in (storefront.DYNAMODB_TABLE, 'users', 'contacts', 'reviews'):
+        dynamodb.Table(name)
+    storefront.aws.client('sns')
+path = '/reviews' if sys.argv[2] == 'inprocess' else '/login'
+response = storefront.app.test_client().get(path)
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+print(json.dumps({'import': imported - started, 'first_request': done - started}))
+'''
+
+
+def run(mode):
+    env = dict(os.environ)
+    env.pop('AWS_ENDPOINT_URL', None)
+    if mode == 'inprocess':
+        env['AWS_ENDPOINT_URL'] = 'inprocess'
+    with tempfile.TemporaryDirectory() as cwd:
+        output = subprocess.run([sys.executable, '-c', CHILD, ROOT, mode], cwd=cwd, env=env,
+                                check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'mode':<10} {'import ms':>10} {'first request ms':>17}")
+    for mode in ('lazy', 'eager', 'inprocess'):
+        results = [run(mode) for _ in range(runs)]
+        imported = statistics.median(r['import'] for r in results) * 1e3
+        first = statistics.median(r['first_request'] for r in results) * 1e3
+        print(f"{mode:<10} {imported:>10.1f} {first:>17.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Time to first byte and transfer size for large list pages.
+
+    python benchmarks/bench_streaming.py [entries] [runs]
+
+Seeds `entries` reviews and contact messages (default 10k) and sets the
+page sizes so a single page lists all of them. Each page is fetched
+through the full WSGI stack (including the compression middleware):
+
+    buffered   the whole page rendered to one string, as before
+    streamed   stream_page(): the head goes out while the list renders
+
+each with no compression, gzip, and br (when brotli is installed). The
+reviews fragment cache is cleared before every run so the list is
+rendered each time. Reports the median TTFB, total time and bytes sent.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ['AWS_ENDPOINT_URL'] = 'inprocess'
+os.environ['LOG_LEVEL'] = 'WARNING'
+ENTRIES = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+os.environ['REVIEWS_PAGE_SIZE'] = os.environ['CONTACTS_PAGE_SIZE'] = str(ENTRIES)
+os.chdir(tempfile.mkdtemp())
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+import app as storefront
+import compression
+import template_registry
+
+
+def buffered_page(name, **context):
+    return template_registry.render_page(name, **context)
+
+
+def fetch(path, encoding):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    environ = EnvironBuilder(path=path, headers=headers).get_environ()
+    started = time.perf_counter()
+    app_iter, status, headers = run_wsgi_app(storefront.app.wsgi_app, environ)
+    first = None
+    size = 0
+    try:
+        for chunk in app_iter:
+            if chunk and first is None:
+                first = time.perf_counter()
+            size += len(chunk)
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+    done = time.perf_counter()
+    assert status.startswith('200'), status
+    return (first or done) - started, done - started, size
+
+
+def main():
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    storefront.local_store.append_many('contacts', (f'Customer {i} (c{i}@example.com): message number {i}'
+                                                    for i in range(ENTRIES)))
+    for i in range(ENTRIES):
+        storefront.review_store.add(f'user{i % 50}', f'Review number {i}: the pickles were great')
+
+    encodings = [None, 'gzip'] + (['br'] if compression.brotli is not None else [])
+    print(f'{ENTRIES} entries per page, median of {runs} runs')
+    print(f"{'page':<9} {'mode':<9} {'encoding':<9} {'TTFB ms':>8} {'total ms':>9} {'KiB sent':>9}")
+    for path in ('/reviews', '/contact'):
+        for mode, page in (('buffered', buffered_page), ('streamed', template_registry.stream_page)):
+            storefront.stream_page = page
+            for encoding in encodings:
+                results = []
+                for _ in range(runs):
+                    storefront.response_cache.invalidate('review_list')
+                    results.append(fetch(path, encoding))
+                ttfb = statistics.median(r[0] for r in results) * 1e3
+                total = statistics.median(r[1] for r in results) * 1e3
+                size = results[-1][2] / 1024
+                print(f"{path:<9} {mode:<9} {encoding or 'identity':<9} {ttfb:>8.1f} {total:>9.1f} {size:>9.1f}")
+    storefront.stream_page = template_registry.stream_page
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Requests/sec for / and /cart: inline render_template_string vs. compiled registry.
+
+    python benchmarks/bench_templates.py [seconds-per-case]
+
+"inline" reproduces the old per-request path by handing the page source to
+render_template_string, which compiles it on every call. "registry" is the
+startup-compiled template path that the app uses now.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import render_template_string
+
+import app as storefront
+import template_registry
+
+
+ROUTES = ('/', '/cart')
+TEMPLATE_DIR = os.path.join(storefront.app.root_path, 'templates', 'pages')
+
+
+def inline_render_page(name, **context):
+    with open(os.path.join(TEMPLATE_DIR, f'{name}.html'), encoding='utf-8') as f:
+        source = f.read()
+    return render_template_string(source, **context)
+
+
+def requests_per_second(client, path, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        client.get(path)
+        count += 1
+    return count / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    client = storefront.app.test_client()
+    version, _ = storefront.cart_store.mutate('bench-templates', lambda items: items.update({'1': 2, '5': 1, '9': 3}))
+    with client.session_transaction() as sess:
+        sess['username'] = 'bench'
+        sess['cart_id'] = 'bench-templates'
+        sess['cart_v'] = version
+
+    results = {}
+    for mode, renderer in (('inline', inline_render_page), ('registry', template_registry.render_page)):
+        storefront.render_page = renderer
+        for path in ROUTES:
+            client.get(path)
+            results[mode, path] = requests_per_second(client, path, seconds)
+    storefront.render_page = template_registry.render_page
+
+    print(f"{'route':<8} {'inline rps':>11} {'registry rps':>13} {'speedup':>8}")
+    for path in ROUTES:
+        inline, registry = results['inline', path], results['registry', path]
+        print(f'{path:<8} {inline:>11.0f} {registry:>13.0f} {registry / inline:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
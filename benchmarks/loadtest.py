@@ -0,0 +1,428 @@
+"""Offline load test of the storefront's customer flows.
+
+    python benchmarks/loadtest.py client [--users 300] [--concurrency 16] [--items 3]
+    python benchmarks/loadtest.py http [--workers 4] [--clients 4] [--concurrency 16] ...
+
+    common options: [--save FILE] [--compare FILE] [--tolerance 0.5] [--seed 1]
+
+Each virtual user registers, logs in, adds --items products to the cart,
+views /cart and /checkout, places the order, then reads and posts to
+/reviews and /contact. Nothing leaves the machine: DynamoDB and SNS are
+the in-process stand-ins (AWS_ENDPOINT_URL=inprocess), users, carts and
+contacts live in SQLite files in a temp directory, and order emails go
+to a local SMTP sink.
+
+client  Flask test clients on threads against the WSGI app: no sockets
+        or server, so app-level changes show up clearly (microbenchmarks)
+http    --workers server processes accepting on one shared socket (the
+        app imported once and forked, like gunicorn --preload), driven
+        over real HTTP by --clients load-generator processes (end to end)
+
+Prints throughput and p50/p95/p99 per route. --save writes the results
+as JSON; --compare reads a saved baseline and exits with status 1 if any
+route's p95 grew, or its throughput fell, by more than --tolerance
+(it refuses, with status 1, a baseline recorded in another mode or with
+other load settings).
+benchmarks/baselines/ holds the default runs of both modes; they were
+recorded on a 1-CPU machine, so re-record them wherever you compare.
+Password hashing defaults to a cheap pbkdf2 so the flows, not scrypt,
+dominate; set PASSWORD_HASH_METHOD to measure the real cost.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from smtp_sink import SMTPSink
+
+
+EXPECTED = {
+    'POST /register': 302,
+    'POST /login': 302,
+    'GET /add_to_cart': 302,
+    'GET /cart': 200,
+    'GET /checkout': 200,
+    'POST /place_order': 302,
+    'GET /reviews': 200,
+    'POST /reviews': 302,
+    'GET /contact': 200,
+    'POST /contact': 302,
+}
+IDEMPOTENCY_KEY = re.compile(r'name="idempotency_key" value="([^"]+)"')
+
+
+def configure_environment(sink):
+    """Point the app at offline stand-ins; must run before `import app`."""
+    workdir = tempfile.mkdtemp(prefix='storefront-load-')
+    os.chdir(workdir)
+    os.makedirs('logs', exist_ok=True)
+    os.environ['AWS_ENDPOINT_URL'] = 'inprocess'
+    os.environ['USER_STORE_URL'] = f'sqlite:///{os.path.join(workdir, "users.db")}'
+    os.environ['EMAIL_HOST'] = sink.host
+    os.environ['EMAIL_PORT'] = str(sink.port)
+    os.environ['EMAIL_USE_TLS'] = '0'
+    os.environ['EMAIL_PASSWORD'] = ''
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    # Every virtual user logs in from 127.0.0.1
+    os.environ.setdefault('LOGIN_ATTEMPTS_PER_IP', '100000000')
+    os.environ.setdefault('LOG_CONSOLE', '0')
+    return workdir
+
+
+# -------------------- Sessions --------------------
+
+class TestClientSession:
+    """One browser: a Flask test client with its own cookie jar."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None):
+        response = self.client.open(path, method=method, data=form)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class HTTPSession:
+    """One browser over a keep-alive HTTP connection, with a minimal cookie jar."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookies = {}
+        self.connection = None
+
+    def request(self, method, path, form=None):
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # The server closed an idle keep-alive connection
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        for header in response.headers.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response.status, data.decode('utf-8', 'replace')
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+# -------------------- Flow --------------------
+
+def run_user(session, user, product_ids, items, rng, record):
+    """One customer journey; `record(label, seconds, ok)` gets every request."""
+
+    def call(label, path, form=None):
+        method = label.split()[0]
+        started = time.perf_counter()
+        try:
+            status, body = session.request(method, path, form)
+        except Exception:
+            record(label, time.perf_counter() - started, False)
+            return None
+        record(label, time.perf_counter() - started, status == EXPECTED[label])
+        return body
+
+    credentials = {'username': user, 'password': 'load-test-password'}
+    call('POST /register', '/register', credentials)
+    call('POST /login', '/login', credentials)
+    for product_id in rng.sample(product_ids, min(items, len(product_ids))):
+        call('GET /add_to_cart', f'/add_to_cart/{product_id}')
+    call('GET /cart', '/cart')
+    page = call('GET /checkout', '/checkout') or ''
+    match = IDEMPOTENCY_KEY.search(page)
+    call('POST /place_order', '/place_order', {
+        'idempotency_key': match.group(1) if match else str(uuid.uuid4()),
+        'name': user, 'address': '1 Load Test Road', 'email': f'{user}@example.com', 'phone': '',
+    })
+    call('GET /reviews', '/reviews')
+    call('POST /reviews', '/reviews', {'review': f'Review from {user}'})
+    call('GET /contact', '/contact')
+    call('POST /contact', '/contact', {'name': user, 'email': f'{user}@example.com', 'message': 'Hello'})
+
+
+class Recorder:
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, label, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(label, []).append(seconds)
+            if not ok:
+                self.errors[label] = self.errors.get(label, 0) + 1
+
+    def merge(self, latencies, errors):
+        for label, values in latencies.items():
+            self.latencies.setdefault(label, []).extend(values)
+        for label, count in errors.items():
+            self.errors[label] = self.errors.get(label, 0) + count
+
+
+def drive(make_session, users, product_ids, items, concurrency, seed, recorder):
+    """Run `users` journeys on `concurrency` threads, each reusing one session factory."""
+    counter = iter(users)
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        while True:
+            with lock:
+                user = next(counter, None)
+            if user is None:
+                return
+            session = make_session()
+            try:
+                run_user(session, user, product_ids, items, rng, recorder)
+            finally:
+                if hasattr(session, 'close'):
+                    session.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def user_names(count, prefix):
+    return [f'{prefix}-{i}' for i in range(count)]
+
+
+# -------------------- Modes --------------------
+
+def run_client(args):
+    import app as storefront
+    product_ids = [product['id'] for product in storefront.catalog.all()]
+    recorder = Recorder()
+    started = time.perf_counter()
+    drive(lambda: TestClientSession(storefront.app), user_names(args.users, 'client'), product_ids,
+          args.items, args.concurrency, args.seed, recorder)
+    elapsed = time.perf_counter() - started
+    storefront.notifier.stop()
+    storefront.stop_order_writer()
+    return recorder, elapsed
+
+
+def _serve(sock, host, port):
+    from werkzeug.serving import make_server
+    import logging
+    import app as storefront
+    # The access log is written by the app; werkzeug's own would only add noise
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server(host, port, storefront.app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+
+def _generate(host, port, users, product_ids, items, concurrency, seed, results):
+    recorder = Recorder()
+    drive(lambda: HTTPSession(host, port), users, product_ids, items, concurrency, seed, recorder)
+    results.put((recorder.latencies, recorder.errors))
+
+
+def _wait_until_ready(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=2)
+            connection.request('GET', '/api/products?limit=100')
+            response = connection.getresponse()
+            body = response.read()
+            connection.close()
+            if response.status == 200:
+                return [item['id'] for item in json.loads(body)['items']]
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise SystemExit(f'Server on {host}:{port} did not come up')
+
+
+def run_http(args):
+    import app  # noqa: F401 - preload once, so workers fork with the app already imported
+
+    context = multiprocessing.get_context('fork')
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(1024)
+    host, port = sock.getsockname()
+    servers = [context.Process(target=_serve, args=(sock, host, port), daemon=True) for _ in range(args.workers)]
+    for server in servers:
+        server.start()
+    try:
+        product_ids = _wait_until_ready(host, port)
+        names = user_names(args.users, 'http')
+        results = context.Queue()
+        generators = [
+            context.Process(target=_generate, args=(host, port, names[i::args.clients], product_ids, args.items,
+                                                    args.concurrency, args.seed + i, results))
+            for i in range(args.clients)
+        ]
+        started = time.perf_counter()
+        for generator in generators:
+            generator.start()
+        recorder = Recorder()
+        for _ in generators:
+            recorder.merge(*results.get())
+        elapsed = time.perf_counter() - started
+        for generator in generators:
+            generator.join()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.join()
+        sock.close()
+    return recorder, elapsed
+
+
+# -------------------- Reporting --------------------
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1)]
+
+
+def summarize(recorder, elapsed, args, emails):
+    routes = {}
+    for label in EXPECTED:
+        values = sorted(recorder.latencies.get(label, ()))
+        routes[label] = {
+            'count': len(values),
+            'errors': recorder.errors.get(label, 0),
+            'rps': round(len(values) / elapsed, 1),
+            'p50_ms': round(percentile(values, 0.50) * 1e3, 2),
+            'p95_ms': round(percentile(values, 0.95) * 1e3, 2),
+            'p99_ms': round(percentile(values, 0.99) * 1e3, 2),
+        }
+    total = sum(route['count'] for route in routes.values())
+    return {
+        'mode': args.mode,
+        'config': run_config(args),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'elapsed_s': round(elapsed, 2),
+        'requests': total,
+        'rps': round(total / elapsed, 1),
+        'flows_per_sec': round(args.users / elapsed, 1),
+        'emails_delivered': emails,
+        'routes': routes,
+    }
+
+
+def run_config(args):
+    return {k: v for k, v in vars(args).items() if k in ('users', 'items', 'concurrency', 'workers', 'clients')}
+
+
+def print_report(result):
+    print(f"{result['mode']}: {result['config']['users']} users, "
+          f"{result['requests']} requests in {result['elapsed_s']} s "
+          f"({result['rps']} req/s, {result['flows_per_sec']} checkouts/s), "
+          f"{result['emails_delivered']} order emails delivered")
+    print(f"{'route':<20} {'count':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, route in result['routes'].items():
+        print(f"{label:<20} {route['count']:>6} {route['errors']:>6} {route['rps']:>8} "
+              f"{route['p50_ms']:>8} {route['p95_ms']:>8} {route['p99_ms']:>8}")
+
+
+def compare(result, baseline, tolerance):
+    """Lines describing every route that regressed against the baseline."""
+    problems = []
+    for label, before in baseline['routes'].items():
+        now = result['routes'].get(label)
+        if now is None:
+            continue
+        if before['p95_ms'] and now['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            problems.append(f"{label}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if before['rps'] and now['rps'] < before['rps'] * (1 - tolerance):
+            problems.append(f"{label}: throughput {before['rps']} -> {now['rps']} req/s")
+        if now['errors'] > before['errors']:
+            problems.append(f"{label}: errors {before['errors']} -> {now['errors']}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline load test of the storefront flows')
+    parser.add_argument('mode', choices=('client', 'http'))
+    parser.add_argument('--users', type=int, default=300, help='customer journeys to run')
+    parser.add_argument('--items', type=int, default=3, help='add_to_cart calls per journey')
+    parser.add_argument('--concurrency', type=int, default=16, help='threads (per load-generator process)')
+    parser.add_argument('--workers', type=int, default=4, help='http: server processes')
+    parser.add_argument('--clients', type=int, default=4, help='http: load-generator processes')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='write results as JSON (e.g. a new baseline)')
+    parser.add_argument('--compare', help='baseline JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        # Numbers from a different load aren't comparable; refuse before running
+        if baseline.get('mode') != args.mode or baseline.get('config') != run_config(args):
+            sys.exit(f"{args.compare} is a {baseline.get('mode')} run with {baseline.get('config')}; "
+                     f"this is a {args.mode} run with {run_config(args)}. Re-run with the baseline's "
+                     f"settings or record a new baseline with --save.")
+    save_path = os.path.abspath(args.save) if args.save else None
+
+    sink = SMTPSink().start()
+    configure_environment(sink)
+    recorder, elapsed = run_client(args) if args.mode == 'client' else run_http(args)
+    if args.mode == 'http':
+        # Workers exit with emails still queued; give the sink a moment for in-flight ones
+        time.sleep(0.5)
+    sink.stop()
+
+    result = summarize(recorder, elapsed, args, len(sink.messages))
+    print_report(result)
+    if save_path:
+        with open(save_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+            f.write('\n')
+        print(f'saved {save_path}')
+    if baseline is not None:
+        problems = compare(result, baseline, args.tolerance)
+        for problem in problems:
+            print(f'REGRESSION {problem}')
+        if problems:
+            sys.exit(1)
+        print(f'no regressions against {args.compare} (tolerance {args.tolerance:.0%})')
+
+
+if __name__ == '__main__':
+    main()
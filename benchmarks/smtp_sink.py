@@ -0,0 +1,82 @@
+"""Minimal local SMTP sink that accepts and counts messages.
+
+    python benchmarks/smtp_sink.py [port]
+
+Point the app at it with EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=0.
+Benchmarks import SMTPSink to run it on a background thread.
+"""
+import socketserver
+import sys
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        self.reply('220 localhost SMTP sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data)
+                if sink.delay:
+                    time.sleep(sink.delay)
+                with sink.lock:
+                    sink.messages.append(b''.join(lines))
+                self.reply('250 Queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink:
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0):
+        self.delay = delay
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == '__main__':
+    sink = SMTPSink(port=int(sys.argv[1]) if len(sys.argv) > 1 else 1025)
+    print(f'SMTP sink listening on {sink.host}:{sink.port}')
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        print(f'{len(sink.messages)} messages received')
@@ -0,0 +1,141 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class SQLiteCartBackend:
+    """Shared cart rows; every write bumps the row's version."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS carts ('
+            ' cart_id TEXT PRIMARY KEY,'
+            ' version INTEGER NOT NULL,'
+            ' items TEXT NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+        self._connect().execute('CREATE INDEX IF NOT EXISTS carts_updated_at ON carts (updated_at)')
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def load(self, cart_id):
+        row = self._connect().execute('SELECT version, items FROM carts WHERE cart_id = ?', (cart_id,)).fetchone()
+        if row is None:
+            return 0, {}
+        return row[0], json.loads(row[1])
+
+    def save(self, cart_id, expected_version, items):
+        """Compare-and-set; returns the new version, or None if someone else wrote first."""
+        db = self._connect()
+        payload = json.dumps(items, separators=(',', ':'))
+        if expected_version == 0:
+            cursor = db.execute(
+                'INSERT OR IGNORE INTO carts (cart_id, version, items, updated_at) VALUES (?, 1, ?, ?)',
+                (cart_id, payload, time.time()))
+        else:
+            cursor = db.execute(
+                'UPDATE carts SET version = version + 1, items = ?, updated_at = ? WHERE cart_id = ? AND version = ?',
+                (payload, time.time(), cart_id, expected_version))
+        return expected_version + 1 if cursor.rowcount == 1 else None
+
+    def delete(self, cart_id):
+        self._connect().execute('DELETE FROM carts WHERE cart_id = ?', (cart_id,))
+
+    def expire(self, max_age):
+        """Delete carts not written for max_age seconds; returns how many."""
+        return self._connect().execute('DELETE FROM carts WHERE updated_at < ?', (time.time() - max_age,)).rowcount
+
+
+class CartStore:
+    """Server-side carts: an in-process LRU in front of a shared backend.
+
+    The session keeps only the cart id and the version it last wrote. A
+    cached copy at that version is current, so reads in the worker that
+    served the last write never touch the backend; other workers see a
+    version mismatch and reload.
+
+    Carts untouched for max_age seconds are deleted by whichever write
+    comes along once sweep_interval has passed since this process last
+    swept, so abandoned carts don't accumulate.
+    """
+
+    def __init__(self, backend, lru_size=10000, max_retries=5, max_age=None, sweep_interval=3600):
+        self.backend = backend
+        self.lru_size = lru_size
+        self.max_retries = max_retries
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+        self.expired = 0
+
+    def _cache(self, cart_id, version, items):
+        with self._lock:
+            self._lru[cart_id] = (version, items)
+            self._lru.move_to_end(cart_id)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _load(self, cart_id, version=None):
+        with self._lock:
+            cached = self._lru.get(cart_id)
+            if cached is not None and version is not None and cached[0] == version:
+                self._lru.move_to_end(cart_id)
+                return cached
+        cached = self.backend.load(cart_id)
+        self._cache(cart_id, *cached)
+        return cached
+
+    def get(self, cart_id, version=None):
+        return dict(self._load(cart_id, version)[1])
+
+    def load(self, cart_id, version=None):
+        """(version, items) as currently stored; the version identifies these exact items."""
+        current_version, items = self._load(cart_id, version)
+        return current_version, dict(items)
+
+    def mutate(self, cart_id, mutator, version=None):
+        """Apply mutator(items) with optimistic retries; returns (version, items)."""
+        for _ in range(self.max_retries):
+            current_version, items = self._load(cart_id, version)
+            items = dict(items)
+            mutator(items)
+            new_version = self.backend.save(cart_id, current_version, items)
+            if new_version is not None:
+                self._cache(cart_id, new_version, items)
+                self._maybe_sweep()
+                return new_version, dict(items)
+            # Lost a race with another worker: reload and reapply
+            version = None
+        raise RuntimeError(f'Cart {cart_id} is being modified concurrently')
+
+    def _maybe_sweep(self):
+        if self.max_age is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.sweep_interval
+        expired = self.backend.expire(self.max_age)
+        with self._lock:
+            self.expired += expired
+
+    def clear(self, cart_id):
+        self.backend.delete(cart_id)
+        with self._lock:
+            self._lru.pop(cart_id, None)
@@ -0,0 +1,145 @@
+import bisect
+import threading
+from collections import deque
+
+
+CATEGORIES = ('nonveg', 'veg', 'snacks')
+
+
+class Catalog:
+    """In-memory product catalog indexed by id, category and price."""
+
+    def __init__(self, products=()):
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.version = 0
+        # (version, changed product ids) for recent upserts/removes, so
+        # derived indexes can catch up without a full rebuild
+        self._log = deque(maxlen=4096)
+        self._log_floor = 0
+        self._rebuild(list(products))
+
+    # -------------------- Indexes --------------------
+
+    def _rebuild(self, products):
+        by_id = {}
+        by_category = {}
+        for product in products:
+            by_id[product['id']] = product
+            by_category.setdefault(product.get('category'), []).append(product)
+
+        by_price = sorted(products, key=lambda p: (p['price'], p['id']))
+
+        # Swap all indexes in one assignment so readers never see a mix
+        self._state = (products, by_id, by_category, by_price, [p['price'] for p in by_price])
+
+    def _changed(self, product_ids=None):
+        with self._lock:
+            self.version += 1
+            if product_ids is None:
+                self._log.clear()
+                self._log_floor = self.version
+            else:
+                self._log.append((self.version, tuple(product_ids)))
+        for listener in list(self._listeners):
+            listener(self)
+
+    def changes_since(self, version):
+        """Ids changed after `version`, or None if only a full rebuild can catch up."""
+        with self._lock:
+            if version < self._log_floor or (self._log and self._log[0][0] > version + 1):
+                return None
+            changed = set()
+            for logged_version, product_ids in self._log:
+                if logged_version > version:
+                    changed.update(product_ids)
+            return changed
+
+    def on_change(self, listener):
+        self._listeners.append(listener)
+        return listener
+
+    # -------------------- Reads --------------------
+
+    def __len__(self):
+        return len(self._state[0])
+
+    def __iter__(self):
+        return iter(self._state[0])
+
+    def all(self):
+        return self._state[0]
+
+    def get(self, product_id):
+        try:
+            return self._state[1].get(int(product_id))
+        except (TypeError, ValueError):
+            return None
+
+    def get_many(self, product_ids):
+        by_id = self._state[1]
+        found = {}
+        for product_id in product_ids:
+            try:
+                product = by_id.get(int(product_id))
+            except (TypeError, ValueError):
+                continue
+            if product is not None:
+                found[product['id']] = product
+        return found
+
+    def by_category(self, category):
+        return self._state[2].get(category, [])
+
+    def by_price(self, descending=False):
+        by_price = self._state[3]
+        return by_price[::-1] if descending else by_price
+
+    def in_price_range(self, low=None, high=None):
+        by_price, prices = self._state[3], self._state[4]
+        start = 0 if low is None else bisect.bisect_left(prices, low)
+        end = len(prices) if high is None else bisect.bisect_right(prices, high)
+        return by_price[start:end]
+
+    # -------------------- Writes --------------------
+
+    def replace(self, products):
+        with self._lock:
+            self._rebuild(list(products))
+        self._changed()
+
+    def upsert(self, product):
+        with self._lock:
+            products = [p for p in self._state[0] if p['id'] != product['id']]
+            products.append(product)
+            products.sort(key=lambda p: p['id'])
+            self._rebuild(products)
+        self._changed([product['id']])
+
+    def remove(self, product_id):
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            products = [p for p in self._state[0] if p['id'] != product_id]
+            self._rebuild(products)
+        self._changed([product_id])
+
+    def apply(self, upserts=(), removals=()):
+        """Upsert and remove many products in one swap; returns the changed ids."""
+        upserts = {product['id']: product for product in upserts}
+        removals = set(removals) - set(upserts)
+        if not upserts and not removals:
+            return set()
+        with self._lock:
+            current = self._state[1]
+            products = [upserts.get(p['id'], p) for p in self._state[0] if p['id'] not in removals]
+            products.extend(product for product_id, product in upserts.items() if product_id not in current)
+            products.sort(key=lambda p: p['id'])
+            self._rebuild(products)
+        changed = set(upserts) | removals
+        # Past a quarter of the catalog, derived indexes rebuild faster than they patch
+        self._changed(changed if len(changed) <= max(64, len(products) // 4) else None)
+        return changed
+
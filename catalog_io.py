@@ -0,0 +1,370 @@
+"""Bulk catalog import/export in CSV and JSON Lines.
+
+    python catalog_io.py import products.csv [--merge] [--dry-run] [--max-errors N]
+    python catalog_io.py export catalog.jsonl
+
+The live catalog is a JSON Lines snapshot (CATALOG_FILE), one product
+per line sorted by id. An import validates every row, sorts them in
+bounded runs on disk and merge-joins the result with the current
+snapshot, so memory stays at one run of rows however large the file is.
+The new snapshot replaces the old one with an atomic rename, and only
+if no row was invalid (--max-errors skips up to N bad rows instead).
+Without --merge the file is the whole catalog and products missing from
+it are removed; with --merge it only adds and updates.
+
+Each worker's CatalogWatcher notices the new snapshot and applies just
+the rows that differ from its catalog in one swap, so search, pricing
+and cached pages see the change without a restart.
+"""
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from catalog import CATEGORIES
+
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('id', 'category', 'name', 'price', 'image', 'description')
+REQUIRED = ('id', 'category', 'name', 'price', 'image')
+FORMATS = ('csv', 'jsonl')
+# Rows sorted in memory at a time during an import
+CHUNK_ROWS = 50000
+
+
+class RowError(ValueError):
+
+    def __init__(self, line, message):
+        super().__init__(f'line {line}: {message}')
+        self.line = line
+
+
+class ImportFailed(Exception):
+
+    def __init__(self, report):
+        super().__init__(f"{report['rejected']} invalid rows; first: {report['errors'][0]}")
+        self.report = report
+
+
+def format_for(path, fmt=None):
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt == 'ndjson':
+        fmt = 'jsonl'
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt!r}; use one of {", ".join(FORMATS)}')
+    return fmt
+
+
+# -------------------- Validation --------------------
+
+def _whole_number(line, field, value, minimum):
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise RowError(line, f'{field} must be a whole number >= {minimum}, got {value!r}')
+    return value
+
+
+def validate(line, raw):
+    """A product dict with exactly FIELDS, or RowError."""
+    if not isinstance(raw, dict):
+        raise RowError(line, 'expected an object')
+    # csv puts values past the header under None
+    unknown = {str(field) for field in raw if field not in FIELDS}
+    if unknown:
+        raise RowError(line, f"unknown fields: {', '.join(sorted(unknown))}")
+    missing = [field for field in REQUIRED if raw.get(field) in (None, '')]
+    if missing:
+        raise RowError(line, f"missing {', '.join(missing)}")
+    category = str(raw['category']).strip()
+    if category not in CATEGORIES:
+        raise RowError(line, f"category must be one of {', '.join(CATEGORIES)}, got {category!r}")
+    name = str(raw['name']).strip()
+    if len(name) > 200:
+        raise RowError(line, 'name is longer than 200 characters')
+    image = str(raw['image']).strip()
+    if not image.startswith(('https://', 'http://', '/')):
+        raise RowError(line, f'image must be an http(s) URL or a site path, got {image!r}')
+    return {
+        'id': _whole_number(line, 'id', raw['id'], 1),
+        'category': category,
+        'name': name,
+        'price': _whole_number(line, 'price', raw['price'], 0),
+        'image': image,
+        'description': str(raw.get('description') or '').strip(),
+    }
+
+
+# -------------------- Reading and writing --------------------
+
+def read_rows(f, fmt):
+    """(line, raw row) pairs from an open text file."""
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        missing = set(REQUIRED) - set(reader.fieldnames or ())
+        if missing:
+            raise RowError(1, f"header is missing {', '.join(sorted(missing))}")
+        for raw in reader:
+            yield reader.line_num, raw
+        return
+    for line, text in enumerate(f, 1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError as e:
+            yield line, RowError(line, f'invalid JSON: {e}')
+
+
+def write_rows(rows, f, fmt):
+    """Stream products to an open text file; returns the count written."""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(f, FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    for row in rows:
+        f.write(json.dumps({field: row.get(field, '') for field in FIELDS}, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def read_snapshot(path):
+    """Products from a snapshot, in id order; nothing if it doesn't exist yet."""
+    try:
+        f = open(path, encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with f:
+        for text in f:
+            if text.strip():
+                yield json.loads(text)
+
+
+def snapshot_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+# -------------------- Import --------------------
+
+def _sorted_runs(rows, chunk_rows, directory):
+    runs = []
+    for chunk in iter(lambda: list(itertools.islice(rows, chunk_rows)), []):
+        chunk.sort(key=lambda row: row['id'])
+        run = tempfile.TemporaryFile('w+', encoding='utf-8', dir=directory)
+        run.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in chunk)
+        run.seek(0)
+        runs.append(run)
+    return runs
+
+
+def _diff(current, incoming, merge):
+    """Merge-join two id-sorted streams into (action, row) pairs."""
+    sentinel = {'id': float('inf')}
+    current, incoming = iter(current), iter(incoming)
+    old, new = next(current, sentinel), next(incoming, sentinel)
+    previous = None
+    while old is not sentinel or new is not sentinel:
+        if new is not sentinel and new['id'] == previous:
+            raise ValueError(f"duplicate id {new['id']}")
+        if new['id'] < old['id']:
+            yield 'added', new
+            previous, new = new['id'], next(incoming, sentinel)
+        elif old['id'] < new['id']:
+            yield ('kept' if merge else 'removed'), old
+            old = next(current, sentinel)
+        else:
+            yield ('unchanged' if new == old else 'changed'), new
+            previous, new = new['id'], next(incoming, sentinel)
+            old = next(current, sentinel)
+
+
+def import_catalog(source, snapshot_path, fmt=None, merge=False, dry_run=False, max_errors=0, seed=(),
+                   chunk_rows=CHUNK_ROWS):
+    """Validate `source` and, unless dry_run, make it the catalog snapshot.
+
+    `seed` stands in for the current catalog while no snapshot exists.
+    Returns a report of counts; raises ImportFailed if more than
+    `max_errors` rows are invalid (invalid rows are otherwise skipped).
+    """
+    fmt = format_for(source, fmt)
+    started = time.perf_counter()
+    report = dict.fromkeys(('rows', 'added', 'changed', 'unchanged', 'removed', 'kept', 'rejected'), 0)
+    report['errors'] = []
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+
+    def valid_rows(f):
+        for line, raw in read_rows(f, fmt):
+            report['rows'] += 1
+            try:
+                if isinstance(raw, RowError):
+                    raise raw
+                yield validate(line, raw)
+            except RowError as e:
+                report['rejected'] += 1
+                if len(report['errors']) < 20:
+                    report['errors'].append(str(e))
+
+    with open(source, encoding='utf-8', newline='') as f:
+        runs = _sorted_runs(valid_rows(f), chunk_rows, directory)
+    try:
+        if report['rejected'] > max_errors:
+            raise ImportFailed(report)
+        incoming = heapq.merge(*(map(json.loads, run) for run in runs), key=lambda row: row['id'])
+        current = read_snapshot(snapshot_path) if os.path.exists(snapshot_path) else \
+            iter(sorted(seed, key=lambda row: row['id']))
+        out = None if dry_run else tempfile.NamedTemporaryFile(
+            'w', encoding='utf-8', dir=directory, prefix='.catalog-', suffix='.jsonl', delete=False)
+        try:
+            for action, row in _diff(current, incoming, merge):
+                report[action] += 1
+                if out is not None and action != 'removed':
+                    out.write(json.dumps(row, ensure_ascii=False) + '\n')
+            if out is not None:
+                out.flush()
+                os.fsync(out.fileno())
+                out.close()
+                if report['added'] or report['changed'] or report['removed']:
+                    os.replace(out.name, snapshot_path)
+        except ValueError as e:
+            report['rejected'] += 1
+            report['errors'].append(str(e))
+            raise ImportFailed(report)
+        finally:
+            if out is not None:
+                out.close()
+                if os.path.exists(out.name):
+                    os.unlink(out.name)
+    finally:
+        for run in runs:
+            run.close()
+    report['seconds'] = time.perf_counter() - started
+    return report
+
+
+# -------------------- Workers --------------------
+
+class CatalogWatcher:
+    """Applies a changed snapshot to this worker's catalog."""
+
+    def __init__(self, catalog, path, interval=5.0):
+        self.catalog = catalog
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._pid = None
+        self._wakeup = threading.Event()
+        self.reloads = 0
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            threading.Thread(target=self._run, name='catalog-watcher', daemon=True).start()
+
+    def stop(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._wakeup.set()
+            self._pid = None
+
+    def _run(self):
+        wakeup = self._wakeup
+        while not wakeup.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error("Catalog reload from %s failed: %s", self.path, e)
+
+    def check(self):
+        """Reload if the snapshot was replaced since the last look; returns the changed ids."""
+        with self._lock:
+            signature = snapshot_signature(self.path)
+            if signature is None or signature == self._signature:
+                return set()
+            changed = self._reload()
+            self._signature = signature
+        return changed
+
+    def _reload(self):
+        started = time.perf_counter()
+        upserts, seen = [], set()
+        for product in read_snapshot(self.path):
+            seen.add(product['id'])
+            if self.catalog.get(product['id']) != product:
+                upserts.append(product)
+        removals = [product['id'] for product in self.catalog.all() if product['id'] not in seen]
+        changed = self.catalog.apply(upserts, removals)
+        self.reloads += 1
+        logger.info("Catalog reloaded from %s in %.0f ms: %d products, %d upserted, %d removed",
+                    self.path, (time.perf_counter() - started) * 1e3, len(seen), len(upserts), len(removals))
+        return changed
+
+
+# -------------------- CLI --------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk catalog import/export')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_cmd = commands.add_parser('import', help='validate a CSV/JSONL file and make it the catalog')
+    import_cmd.add_argument('path')
+    import_cmd.add_argument('--format', choices=FORMATS)
+    import_cmd.add_argument('--merge', action='store_true', help='add and update only; keep missing products')
+    import_cmd.add_argument('--dry-run', action='store_true', help='report the diff without applying it')
+    import_cmd.add_argument('--max-errors', type=int, default=0, help='skip up to N invalid rows')
+    export_cmd = commands.add_parser('export', help='write the catalog as CSV/JSONL ("-" for stdout)')
+    export_cmd.add_argument('path')
+    export_cmd.add_argument('--format', choices=FORMATS)
+    args = parser.parse_args(argv)
+
+    from app import CATALOG_FILE, products
+    if args.command == 'export':
+        rows = read_snapshot(CATALOG_FILE) if os.path.exists(CATALOG_FILE) else sorted(products, key=lambda p: p['id'])
+        if args.path == '-':
+            count = write_rows(rows, sys.stdout, args.format or 'jsonl')
+        else:
+            with open(args.path, 'w', encoding='utf-8', newline='') as f:
+                count = write_rows(rows, f, format_for(args.path, args.format))
+        print(f'{count} products exported', file=sys.stderr)
+        return
+
+    try:
+        report = import_catalog(args.path, CATALOG_FILE, fmt=args.format, merge=args.merge, dry_run=args.dry_run,
+                                max_errors=args.max_errors, seed=products)
+    except ImportFailed as e:
+        for error in e.report['errors']:
+            print(error, file=sys.stderr)
+        print(f"Import rejected: {e.report['rejected']} invalid rows; the catalog is unchanged", file=sys.stderr)
+        raise SystemExit(1)
+    except ValueError as e:
+        print(f'Import rejected: {e}', file=sys.stderr)
+        raise SystemExit(1)
+    for error in report['errors']:
+        print(f'skipped {error}', file=sys.stderr)
+    print(f"{report['rows']:,} rows in {report['seconds']:.1f} s ({report['rows'] / report['seconds']:,.0f} rows/s): "
+          f"{report['added']} added, {report['changed']} changed, {report['removed']} removed, "
+          f"{report['unchanged'] + report['kept']} unchanged, {report['rejected']} skipped"
+          f"{' (dry run)' if args.dry_run else ''}")
+
+
+if __name__ == '__main__':
+    main()
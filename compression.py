@@ -0,0 +1,165 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+def accepted_encodings(header):
+    """Parse Accept-Encoding into {coding: q}."""
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+class _Gzip:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        # Sync-flush so each streamed chunk reaches the client right away
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    name = 'br'
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """WSGI middleware: gzip/brotli response bodies the client accepts.
+
+    Bodies are buffered only until `min_size` bytes are known, so small
+    responses go out as-is and streamed pages keep streaming, each chunk
+    compressed and flushed as it arrives. Brotli is preferred when the
+    brotli package is installed and the client accepts it.
+    """
+
+    def __init__(self, app, min_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose(self, environ):
+        codings = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and codings.get('br', 0) > 0:
+            return lambda: _Brotli(self.brotli_quality)
+        if codings.get('gzip', codings.get('*', 0)) > 0:
+            return lambda: _Gzip(self.gzip_level)
+        return None
+
+    def __call__(self, environ, start_response):
+        encoder = self._choose(environ)
+        if encoder is None or environ['REQUEST_METHOD'] == 'HEAD':
+            return self.app(environ, start_response)
+
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            if exc_info and captured:
+                raise exc_info[1].with_traceback(exc_info[2])
+            captured[:] = [status, headers]
+            return lambda data: (_ for _ in ()).throw(
+                RuntimeError('CompressionMiddleware does not support write()'))
+
+        result = self.app(environ, capture)
+        return self._respond(result, captured, encoder, start_response)
+
+    def _compressible(self, status, headers):
+        if not status.startswith('200'):
+            return False
+        names = {name.lower(): value for name, value in headers}
+        if 'content-encoding' in names or 'no-transform' in names.get('cache-control', ''):
+            return False
+        content_length = names.get('content-length')
+        if content_length is not None and int(content_length) < self.min_size:
+            return False
+        content_type = names.get('content-type', '').lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _respond(self, result, captured, encoder, start_response):
+        try:
+            iterator = iter(result)
+            head = []
+            size = 0
+            done = False
+            # Look at the first min_size bytes before committing to a coding
+            while size < self.min_size:
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    done = True
+                    break
+                head.append(chunk)
+                size += len(chunk)
+
+            status, headers = captured
+            if not self._compressible(status, headers) or (done and size < self.min_size):
+                start_response(status, headers)
+                yield from head
+                if not done:
+                    yield from iterator
+                return
+
+            compressor = encoder()
+            headers = [(name, value) for name, value in headers if name.lower() != 'content-length']
+            vary = [value for name, value in headers if name.lower() == 'vary']
+            headers = [(name, value) for name, value in headers if name.lower() != 'vary']
+            vary_values = {v.strip().lower() for value in vary for v in value.split(',')}
+            if 'accept-encoding' not in vary_values:
+                vary.append('Accept-Encoding')
+            headers.append(('Vary', ', '.join(vary)))
+            headers.append(('Content-Encoding', compressor.name))
+            # A strong ETag names the exact bytes; the compressed body is a different representation
+            headers = [(name, 'W/' + value if name.lower() == 'etag' and not value.startswith('W/') else value)
+                       for name, value in headers]
+            start_response(status, headers)
+
+            data = compressor.compress(b''.join(head))
+            if data:
+                yield data
+            if not done:
+                for chunk in iterator:
+                    data = compressor.compress(chunk)
+                    if data:
+                        yield data
+            yield compressor.finish()
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
@@ -0,0 +1,60 @@
+"""gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+
+(or, for the ASGI mode, gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app)
+
+The app is imported once in the master (preload_app), so the catalog,
+search index and compiled templates are shared copy-on-write by all
+workers. Each worker then runs app.warm_up() (AWS connections and
+background threads) before it accepts a connection; /readyz answers 200
+from then on. On SIGTERM a worker turns /readyz to 503, stops
+accepting, gives in-flight requests graceful_timeout seconds, then
+app.drain() flushes its order, notification and inventory queues.
+"""
+import gc
+import os
+import signal
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+# In-flight requests get this long after SIGTERM; app.drain() runs after them
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 30))
+# Long enough for warm_up() against a slow AWS endpoint
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Behind a load balancer, also set TRUSTED_PROXY_HOPS (read by the app)
+# so the login throttle sees client addresses instead of the balancer's
+
+
+def pre_fork(server, worker):
+    # Move the preloaded app out of the collector's reach so a worker's
+    # first collection doesn't write to (and so copy) every shared page
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Open this worker's AWS connections and start its queues before it
+    # accepts requests, instead of on the first customer's request
+    import app
+    app.warm_up()
+    server.log.info("Worker %s warmed up", worker.pid)
+
+
+def post_worker_init(worker):
+    # gunicorn has installed its own SIGTERM handler by now; mark the
+    # worker as draining first so readiness probes fail while it finishes
+    import app
+    graceful_exit = signal.getsignal(signal.SIGTERM)
+
+    def on_sigterm(signum, frame):
+        app.draining.set()
+        graceful_exit(signum, frame)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+
+def worker_exit(server, worker):
+    import app
+    app.drain()
+    server.log.info("Worker %s drained its queues", worker.pid)
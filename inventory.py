@@ -0,0 +1,505 @@
+"""Stock levels, cart reservations and a per-process hot-counter cache.
+
+    python inventory.py set <product_id> <units>
+    python inventory.py show <product_id> [...]
+    python inventory.py untrack <product_id>
+
+Stock lives in the inventory table, one item per product holding the
+units nobody has claimed yet. It only ever goes down through a
+conditional update (available >= n), so concurrent takes can't drive it
+below zero. Products without an inventory item are untracked and sell
+without limit, as before.
+
+Adding to a cart reserves units for that cart, one reservations item per
+(cart, product) that expires after `reservation_ttl` seconds; placing the
+order consumes the cart's reservations and a sweeper returns expired
+ones to stock.
+
+Taking every reservation straight from the inventory item would
+serialize a flash sale on that one item, so each process takes units in
+batches into a local pool and reserves from it in memory. Pooled units
+have already left the table, so pooling can't oversell; a pool idle for
+`pool_idle` seconds is handed back, and batches shrink as stock runs low
+so the last few units aren't stranded in one worker.
+
+`set` replaces the count outright, and that count already covers units
+sitting in worker pools. Each set stamps the item with a new generation:
+units taken under an older one are never handed back (they are dropped
+from the pool instead), so stock isn't counted twice. Reserved units
+released back into such a pool may be dropped along with it, which errs
+toward selling too few rather than too many.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+
+logger = logging.getLogger(__name__)
+
+# GSI on the reservations table: partition "expiry_bucket", sort "expires_at"
+EXPIRY_INDEX = 'expiry_bucket-expires_at-index'
+# Reservations expiring in the same minute are spread over this many
+# index partitions so a sale doesn't write to one hot GSI key
+EXPIRY_SHARDS = 8
+BUCKET_MS = 60 * 1000
+
+
+class OutOfStock(Exception):
+
+    def __init__(self, product_id, available):
+        super().__init__(f'Only {available} of product {product_id} available')
+        self.product_id = product_id
+        self.available = available
+
+
+class ReservationConflict(RuntimeError):
+    pass
+
+
+def _conditional_failed(e):
+    return e.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _bucket(expires_at, cart_id):
+    shard = zlib.crc32(cart_id.encode('utf-8')) % EXPIRY_SHARDS
+    return f'{expires_at // BUCKET_MS}#{shard}'
+
+
+class StockTable:
+    """Conditional reads and writes on the inventory table (product_id -> available)."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, product_id):
+        item = self.table.get_item(Key={'product_id': product_id}, ConsistentRead=True).get('Item')
+        return None if item is None else int(item['available'])
+
+    def set(self, product_id, available):
+        # A new generation orphans units pooled under the old count
+        self.table.put_item(Item={'product_id': product_id, 'available': available,
+                                  'generation': uuid.uuid4().hex})
+
+    def untrack(self, product_id):
+        self.table.delete_item(Key={'product_id': product_id})
+
+    def take(self, product_id, quantity):
+        """Atomically remove `quantity` units.
+
+        Returns (units left, generation), or None if there weren't enough.
+        """
+        try:
+            response = self.table.update_item(
+                Key={'product_id': product_id},
+                UpdateExpression='SET available = available - :n',
+                ConditionExpression='available >= :n',
+                ExpressionAttributeValues={':n': quantity},
+                ReturnValues='ALL_NEW'
+            )
+        except ClientError as e:
+            if _conditional_failed(e):
+                return None
+            raise
+        attributes = response['Attributes']
+        return int(attributes['available']), attributes.get('generation')
+
+    def give_back(self, product_id, quantity, generation):
+        """Return units taken under `generation`; False if the item was reset or untracked since."""
+        if generation is None:
+            # Items written before generations existed
+            condition = {'ConditionExpression': 'attribute_exists(product_id) AND attribute_not_exists(generation)',
+                         'ExpressionAttributeValues': {':n': quantity}}
+        else:
+            condition = {'ConditionExpression': 'generation = :generation',
+                         'ExpressionAttributeValues': {':n': quantity, ':generation': generation}}
+        try:
+            self.table.update_item(
+                Key={'product_id': product_id},
+                UpdateExpression='ADD available :n',
+                **condition
+            )
+        except ClientError as e:
+            # Reset or no longer tracked: the units are already accounted for
+            if not _conditional_failed(e):
+                raise
+            return False
+        return True
+
+
+class StockPool:
+    """Per-process cache of units already taken from the inventory table.
+
+    acquire() is served from memory while the pool lasts; a refill takes
+    up to `batch_size` units in one conditional update, but never more
+    than 1/`spread` of what the table reported left, so other workers
+    can still get the tail of a sale. Once the table is seen empty,
+    shoppers are refused from memory for `sold_out_ttl` seconds instead
+    of each re-reading the sold-out item.
+    """
+
+    def __init__(self, stock, batch_size=20, spread=4, pool_idle=2.0, tracked_ttl=30.0, sold_out_ttl=1.0,
+                 max_attempts=8):
+        self.stock = stock
+        self.batch_size = batch_size
+        self.spread = spread
+        self.pool_idle = pool_idle
+        self.tracked_ttl = tracked_ttl
+        self.sold_out_ttl = sold_out_ttl
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._product_locks = {}
+        self._units = {}
+        self._generations = {}
+        self._last_used = {}
+        self._remaining = {}
+        self._tracked = {}
+        self._sold_out = {}
+        self.refills = 0
+        self.returned = 0
+
+    def _product_lock(self, product_id):
+        with self._lock:
+            lock = self._product_locks.get(product_id)
+            if lock is None:
+                lock = self._product_locks[product_id] = threading.Lock()
+            return lock
+
+    def tracked(self, product_id):
+        with self._product_lock(product_id):
+            now = time.monotonic()
+            cached = self._tracked.get(product_id)
+            if cached is not None and now - cached[1] < self.tracked_ttl:
+                return cached[0]
+            available = self.stock.get(product_id)
+            self._tracked[product_id] = (available is not None, now)
+            if available is not None:
+                self._remaining[product_id] = available
+            return available is not None
+
+    def acquire(self, product_id, quantity):
+        """Claim `quantity` units for this process; raises OutOfStock. False if the product is untracked."""
+        with self._product_lock(product_id):
+            self._last_used[product_id] = time.monotonic()
+            pooled = self._units.get(product_id, 0)
+            for _ in range(self.max_attempts):
+                if pooled >= quantity:
+                    self._units[product_id] = pooled - quantity
+                    return True
+                need = quantity - pooled
+                if time.monotonic() - self._sold_out.get(product_id, float('-inf')) < self.sold_out_ttl:
+                    raise OutOfStock(product_id, pooled)
+                hint = self._remaining.get(product_id, self.batch_size * self.spread)
+                batch = max(need, min(self.batch_size, hint // self.spread))
+                taken = self.stock.take(product_id, batch)
+                if taken is not None:
+                    remaining, generation = taken
+                    self.refills += 1
+                    self._remaining[product_id] = remaining
+                    if generation != self._generations.get(product_id, generation):
+                        # Stock was set since the pooled units were taken; the new count covers them
+                        pooled = 0
+                    self._generations[product_id] = generation
+                    pooled += batch
+                    self._units[product_id] = pooled
+                    continue
+                # Not enough for a whole batch: look at what is really left
+                available = self.stock.get(product_id)
+                self._tracked[product_id] = (available is not None, time.monotonic())
+                if available is None:
+                    return False
+                self._remaining[product_id] = available
+                if not available:
+                    self._sold_out[product_id] = time.monotonic()
+                if available < need:
+                    raise OutOfStock(product_id, pooled + available)
+            raise OutOfStock(product_id, pooled)
+
+    def release(self, product_id, quantity):
+        with self._product_lock(product_id):
+            self._units[product_id] = self._units.get(product_id, 0) + quantity
+            self._last_used[product_id] = time.monotonic()
+
+    def forget(self, product_id):
+        # Drop what this process believes about the table's stock level,
+        # and its pooled units, which a new count already includes
+        with self._product_lock(product_id):
+            for cache in (self._tracked, self._remaining, self._sold_out, self._units, self._generations):
+                cache.pop(product_id, None)
+
+    def units(self):
+        with self._lock:
+            return sum(self._units.values())
+
+    def flush(self, idle=None):
+        """Hand pooled units back to the table (only pools idle for `idle` seconds, if given)."""
+        cutoff = None if idle is None else time.monotonic() - idle
+        for product_id in list(self._units):
+            with self._product_lock(product_id):
+                units = self._units.get(product_id, 0)
+                if not units or (cutoff is not None and self._last_used.get(product_id, 0) > cutoff):
+                    continue
+                if self.stock.give_back(product_id, units, self._generations.get(product_id)):
+                    self.returned += units
+                else:
+                    logger.info("Dropped %d pooled units of product %s: stock was reset", units, product_id)
+                self._units[product_id] = 0
+
+    def reset(self):
+        # After fork the parent's pool belongs to the parent
+        self._lock = threading.Lock()
+        self._product_locks = {}
+        self._units = {}
+        self._generations = {}
+        self._last_used = {}
+
+
+class Inventory:
+    """Cart reservations on top of a StockPool, plus the expiry sweeper."""
+
+    def __init__(self, stock_table, reservations_table, batch_size=20, pool_idle=2.0,
+                 reservation_ttl=15 * 60, sweep_interval=5.0, sweep_lookback=60 * 60, max_retries=5):
+        self.stock = StockTable(stock_table)
+        self.pool = StockPool(self.stock, batch_size=batch_size, pool_idle=pool_idle)
+        self.reservations = reservations_table
+        self.reservation_ttl = reservation_ttl
+        self.sweep_interval = sweep_interval
+        self.sweep_lookback = sweep_lookback
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._thread = None
+        self._swept_through = None
+        self.expired = 0
+
+    # -------------------- Lifecycle --------------------
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self.pool.reset()
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._swept_through = (_now_ms() - self.sweep_lookback * 1000) // BUCKET_MS - 1
+            self._thread = threading.Thread(target=self._run, name='inventory-sweeper', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the sweeper and hand this process's pooled units back."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._wakeup.set()
+            thread, self._pid = self._thread, None
+        thread.join(self.sweep_interval + 5)
+        self.pool.flush()
+
+    def _run(self):
+        wakeup = self._wakeup
+        while not wakeup.wait(self.sweep_interval):
+            try:
+                self.sweep()
+                self.pool.flush(idle=self.pool.pool_idle)
+            except Exception as e:
+                logger.error("Inventory sweep failed: %s", e)
+
+    # -------------------- Stock --------------------
+
+    def set_stock(self, product_id, units):
+        self.stock.set(product_id, units)
+        self.pool.forget(product_id)
+
+    def available(self, product_id):
+        """Units in the table (not counting ones pooled by workers); None if untracked."""
+        return self.stock.get(product_id)
+
+    # -------------------- Reservations --------------------
+
+    def _line(self, cart_id, product_id):
+        return self.reservations.get_item(
+            Key={'cart_id': cart_id, 'product_id': product_id}, ConsistentRead=True).get('Item')
+
+    def _write_line(self, cart_id, product_id, quantity, line):
+        """Replace a reservation line only if nobody changed it since we read `line`."""
+        if line is None:
+            condition = {'ConditionExpression': 'attribute_not_exists(cart_id)'}
+        else:
+            condition = {
+                'ConditionExpression': 'quantity = :held AND expires_at = :seen',
+                'ExpressionAttributeValues': {':held': line['quantity'], ':seen': line['expires_at']},
+            }
+        if quantity:
+            expires_at = _now_ms() + self.reservation_ttl * 1000
+            item = {'cart_id': cart_id, 'product_id': product_id, 'quantity': quantity,
+                    'expires_at': expires_at, 'expiry_bucket': _bucket(expires_at, cart_id)}
+            self.reservations.put_item(Item=item, **condition)
+            return item
+        if line is not None:
+            self.reservations.delete_item(Key={'cart_id': cart_id, 'product_id': product_id}, **condition)
+        return None
+
+    def hold(self, cart_id, product_id, quantity):
+        """Make the cart's reservation for a product exactly `quantity` units.
+
+        Raises OutOfStock if more units are needed than are left. Returns
+        the reservation line (None for untracked products or quantity 0).
+        """
+        self.start()
+        if not self.pool.tracked(product_id):
+            return None
+        for _ in range(self.max_retries):
+            line = self._line(cart_id, product_id)
+            held = int(line['quantity']) if line else 0
+            delta = quantity - held
+            if delta > 0 and not self.pool.acquire(product_id, delta):
+                return None
+            try:
+                written = self._write_line(cart_id, product_id, quantity, line)
+            except ClientError as e:
+                if delta > 0:
+                    self.pool.release(product_id, delta)
+                if _conditional_failed(e):
+                    # Changed under us (another request for this cart, or the sweeper)
+                    continue
+                raise
+            if delta < 0:
+                self.pool.release(product_id, -delta)
+            return written
+        raise ReservationConflict(f'Reservation for cart {cart_id} is being modified concurrently')
+
+    def lines(self, cart_id):
+        response = self.reservations.query(KeyConditionExpression=Key('cart_id').eq(cart_id), ConsistentRead=True)
+        return {int(item['product_id']): item for item in response['Items']}
+
+    def touch(self, cart_id):
+        """Push back the expiry of every reservation the cart holds."""
+        self.start()
+        for product_id, line in self.lines(cart_id).items():
+            try:
+                self._write_line(cart_id, product_id, line['quantity'], line)
+            except ClientError as e:
+                if not _conditional_failed(e):
+                    raise
+
+    def release_cart(self, cart_id):
+        for product_id in self.lines(cart_id):
+            self.hold(cart_id, product_id, 0)
+
+    def checkout(self, cart_id, quantities):
+        """Turn the cart's reservations into sold units.
+
+        Every line is first topped up (and its expiry pushed back, so the
+        sweeper leaves it alone); only once all of them are held are they
+        consumed, so a shortage on one product doesn't sell the others.
+        Returns {product_id: units} consumed, to pass to restock() if the
+        order then fails.
+        """
+        held = {}
+        for product_id, quantity in quantities.items():
+            line = self.hold(cart_id, product_id, quantity)
+            if line is not None:
+                held[product_id] = line
+        for product_id in self.lines(cart_id):
+            if product_id not in quantities:
+                # Left over from an earlier cart state
+                self.hold(cart_id, product_id, 0)
+        consumed = {}
+        try:
+            for product_id, line in held.items():
+                self._write_line(cart_id, product_id, 0, line)
+                consumed[product_id] = int(line['quantity'])
+        except ClientError as e:
+            self.restock(consumed)
+            if _conditional_failed(e):
+                raise ReservationConflict(f'Reservation for cart {cart_id} changed during checkout')
+            raise
+        return consumed
+
+    def restock(self, units):
+        for product_id, quantity in units.items():
+            self.pool.release(product_id, quantity)
+
+    # -------------------- Expiry --------------------
+
+    def sweep(self):
+        """Return expired reservations to stock; returns how many units came back."""
+        now = _now_ms()
+        current = now // BUCKET_MS
+        returned = 0
+        for minute in range(self._swept_through + 1, current + 1):
+            for shard in range(EXPIRY_SHARDS):
+                returned += self._sweep_bucket(f'{minute}#{shard}', now)
+        # Minutes before the current one are closed: nothing can expire into them again
+        self._swept_through = current - 1
+        return returned
+
+    def _sweep_bucket(self, bucket, now):
+        returned = 0
+        kwargs = {}
+        while True:
+            response = self.reservations.query(
+                IndexName=EXPIRY_INDEX,
+                KeyConditionExpression=Key('expiry_bucket').eq(bucket) & Key('expires_at').lte(now),
+                **kwargs
+            )
+            for line in response['Items']:
+                try:
+                    self._write_line(line['cart_id'], int(line['product_id']), 0, line)
+                except ClientError as e:
+                    # Renewed, changed or already swept by another worker
+                    if _conditional_failed(e):
+                        continue
+                    raise
+                quantity = int(line['quantity'])
+                self.pool.release(int(line['product_id']), quantity)
+                returned += quantity
+                self.expired += 1
+            if 'LastEvaluatedKey' not in response:
+                return returned
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def stats(self):
+        return {'pooled_units': self.pool.units(), 'refills': self.pool.refills,
+                'returned_units': self.pool.returned, 'expired_reservations': self.expired}
+
+
+# -------------------- CLI --------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect or set stock levels')
+    commands = parser.add_subparsers(dest='command', required=True)
+    set_cmd = commands.add_parser('set', help='start tracking a product with this many units')
+    set_cmd.add_argument('product_id', type=int)
+    set_cmd.add_argument('units', type=int)
+    show_cmd = commands.add_parser('show', help='print units not yet claimed by any worker or cart')
+    show_cmd.add_argument('product_id', type=int, nargs='+')
+    untrack_cmd = commands.add_parser('untrack', help='stop limiting a product')
+    untrack_cmd.add_argument('product_id', type=int)
+    args = parser.parse_args(argv)
+
+    from app import inventory
+    if args.command == 'set':
+        inventory.set_stock(args.product_id, args.units)
+    elif args.command == 'untrack':
+        inventory.stock.untrack(args.product_id)
+    else:
+        for product_id in args.product_id:
+            available = inventory.available(product_id)
+            print(f"{product_id}: {'untracked' if available is None else available}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,561 @@
+"""In-process stand-ins for the DynamoDB tables and SNS client used by app.py.
+
+They implement the subset of the boto3 resource/client API the app calls
+(put/get/update/delete, query on tables and indexes with key pagination,
+scan, batch_writer, publish) so the storefront can run and be benchmarked
+without AWS. Numbers come back as Decimal, conditional writes raise the
+same ClientError codes and every call can be given artificial latency.
+"""
+import bisect
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import AttributeBase, ConditionBase
+from botocore.exceptions import ClientError
+
+
+def _client_error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+def _to_dynamo(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError('Float types are not supported. Use Decimal types instead.')
+    if isinstance(value, dict):
+        return {k: _to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamo(v) for v in value]
+    if isinstance(value, set):
+        return {_to_dynamo(v) for v in value}
+    return value
+
+
+def _copy(item):
+    return {k: (dict(v) if isinstance(v, dict) else list(v) if isinstance(v, list) else v)
+            for k, v in item.items()}
+
+
+# -------------------- Expressions --------------------
+
+_MISSING = object()
+
+
+def _resolve(operand, item):
+    if isinstance(operand, AttributeBase):
+        return item.get(operand.name, _MISSING)
+    if isinstance(operand, ConditionBase) and operand.expression_operator == 'size':
+        value = _resolve(operand.get_expression()['values'][0], item)
+        return _MISSING if value is _MISSING else len(value)
+    return _to_dynamo(operand)
+
+
+def evaluate_condition(condition, item):
+    expression = condition.get_expression()
+    op = expression['operator']
+    values = expression['values']
+
+    if op == 'AND':
+        return evaluate_condition(values[0], item) and evaluate_condition(values[1], item)
+    if op == 'OR':
+        return evaluate_condition(values[0], item) or evaluate_condition(values[1], item)
+    if op == 'NOT':
+        return not evaluate_condition(values[0], item)
+    if op == 'attribute_exists':
+        return values[0].name in item
+    if op == 'attribute_not_exists':
+        return values[0].name not in item
+
+    left = _resolve(values[0], item)
+    if left is _MISSING:
+        return False
+    if op == 'BETWEEN':
+        return _resolve(values[1], item) <= left <= _resolve(values[2], item)
+    if op == 'IN':
+        return left in [_to_dynamo(v) for v in values[1]]
+    if op == 'begins_with':
+        return isinstance(left, str) and left.startswith(values[1])
+    if op == 'contains':
+        return _resolve(values[1], item) in left
+    if op == 'attribute_type':
+        return True
+
+    right = _resolve(values[1], item)
+    if right is _MISSING:
+        return False
+    return {
+        '=': left == right,
+        '<>': left != right,
+        '<': left < right,
+        '<=': left <= right,
+        '>': left > right,
+        '>=': left >= right,
+    }[op]
+
+
+class _StringExpression:
+    # Minimal parser for the string forms of Condition/UpdateExpression
+    # ("attribute_not_exists(order_id)", "stock >= :qty", "SET a = a + :v ADD b :w")
+
+    def __init__(self, names=None, values=None):
+        self.names = names or {}
+        self.values = {k: _to_dynamo(v) for k, v in (values or {}).items()}
+
+    def name(self, token):
+        token = token.strip()
+        return self.names.get(token, token)
+
+    def operand(self, token, item):
+        token = token.strip()
+        if token.startswith(':'):
+            return self.values[token]
+        match = re.fullmatch(r'if_not_exists\((.+?),\s*(.+?)\)', token)
+        if match:
+            value = item.get(self.name(match.group(1)), _MISSING)
+            return self.operand(match.group(2), item) if value is _MISSING else value
+        return item.get(self.name(token), _MISSING)
+
+    def arithmetic(self, text, item):
+        parts = re.split(r'\s*([+-])\s*(?![^()]*\))', text.strip())
+        result = self.operand(parts[0], item)
+        for sign, token in zip(parts[1::2], parts[2::2]):
+            value = self.operand(token, item)
+            result = result + value if sign == '+' else result - value
+        return result
+
+    def condition(self, text, item):
+        for clause in re.split(r'\s+AND\s+', text.strip(), flags=re.I):
+            clause = clause.strip()
+            while clause.startswith('(') and clause.endswith(')'):
+                clause = clause[1:-1].strip()
+            match = re.fullmatch(r'(attribute_exists|attribute_not_exists)\((.+)\)', clause)
+            if match:
+                present = self.name(match.group(2)) in item
+                if present != (match.group(1) == 'attribute_exists'):
+                    return False
+                continue
+            match = re.fullmatch(r'(.+?)\s*(<>|<=|>=|=|<|>)\s*(.+)', clause)
+            if not match:
+                raise ValueError(f'Unsupported condition: {clause}')
+            left = self.operand(match.group(1), item)
+            right = self.operand(match.group(3), item)
+            if left is _MISSING or right is _MISSING:
+                return False
+            if not evaluate_condition(_Compare(match.group(2), left, right), {}):
+                return False
+        return True
+
+    def update(self, text, item):
+        sections = re.split(r'\b(SET|ADD|REMOVE|DELETE)\b', text, flags=re.I)
+        for action, body in zip(sections[1::2], sections[2::2]):
+            action = action.upper()
+            for clause in re.split(r',(?![^()]*\))', body):
+                clause = clause.strip()
+                if not clause:
+                    continue
+                if action == 'SET':
+                    path, expression = clause.split('=', 1)
+                    item[self.name(path)] = self.arithmetic(expression, item)
+                elif action == 'ADD':
+                    path, token = clause.split(None, 1)
+                    value = self.operand(token, item)
+                    current = item.get(self.name(path))
+                    if isinstance(value, set):
+                        item[self.name(path)] = (current or set()) | value
+                    else:
+                        item[self.name(path)] = (current or Decimal(0)) + value
+                elif action == 'REMOVE':
+                    item.pop(self.name(clause), None)
+                elif action == 'DELETE':
+                    path, token = clause.split(None, 1)
+                    item[self.name(path)] = item.get(self.name(path), set()) - self.operand(token, item)
+
+
+class _Compare(ConditionBase):
+    expression_format = '{0} {operator} {1}'
+
+    def __init__(self, operator, left, right):
+        super().__init__(left, right)
+        self.expression_operator = operator
+
+
+# -------------------- DynamoDB --------------------
+
+class LocalTable:
+    """A DynamoDB table (plus optional global secondary indexes) held in memory.
+
+    indexes maps an index name to (hash_key, range_key_or_None).
+    """
+
+    def __init__(self, name, hash_key, range_key=None, indexes=None, latency=0.0):
+        self.name = name
+        self.table_name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = dict(indexes or {})
+        self.latency = latency
+        self.calls = Counter()
+        self.read_items = 0
+        self._items = {}
+        # {index_name or None: {hash_value: sorted [(range_value, primary_key)]}}
+        self._partitions = {None: {}}
+        for index_name in self.indexes:
+            self._partitions[index_name] = {}
+        self._lock = threading.RLock()
+
+    # ---- internals ----
+
+    def _call(self, operation):
+        self.calls[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _schema(self, index_name):
+        if index_name is None:
+            return self.hash_key, self.range_key
+        try:
+            return self.indexes[index_name]
+        except KeyError:
+            raise _client_error('ValidationException', f'The table does not have the specified index: {index_name}', 'Query')
+
+    def _primary_key(self, item):
+        try:
+            return (item[self.hash_key], item[self.range_key] if self.range_key else None)
+        except KeyError:
+            raise _client_error('ValidationException', 'One of the required keys was not given a value', 'PutItem')
+
+    def _entry(self, item, primary_key, index_name):
+        hash_key, range_key = self._schema(index_name)
+        if hash_key not in item or (range_key and range_key not in item):
+            return None
+        sort_value = item[range_key] if range_key else ''
+        return item[hash_key], (sort_value, primary_key)
+
+    def _index(self, item, primary_key):
+        for index_name, partitions in self._partitions.items():
+            entry = self._entry(item, primary_key, index_name)
+            if entry:
+                bisect.insort(partitions.setdefault(entry[0], []), entry[1])
+
+    def _unindex(self, item, primary_key):
+        for index_name, partitions in self._partitions.items():
+            entry = self._entry(item, primary_key, index_name)
+            if entry:
+                rows = partitions[entry[0]]
+                rows.pop(bisect.bisect_left(rows, entry[1]))
+                if not rows:
+                    del partitions[entry[0]]
+
+    def _check(self, item, condition, names, values, operation):
+        if condition is None:
+            return
+        if isinstance(condition, str):
+            ok = _StringExpression(names, values).condition(condition, item)
+        else:
+            ok = evaluate_condition(condition, item)
+        if not ok:
+            raise _client_error('ConditionalCheckFailedException', 'The conditional request failed', operation)
+
+    def _store(self, item):
+        primary_key = self._primary_key(item)
+        old = self._items.get(primary_key)
+        if old is not None:
+            self._unindex(old, primary_key)
+        self._items[primary_key] = item
+        self._index(item, primary_key)
+        return old
+
+    def _key_dict(self, item, index_name):
+        key = {self.hash_key: item[self.hash_key]}
+        if self.range_key:
+            key[self.range_key] = item[self.range_key]
+        if index_name:
+            for attribute in self._schema(index_name):
+                if attribute:
+                    key[attribute] = item[attribute]
+        return key
+
+    # ---- item API ----
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues='NONE'):
+        self._call('PutItem')
+        item = _to_dynamo(dict(Item))
+        with self._lock:
+            old = self._items.get(self._primary_key(item))
+            self._check(old or {}, ConditionExpression, ExpressionAttributeNames,
+                        ExpressionAttributeValues, 'PutItem')
+            self._store(item)
+        response = {}
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            response['Attributes'] = _copy(old)
+        return response
+
+    def get_item(self, Key, ConsistentRead=False):
+        self._call('GetItem')
+        with self._lock:
+            item = self._items.get(self._primary_key(_to_dynamo(Key)))
+            if item is None:
+                return {}
+            self.read_items += 1
+            return {'Item': _copy(item)}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None):
+        self._call('DeleteItem')
+        primary_key = self._primary_key(_to_dynamo(Key))
+        with self._lock:
+            old = self._items.get(primary_key)
+            self._check(old or {}, ConditionExpression, ExpressionAttributeNames,
+                        ExpressionAttributeValues, 'DeleteItem')
+            if old is not None:
+                self._unindex(old, primary_key)
+                del self._items[primary_key]
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ConditionExpression=None, ReturnValues='NONE'):
+        self._call('UpdateItem')
+        key = _to_dynamo(Key)
+        primary_key = self._primary_key(key)
+        with self._lock:
+            old = self._items.get(primary_key)
+            self._check(old or {}, ConditionExpression, ExpressionAttributeNames,
+                        ExpressionAttributeValues, 'UpdateItem')
+            item = _copy(old) if old is not None else dict(key)
+            _StringExpression(ExpressionAttributeNames, ExpressionAttributeValues).update(UpdateExpression, item)
+            self._store(item)
+        if ReturnValues == 'ALL_NEW':
+            return {'Attributes': _copy(item)}
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            return {'Attributes': _copy(old)}
+        return {}
+
+    # ---- reads ----
+
+    def query(self, KeyConditionExpression, IndexName=None, ScanIndexForward=True, Limit=None,
+              ExclusiveStartKey=None, FilterExpression=None, ConsistentRead=False, Select=None):
+        self._call('Query')
+        hash_key, range_key = self._schema(IndexName)
+        hash_value, range_condition = self._split_key_condition(KeyConditionExpression, hash_key)
+
+        with self._lock:
+            rows = self._partitions[IndexName].get(_to_dynamo(hash_value), [])
+            start, end = self._range_bounds(rows, range_condition)
+            positions = range(start, end) if ScanIndexForward else range(end - 1, start - 1, -1)
+
+            if ExclusiveStartKey:
+                start_key = _to_dynamo(ExclusiveStartKey)
+                marker = (start_key[range_key] if range_key else '', self._primary_key(start_key))
+                cut = bisect.bisect_right(rows, marker) if ScanIndexForward else bisect.bisect_left(rows, marker)
+                positions = range(max(start, cut), end) if ScanIndexForward else range(min(end, cut) - 1, start - 1, -1)
+
+            return self._collect(rows, positions, range_condition, Limit, FilterExpression, IndexName, Select)
+
+    def _split_key_condition(self, condition, hash_key):
+        expression = condition.get_expression()
+        if expression['operator'] == 'AND':
+            parts = list(expression['values'])
+        else:
+            parts = [condition]
+        hash_value = None
+        range_condition = None
+        for part in parts:
+            values = part.get_expression()['values']
+            if part.expression_operator == '=' and values[0].name == hash_key:
+                hash_value = values[1]
+            else:
+                range_condition = part
+        if hash_value is None:
+            raise _client_error('ValidationException', 'Query condition missed key schema element', 'Query')
+        return hash_value, range_condition
+
+    def _range_bounds(self, rows, condition):
+        if condition is None:
+            return 0, len(rows)
+        expression = condition.get_expression()
+        op = expression['operator']
+        values = [_to_dynamo(v) for v in expression['values'][1:]]
+        lo = lambda v: bisect.bisect_left(rows, (v,))
+        hi = lambda v: bisect.bisect_right(rows, (v, (_Max(), _Max())))
+        if op == '=':
+            return lo(values[0]), hi(values[0])
+        if op == '<':
+            return 0, lo(values[0])
+        if op == '<=':
+            return 0, hi(values[0])
+        if op == '>':
+            return hi(values[0]), len(rows)
+        if op == '>=':
+            return lo(values[0]), len(rows)
+        if op == 'BETWEEN':
+            return lo(values[0]), hi(values[1])
+        if op == 'begins_with':
+            start = lo(values[0])
+            end = start
+            while end < len(rows) and str(rows[end][0]).startswith(values[0]):
+                end += 1
+            return start, end
+        raise _client_error('ValidationException', f'Unsupported key condition: {op}', 'Query')
+
+    def _collect(self, rows, positions, range_condition, limit, filter_expression, index_name, select):
+        items = []
+        evaluated = 0
+        last = None
+        more = False
+        for position in positions:
+            if limit is not None and evaluated >= limit:
+                more = True
+                break
+            item = self._items[rows[position][1]]
+            evaluated += 1
+            last = item
+            if filter_expression is None or evaluate_condition(filter_expression, item):
+                items.append(_copy(item))
+        self.read_items += evaluated
+        response = {'Items': items, 'Count': len(items), 'ScannedCount': evaluated}
+        if select == 'COUNT':
+            del response['Items']
+        if more and last is not None:
+            response['LastEvaluatedKey'] = self._key_dict(last, index_name)
+        return response
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, FilterExpression=None, IndexName=None,
+             ConsistentRead=False, Select=None):
+        self._call('Scan')
+        with self._lock:
+            keys = list(self._items)
+            start = 0
+            if ExclusiveStartKey:
+                start_key = self._primary_key(_to_dynamo(ExclusiveStartKey))
+                start = keys.index(start_key) + 1 if start_key in self._items else len(keys)
+            rows = [(None, key) for key in keys]
+            return self._collect(rows, range(start, len(rows)), None, Limit, FilterExpression, IndexName, Select)
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return LocalBatchWriter(self, overwrite_by_pkeys)
+
+    def batch_write(self, requests):
+        # One BatchWriteItem call: up to 25 puts/deletes applied together
+        if len(requests) > 25:
+            raise _client_error('ValidationException', 'Too many items requested for the BatchWriteItem call', 'BatchWriteItem')
+        self._call('BatchWriteItem')
+        with self._lock:
+            for request in requests:
+                if 'PutRequest' in request:
+                    self._store(_to_dynamo(dict(request['PutRequest']['Item'])))
+                else:
+                    primary_key = self._primary_key(_to_dynamo(request['DeleteRequest']['Key']))
+                    old = self._items.pop(primary_key, None)
+                    if old is not None:
+                        self._unindex(old, primary_key)
+
+    def item_count(self):
+        return len(self._items)
+
+
+class _Max:
+    # Sorts after every key value; used for inclusive upper bounds
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, _Max)
+
+
+class LocalBatchWriter:
+    """Buffers writes and flushes them 25 at a time, like boto3's BatchWriter."""
+
+    batch_size = 25
+
+    def __init__(self, table, overwrite_by_pkeys=None):
+        self._table = table
+        self._overwrite_by_pkeys = overwrite_by_pkeys
+        self._buffer = []
+
+    def put_item(self, Item):
+        self._add({'PutRequest': {'Item': Item}})
+
+    def delete_item(self, Key):
+        self._add({'DeleteRequest': {'Key': Key}})
+
+    def _add(self, request):
+        if self._overwrite_by_pkeys:
+            body = request.get('PutRequest', {}).get('Item') or request['DeleteRequest']['Key']
+            key = tuple(body[k] for k in self._overwrite_by_pkeys)
+            self._buffer = [r for r in self._buffer
+                            if tuple((r.get('PutRequest', {}).get('Item') or r['DeleteRequest']['Key'])[k]
+                                     for k in self._overwrite_by_pkeys) != key]
+        self._buffer.append(request)
+        if len(self._buffer) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        while self._buffer:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._table.batch_write(batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._flush()
+
+
+class LocalDynamoDB:
+    """Stands in for boto3.resource('dynamodb'): Table(name) returns a LocalTable."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def create_table(self, name, hash_key, range_key=None, indexes=None):
+        with self._lock:
+            table = LocalTable(name, hash_key, range_key, indexes, latency=self.latency)
+            self._tables[name] = table
+            return table
+
+    def Table(self, name):
+        with self._lock:
+            if name not in self._tables:
+                self._tables[name] = LocalTable(name, 'id', latency=self.latency)
+            return self._tables[name]
+
+
+# -------------------- SNS --------------------
+
+class LocalSNS:
+    """Records published messages instead of sending them."""
+
+    def __init__(self, latency=0.0, fail=False):
+        self.latency = latency
+        self.fail = fail
+        self.published = []
+        self._lock = threading.Lock()
+
+    def publish(self, Message, PhoneNumber=None, TopicArn=None, Subject=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail:
+            raise _client_error('InternalError', 'Simulated SNS failure', 'Publish')
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self.published.append({
+                'MessageId': message_id,
+                'Message': Message,
+                'PhoneNumber': PhoneNumber,
+                'TopicArn': TopicArn,
+                'Subject': Subject,
+            })
+        return {'MessageId': message_id}
@@ -0,0 +1,198 @@
+"""Append-only local storage for contact messages and review mirrors.
+
+Two interchangeable backends, chosen by URL:
+
+    sqlite:///local_store.db   SQLite in WAL mode (default)
+    file://data                one text file per stream, flock'ed appends
+
+Both support safe appends from several processes and newest-first pages
+that never read the whole stream.
+
+    python local_store.py migrate --contacts contacts.txt --reviews reviews.txt
+"""
+import argparse
+import fcntl
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class SQLiteStore:
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' stream TEXT NOT NULL,'
+                ' created_at TEXT NOT NULL,'
+                ' body TEXT NOT NULL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS entries_stream_id ON entries (stream, id)')
+
+    def _connect(self):
+        # One connection per thread and per process (connections must not cross a fork)
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def append(self, stream, body):
+        self._connect().execute(
+            'INSERT INTO entries (stream, created_at, body) VALUES (?, ?, ?)', (stream, _now(), body))
+
+    def append_many(self, stream, bodies):
+        db = self._connect()
+        created_at = _now()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'INSERT INTO entries (stream, created_at, body) VALUES (?, ?, ?)',
+                ((stream, created_at, body) for body in bodies))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def latest(self, stream, limit=50, cursor=None):
+        """Return (bodies newest first, cursor for the next older page or None)."""
+        if cursor is None:
+            rows = self._connect().execute(
+                'SELECT id, body FROM entries WHERE stream = ? ORDER BY id DESC LIMIT ?',
+                (stream, limit + 1)).fetchall()
+        else:
+            rows = self._connect().execute(
+                'SELECT id, body FROM entries WHERE stream = ? AND id < ? ORDER BY id DESC LIMIT ?',
+                (stream, int(cursor), limit + 1)).fetchall()
+        page = rows[:limit]
+        next_cursor = str(page[-1][0]) if len(rows) > limit else None
+        return [body for _, body in page], next_cursor
+
+    def count(self, stream):
+        return self._connect().execute('SELECT COUNT(*) FROM entries WHERE stream = ?', (stream,)).fetchone()[0]
+
+
+class TextFileStore:
+    """One newline-delimited file per stream; the cursor is a byte offset."""
+
+    block_size = 64 * 1024
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, stream):
+        return os.path.join(self.directory, f'{stream}.txt')
+
+    def append(self, stream, body):
+        self.append_many(stream, [body])
+
+    def append_many(self, stream, bodies):
+        data = ''.join(body.replace('\n', ' ') + '\n' for body in bodies).encode('utf-8')
+        # O_APPEND plus an exclusive lock keeps concurrent workers' lines whole
+        fd = os.open(self._path(stream), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def latest(self, stream, limit=50, cursor=None):
+        try:
+            f = open(self._path(stream), 'rb')
+        except FileNotFoundError:
+            return [], None
+        with f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            end = f.seek(0, os.SEEK_END) if cursor is None else int(cursor)
+            # Read backwards a block at a time until limit + 1 newlines are
+            # in hand, so at least `limit` whole lines precede `end`
+            chunks = []
+            position = end
+            newlines = 0
+            while position > 0 and newlines <= limit:
+                size = min(self.block_size, position)
+                position -= size
+                f.seek(position)
+                chunk = f.read(size)
+                chunks.append(chunk)
+                newlines += chunk.count(b'\n')
+
+        lines = b''.join(reversed(chunks)).split(b'\n')[:-1]
+        if position > 0:
+            # The first piece may start mid-line
+            lines = lines[1:]
+        page = lines[-limit:] if limit else []
+        start = end - sum(len(line) + 1 for line in page)
+        next_cursor = str(start) if start > 0 else None
+        return [line.decode('utf-8') for line in reversed(page)], next_cursor
+
+    def count(self, stream):
+        try:
+            with open(self._path(stream), 'rb') as f:
+                return sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b''))
+        except FileNotFoundError:
+            return 0
+
+
+def open_store(url):
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    if url.startswith('file://'):
+        return TextFileStore(url[len('file://'):])
+    raise ValueError(f'Unsupported local store URL: {url}')
+
+
+# -------------------- Migration --------------------
+
+def migrate_file(store, stream, path, batch_size=10000, force=False):
+    """Copy a legacy text file (one entry per line, oldest first) into a stream."""
+    if store.count(stream) and not force:
+        raise SystemExit(f'{stream} already has entries; rerun with --force to append anyway')
+    migrated = 0
+    batch = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            batch.append(line)
+            if len(batch) >= batch_size:
+                store.append_many(stream, batch)
+                migrated += len(batch)
+                batch = []
+    if batch:
+        store.append_many(stream, batch)
+        migrated += len(batch)
+    return migrated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local contact/review store tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate = commands.add_parser('migrate', help='import contacts.txt / reviews.txt')
+    migrate.add_argument('--store', default=os.environ.get('LOCAL_STORE_URL', 'sqlite:///local_store.db'))
+    migrate.add_argument('--contacts', help='legacy contacts file')
+    migrate.add_argument('--reviews', help='legacy reviews file')
+    migrate.add_argument('--force', action='store_true')
+    args = parser.parse_args(argv)
+
+    store = open_store(args.store)
+    for stream, path in (('contacts', args.contacts), ('reviews', args.reviews)):
+        if path:
+            print(f'{stream}: {migrate_file(store, stream, path, force=args.force)} entries migrated from {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Non-blocking logging: callers enqueue records, one thread writes them.
+
+Request threads only pay for building the record and a queue put; the
+file and console handlers run on a QueueListener thread. Records are
+JSON lines carrying the request id (and duration, where one was logged),
+and chosen high-volume messages are sampled down to a fixed fraction.
+
+logs/app.log is shared by every gunicorn worker, so by default it is
+left to an external logrotate: each worker appends through a
+WatchedFileHandler and reopens the file once it has been moved. Size
+rotation inside the process ('size') is only safe with a single process
+writing, e.g. the development server; several processes renaming the
+same file lose lines.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ContextFilter(logging.Filter):
+    """Stamps records with fields from the current request (e.g. request_id).
+
+    Runs on the logging thread's caller, before the record is queued, so
+    request-local state is still available.
+    """
+
+    def __init__(self, context):
+        super().__init__()
+        self.context = context
+
+    def filter(self, record):
+        for key, value in self.context().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 in N records for each listed message template.
+
+    Matching is on the unformatted message (record.msg), so every order id
+    logged through "Order accepted: %s" counts towards the same sample.
+    Warnings and errors are never dropped.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.every = {message: max(1, round(1 / rate)) if rate > 0 else 0 for message, rate in rates.items()}
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        every = self.every.get(record.msg)
+        if every is None or record.levelno > logging.INFO:
+            return True
+        if not every:
+            return False
+        if every == 1:
+            return True
+        with self._lock:
+            seen = self._seen[record.msg] = self._seen.get(record.msg, 0) + 1
+        # Each kept line stands for `every` occurrences
+        record.sampled = every
+        return seen % every == 1
+
+
+class _PreparedQueueHandler(QueueHandler):
+
+    def prepare(self, record):
+        # Keep extra fields and the traceback for the JSON formatter
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LogPipeline:
+    """Installs a QueueHandler on the root logger and owns its listener thread.
+
+    The listener thread does not survive fork, so a fresh queue and
+    listener are started in every child (gunicorn workers after preload).
+    """
+
+    def __init__(self, handlers, level=logging.INFO, filters=()):
+        self.handlers = handlers
+        self.level = level
+        self.filters = list(filters)
+        self.queue = None
+        self.listener = None
+        self.handler = None
+
+    def start(self):
+        self.queue = queue.SimpleQueue()
+        self.handler = _PreparedQueueHandler(self.queue)
+        for f in self.filters:
+            self.handler.addFilter(f)
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+        os.register_at_fork(after_in_child=self._restart_in_child)
+        return self
+
+    def _restart_in_child(self):
+        self.queue = queue.SimpleQueue()
+        self.handler.queue = self.queue
+        self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """Drain queued records and stop the listener thread."""
+        listener, self.listener = self.listener, None
+        if listener is not None and listener._thread is not None:
+            listener.stop()
+        for handler in self.handlers:
+            handler.flush()
+
+
+ROTATIONS = ('external', 'size')
+
+
+def build_handlers(log_file=None, max_bytes=10 * 1024 * 1024, backup_count=5, console=True, json_format=True,
+                   rotation='external'):
+    if rotation not in ROTATIONS:
+        raise ValueError(f'rotation must be one of {", ".join(ROTATIONS)}')
+    formatter = JSONFormatter() if json_format else logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = []
+    if log_file and rotation == 'size':
+        handlers.append(RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'))
+    elif log_file:
+        handlers.append(WatchedFileHandler(log_file, encoding='utf-8'))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
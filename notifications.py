@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from datetime import datetime, timezone
+from email.mime.text import MIMEText
+
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryUncertain(Exception):
+    """The connection failed after the message was handed over; it may have been delivered."""
+
+
+def _permanent(error):
+    # 5xx refusals are repeated however often a message is retried; 4xx
+    # and connection errors are worth another attempt
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in error.recipients.values())
+    return False
+
+
+class _SMTP(smtplib.SMTP):
+
+    def data(self, msg):
+        # From here on a dropped connection may mean the server kept the message
+        self.handed_over = True
+        return super().data(msg)
+
+
+class SMTPConnection:
+    """One long-lived SMTP session, reopened when the server drops it."""
+
+    def __init__(self, host, port, user=None, password=None, use_tls=True, timeout=10):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._server = None
+
+    def _connect(self):
+        server = _SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        self._server = server
+
+    def send(self, msg):
+        """Send msg; retried on a fresh connection only if it failed before the DATA command.
+
+        A server's explicit refusal (SMTPResponseException) is raised as is.
+        A connection lost during or after DATA raises DeliveryUncertain,
+        since sending again could deliver the message twice.
+        """
+        for attempt in range(2):
+            if self._server is None:
+                self._connect()
+            self._server.handed_over = False
+            try:
+                self._server.send_message(msg)
+                return
+            except smtplib.SMTPResponseException:
+                raise
+            except OSError as e:
+                handed_over = self._server.handed_over
+                self.close()
+                if handed_over:
+                    raise DeliveryUncertain(str(e)) from e
+                # Idle connections get closed by the server; retry once on a fresh one
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+class NotificationDispatcher:
+    """Bounded queue + worker pool that delivers emails and SNS messages off the request thread.
+
+    Each worker keeps its own SMTP connection open between jobs. Failed jobs
+    are retried with exponential backoff and, once out of attempts (or when
+    the queue is full), appended to a JSON Lines dead-letter file. A
+    permanent (5xx) SMTP refusal is dead-lettered without retrying.
+    Workers start lazily in the process that first submits a job, so the
+    dispatcher is safe to create before a pre-forking server forks.
+    """
+
+    def __init__(self, smtp_factory, sns_client, sender, workers=2, queue_size=1000,
+                 max_attempts=4, backoff=0.5, dead_letter_file=None):
+        self.smtp_factory = smtp_factory
+        self.sns_client = sns_client
+        self.sender = sender
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.dead_letter_file = dead_letter_file
+        self._lock = threading.Lock()
+        self._dead_letter_lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._threads = []
+        self._stopping = threading.Event()
+        self._counts_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+
+    # -------------------- Lifecycle --------------------
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._stopping.clear()
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'notify-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=10):
+        """Stop accepting jobs and let the workers drain what is queued.
+
+        Jobs submitted afterwards in this process are dead-lettered rather
+        than restarting the workers mid-shutdown.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            if self._pid != os.getpid() or self._stopping.is_set():
+                return
+            self._stopping.set()
+            jobs, threads = self._queue, self._threads
+        # Outside the lock and bounded: a full queue mustn't hang shutdown
+        for _ in threads:
+            try:
+                jobs.put(None, timeout=max(0, deadline - time.monotonic()))
+            except queue.Full:
+                logger.error("Notification queue still full at shutdown, %d jobs not sent", jobs.qsize())
+                return
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # -------------------- Producers --------------------
+
+    def submit(self, job):
+        self.start()
+        if self._stopping.is_set():
+            logger.warning("Notification dispatcher stopped, dead-lettering %s job", job['kind'])
+            self._dead_letter(job, 'dispatcher stopped')
+            return False
+        job.setdefault('attempts', 0)
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            logger.error("Notification queue full, dropping %s job", job['kind'])
+            self._dead_letter(job, 'queue full')
+            return False
+
+    def email(self, to_email, subject, body):
+        return self.submit({'kind': 'email', 'to': to_email, 'subject': subject, 'body': body})
+
+    def sns(self, message, phone_number=None, topic_arn=None):
+        return self.submit({'kind': 'sns', 'message': message, 'phone_number': phone_number, 'topic_arn': topic_arn})
+
+    # -------------------- Workers --------------------
+
+    def _run(self):
+        connection = self.smtp_factory()
+        try:
+            while True:
+                job = self._queue.get()
+                try:
+                    if job is None:
+                        return
+                    self._process(connection, job)
+                finally:
+                    self._queue.task_done()
+        finally:
+            connection.close()
+
+    def _process(self, connection, job):
+        while True:
+            job['attempts'] += 1
+            try:
+                self._deliver(connection, job)
+                with self._counts_lock:
+                    self.sent += 1
+                return
+            except DeliveryUncertain as e:
+                with self._counts_lock:
+                    self.failed += 1
+                logger.error("Notification may have been delivered, not retrying: %s", e)
+                self._dead_letter(job, f'delivery uncertain: {e}')
+                return
+            except Exception as e:
+                if _permanent(e):
+                    with self._counts_lock:
+                        self.failed += 1
+                    logger.error("Notification refused permanently, not retrying: %s", e)
+                    self._dead_letter(job, f'refused: {e}')
+                    return
+                if job['attempts'] >= self.max_attempts:
+                    with self._counts_lock:
+                        self.failed += 1
+                    logger.error("Notification failed after %d attempts: %s", job['attempts'], e)
+                    self._dead_letter(job, str(e))
+                    return
+                delay = self.backoff * 2 ** (job['attempts'] - 1)
+                logger.warning("Notification attempt %d failed (%s), retrying in %.1fs", job['attempts'], e, delay)
+                connection.close()
+                time.sleep(delay)
+
+    def _deliver(self, connection, job):
+        if job['kind'] == 'email':
+            msg = MIMEText(job['body'])
+            msg['Subject'] = job['subject']
+            msg['From'] = self.sender
+            msg['To'] = job['to']
+            connection.send(msg)
+            logger.info("Order email sent to %s", job['to'])
+        elif job['phone_number']:
+            self.sns_client.publish(PhoneNumber=job['phone_number'], Message=job['message'])
+            logger.info("SNS SMS sent to %s", job['phone_number'])
+        else:
+            self.sns_client.publish(TopicArn=job['topic_arn'], Message=job['message'])
+            logger.info("SNS message published to topic %s", job['topic_arn'])
+
+    def _dead_letter(self, job, error):
+        if not self.dead_letter_file:
+            return
+        record = dict(job, error=error, failed_at=datetime.now(timezone.utc).isoformat())
+        with self._dead_letter_lock:
+            with open(self.dead_letter_file, 'a') as f:
+                f.write(json.dumps(record) + '\n')
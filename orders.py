@@ -0,0 +1,423 @@
+import base64
+import binascii
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+
+logger = logging.getLogger(__name__)
+
+# GSI on the orders table: partition "username", sort "created_at" (ISO-8601 UTC)
+ORDERS_BY_USER_INDEX = 'username-created_at-index'
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+class OrderJournal:
+    """Append-only JSON Lines journal of accepted orders and flush acknowledgements.
+
+    Every process writes its own file and holds an exclusive flock on it
+    while alive. A file whose lock can be taken belongs to a dead process,
+    so its unacknowledged orders can safely be replayed.
+    """
+
+    def __init__(self, directory, fsync=False):
+        self.directory = directory
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'orders-{os.getpid()}.jsonl')
+        self._file = open(self.path, 'a', encoding='utf-8')
+        fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._lock = threading.Lock()
+        # A crashed process with the same pid (e.g. pid 1 in a container)
+        # leaves its pending orders in the file we just reopened
+        self._inherited = self.replay(self.path)
+
+    def _write(self, record):
+        line = json.dumps(record, default=_json_default, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def accepted(self, order):
+        self._write({'op': 'order', 'order': order})
+
+    def flushed(self, order_ids):
+        self._write({'op': 'flushed', 'ids': list(order_ids)})
+
+    def compact(self, pending):
+        """Rewrite the journal with only the still-pending orders."""
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as tmp:
+                for order in pending:
+                    tmp.write(json.dumps({'op': 'order', 'order': order}, default=_json_default) + '\n')
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            # Lock the new file before it replaces the old one so the
+            # path is never briefly unlocked
+            new_file = open(tmp_path, 'a', encoding='utf-8')
+            fcntl.flock(new_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.replace(tmp_path, self.path)
+            self._file.close()
+            self._file = new_file
+
+    def size(self):
+        with self._lock:
+            return self._file.tell()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    @staticmethod
+    def replay(path):
+        pending = OrderedDict()
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+                if record['op'] == 'order':
+                    pending[record['order']['order_id']] = record['order']
+                else:
+                    for order_id in record['ids']:
+                        pending.pop(order_id, None)
+        return list(pending.values())
+
+    def recover_orphans(self):
+        """Collect pending orders from journals left behind by dead processes."""
+        recovered, self._inherited = self._inherited, []
+        for path in glob.glob(os.path.join(self.directory, 'orders-*.jsonl')):
+            if path == self.path:
+                continue
+            try:
+                with open(path, 'a+', encoding='utf-8') as f:
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    orders = self.replay(path)
+                    # Adopt them into our journal before removing the orphan
+                    for order in orders:
+                        self.accepted(order)
+                    os.remove(path)
+                    recovered.extend(orders)
+            except FileNotFoundError:
+                continue
+        return recovered
+
+
+class OrderClaims:
+    """Idempotency keys claimed in a table shared by every worker.
+
+    A checkout claims its key with a conditional put before any side
+    effect (stock, email, SNS, rollups), so a resubmission that reaches
+    another worker, or arrives after a restart, finds the key taken.
+    Claims carry an expires_at epoch for the table's DynamoDB TTL.
+    """
+
+    def __init__(self, table, ttl_seconds=7 * 24 * 3600):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+
+    def claim(self, order_id, username):
+        """Returns False if the key was already claimed."""
+        try:
+            self.table.put_item(
+                Item={'order_id': order_id, 'username': username, 'expires_at': int(time.time()) + self.ttl_seconds},
+                ConditionExpression='attribute_not_exists(order_id)'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
+
+    def release(self, order_id):
+        """Give the key back after a checkout that failed before the order was accepted."""
+        self.table.delete_item(Key={'order_id': order_id})
+
+    def claimed(self, order_id):
+        return 'Item' in self.table.get_item(Key={'order_id': order_id}, ConsistentRead=True)
+
+
+class OrderWriter:
+    """Write-behind buffer for orders.
+
+    submit() journals the order and returns; a background thread writes
+    buffered orders with batch_writer in 25-item BatchWriteItem calls.
+    Orders are keyed by an idempotency key, so a retried checkout maps to
+    the same order_id and overwrites rather than double-books. The
+    duplicate check here only knows this process's keys; OrderClaims is
+    what stops a retry that lands on another worker.
+    """
+
+    def __init__(self, table, journal_dir, batch_size=25, flush_interval=0.2, max_pending=50000,
+                 fsync=False, compact_bytes=16 * 1024 * 1024, recent_keys=100000):
+        self.table = table
+        self.journal_dir = journal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+        self.recent_keys = recent_keys
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pid = None
+        self._journal = None
+        self._pending = deque()
+        self._in_flight = {}
+        self._recent = OrderedDict()
+        self._listeners = []
+        self._thread = None
+        self._stopping = False
+        self._started_at = None
+        self._oldest = 0.0
+        self.accepted = 0
+        self.duplicates = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+
+    # -------------------- Lifecycle --------------------
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._journal = OrderJournal(self.journal_dir, fsync=self.fsync)
+            self._pending = deque(self._journal.recover_orphans())
+            for order in self._pending:
+                self._recent[order['order_id']] = True
+            self._in_flight = {}
+            self._stopping = False
+            self._started_at = time.monotonic()
+            if self._pending:
+                logger.info("Recovered %d unflushed orders from journal", len(self._pending))
+            self._thread = threading.Thread(target=self._run, name='order-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=30):
+        """Flush everything buffered, then stop the writer thread."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._stopping = True
+            self._wakeup.notify()
+            thread = self._thread
+        thread.join(timeout)
+        with self._lock:
+            if thread.is_alive():
+                # Still inside a flush that will write to the journal; leave
+                # it open, and its orders to be replayed if they never land
+                logger.warning("Order writer still flushing after %ss; %s is left for replay",
+                               timeout, self._journal.path)
+                return
+            self._journal.close()
+            if not self._pending and not self._in_flight:
+                os.remove(self._journal.path)
+            self._pid = None
+
+    # -------------------- Producers --------------------
+
+    def submit(self, order):
+        """Accept an order; returns False if this idempotency key was already taken."""
+        self.start()
+        key = order['order_id']
+        with self._lock:
+            if key in self._recent:
+                self.duplicates += 1
+                return False
+            if len(self._pending) >= self.max_pending:
+                raise OverflowError('Order buffer is full')
+            self._journal.accepted(order)
+            self._recent[key] = True
+            if len(self._recent) > self.recent_keys:
+                self._recent.popitem(last=False)
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(order)
+            self.accepted += 1
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+        return True
+
+    def is_duplicate(self, order_id):
+        with self._lock:
+            return order_id in self._recent
+
+    def pending_for(self, username):
+        """This process's accepted orders for a user that may not be in DynamoDB yet."""
+        with self._lock:
+            return [order for order in list(self._in_flight.values()) + list(self._pending)
+                    if order.get('username') == username]
+
+    def on_flush(self, listener):
+        """Call listener(batch) after each batch is written and acknowledged (used for rollups).
+
+        A listener sees each order at most once: if the process dies
+        before it runs, the replayed journal no longer holds the batch.
+        """
+        self._listeners.append(listener)
+        return listener
+
+    # -------------------- Flushing --------------------
+
+    def _run(self):
+        backoff = self.flush_interval
+        while True:
+            with self._lock:
+                # Wait for a full batch, or until the oldest buffered order
+                # has waited flush_interval
+                while not self._stopping and len(self._pending) < self.batch_size:
+                    timeout = self.flush_interval
+                    if self._pending:
+                        timeout = self._oldest + self.flush_interval - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    self._wakeup.wait(timeout)
+                if not self._pending:
+                    if self._stopping:
+                        return
+                    continue
+                batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.batch_size * 20))]
+                for order in batch:
+                    self._in_flight[order['order_id']] = order
+
+            try:
+                self._flush(batch)
+                backoff = self.flush_interval
+            except Exception as e:
+                logger.error("Order flush failed for %d orders, retrying: %s", len(batch), e)
+                with self._lock:
+                    self.flush_errors += 1
+                    self._in_flight.clear()
+                    self._pending.extendleft(reversed(batch))
+                    self._oldest = time.monotonic()
+                    if self._stopping and backoff > 30:
+                        logger.error("Giving up on %d orders at shutdown; they remain in %s",
+                                     len(self._pending), self._journal.path)
+                        return
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        with self.table.batch_writer(overwrite_by_pkeys=['order_id']) as writer:
+            for order in batch:
+                writer.put_item(Item=order)
+        elapsed = time.perf_counter() - started
+        # Acknowledge before the listeners run: a crash in between must not
+        # replay the batch into non-idempotent listeners (the rollup ADDs)
+        self._journal.flushed(order['order_id'] for order in batch)
+        for listener in self._listeners:
+            try:
+                listener(batch)
+            except Exception as e:
+                logger.error("Order flush listener failed for %d orders: %s", len(batch), e)
+
+        with self._lock:
+            for order in batch:
+                self._in_flight.pop(order['order_id'], None)
+            self.flushed += len(batch)
+            self.flushes += 1
+            self.flush_seconds_total += elapsed
+            self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+            if self._journal.size() > self.compact_bytes:
+                self._journal.compact(list(self._in_flight.values()) + list(self._pending))
+        logger.info("Flushed %d orders to DynamoDB in %.1f ms", len(batch), elapsed * 1e3)
+
+    # -------------------- Metrics --------------------
+
+    def stats(self):
+        with self._lock:
+            uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+            return {
+                'orders_accepted': self.accepted,
+                'orders_flushed': self.flushed,
+                'orders_duplicate': self.duplicates,
+                'orders_per_sec': self.flushed / uptime if uptime else 0.0,
+                'queue_depth': len(self._pending) + len(self._in_flight),
+                'flushes': self.flushes,
+                'flush_errors': self.flush_errors,
+                'flush_latency_avg_ms': self.flush_seconds_total / self.flushes * 1e3 if self.flushes else 0.0,
+                'flush_latency_max_ms': self.flush_seconds_max * 1e3,
+            }
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class OrderHistory:
+    """A user's orders, newest first, read from the username/created_at GSI.
+
+    Pages are Query calls bounded by `limit`; the cursor is the GSI's
+    LastEvaluatedKey, so reading page N never re-reads pages before it.
+    """
+
+    def __init__(self, table, index_name=ORDERS_BY_USER_INDEX, page_size=20):
+        self.table = table
+        self.index_name = index_name
+        self.page_size = page_size
+
+    @staticmethod
+    def encode_cursor(key):
+        raw = json.dumps(key, sort_keys=True, separators=(',', ':'), default=_json_default)
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor, username):
+        try:
+            key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (ValueError, binascii.Error, UnicodeError):
+            raise InvalidCursor(cursor)
+        if not isinstance(key, dict) or set(key) != {'order_id', 'username', 'created_at'}:
+            raise InvalidCursor(cursor)
+        # A cursor only ever continues the listing it came from
+        if key['username'] != username:
+            raise InvalidCursor(cursor)
+        if not isinstance(key['order_id'], str) or not isinstance(key['created_at'], str):
+            raise InvalidCursor(cursor)
+        try:
+            datetime.fromisoformat(key['created_at'])
+        except ValueError:
+            raise InvalidCursor(cursor)
+        return key
+
+    def page(self, username, cursor=None, limit=None):
+        """Returns (orders, next_cursor)."""
+        kwargs = {
+            'IndexName': self.index_name,
+            'KeyConditionExpression': Key('username').eq(username),
+            'ScanIndexForward': False,
+            'Limit': limit or self.page_size,
+        }
+        if cursor:
+            kwargs['ExclusiveStartKey'] = self.decode_cursor(cursor, username)
+        response = self.table.query(**kwargs)
+        last = response.get('LastEvaluatedKey')
+        return response['Items'], self.encode_cursor(last) if last else None
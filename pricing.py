@@ -0,0 +1,265 @@
+"""Cart pricing: line discounts, quantity tiers, coupons and shipping.
+
+Rules are plain dicts, like the catalog's products:
+
+    {"id": "veg-10", "kind": "discount", "category": "veg", "percent": 10}
+    {"id": "mango-3-plus", "kind": "discount", "product_id": 3, "min_quantity": 3, "amount_off": 20}
+    {"id": "welcome", "kind": "coupon", "code": "WELCOME100", "amount_off": 100, "min_subtotal": 500}
+    {"id": "standard", "kind": "shipping", "amount": 50}
+    {"id": "free-over-999", "kind": "shipping", "amount": 0, "min_subtotal": 999}
+
+A discount targets one product, one category, or (with neither) every
+line; a min_quantity above 1 makes it a quantity tier. `percent` takes
+that share of the line total and `amount_off` comes off each unit. Each
+line gets its single best discount. A coupon then applies to the
+discounted lines it covers (its own product_id/category, or all of
+them) and is spread over those lines, so every line carries its share.
+Shipping is the rule with the highest min_subtotal the discounted
+merchandise total reaches, and nothing for an empty cart. Amounts are
+whole rupees, rounded down in the customer's favour.
+
+Discounts are compiled into per-product and per-category tier lists
+sorted by min_quantity, each entry holding the best percent and best
+amount_off rule reached so far. A line bisects three lists (its product,
+its category, the catch-alls) and compares at most six rules, so pricing
+a cart costs O(lines) however many rules are loaded. Quotes are memoized
+by cart version, coupon, rule set and catalog version; treat them as
+read-only.
+"""
+import bisect
+import json
+import threading
+from collections import OrderedDict
+
+
+KINDS = ('discount', 'coupon', 'shipping')
+
+
+class InvalidRule(ValueError):
+    pass
+
+
+def load_rules(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _amount(rule, field, minimum):
+    value = rule.get(field)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise InvalidRule(f"Rule {rule.get('id')!r}: {field} must be a whole number >= {minimum}")
+    return value
+
+
+def _validate(rule):
+    if not rule.get('id'):
+        raise InvalidRule(f'Rule without an id: {rule!r}')
+    kind = rule.get('kind')
+    if kind not in KINDS:
+        raise InvalidRule(f"Rule {rule['id']!r}: kind must be one of {', '.join(KINDS)}")
+    if rule.get('product_id') is not None and rule.get('category') is not None:
+        raise InvalidRule(f"Rule {rule['id']!r}: give a product_id or a category, not both")
+    _amount(rule, 'min_quantity', 1)
+    _amount(rule, 'min_subtotal', 0)
+    if kind == 'shipping':
+        if _amount(rule, 'amount', 0) is None:
+            raise InvalidRule(f"Rule {rule['id']!r}: shipping needs an amount")
+        return
+    percent, amount_off = _amount(rule, 'percent', 1), _amount(rule, 'amount_off', 1)
+    if (percent is None) == (amount_off is None) or (percent or 0) > 100:
+        raise InvalidRule(f"Rule {rule['id']!r}: give either a percent (1-100) or an amount_off")
+    if kind == 'coupon' and not rule.get('code'):
+        raise InvalidRule(f"Rule {rule['id']!r}: coupons need a code")
+
+
+def _tiers(rules):
+    """(thresholds, best) with best[i] the top percent and top amount_off rules among the first i+1.
+
+    Rules are sorted by min_quantity, so the rules a line qualifies for are
+    a prefix; the larger percent (or amount_off) always gives the larger
+    discount on the same line, so only these two can win.
+    """
+    rules = sorted(rules, key=lambda rule: rule.get('min_quantity', 1))
+    best = []
+    top_percent = top_amount = None
+    for rule in rules:
+        if 'percent' in rule:
+            if top_percent is None or rule['percent'] > top_percent['percent']:
+                top_percent = rule
+        elif top_amount is None or rule['amount_off'] > top_amount['amount_off']:
+            top_amount = rule
+        best.append((top_percent, top_amount))
+    return [rule.get('min_quantity', 1) for rule in rules], best
+
+
+def compile_rules(rules, version=0):
+    """Index rules for pricing; raises InvalidRule on the first bad one."""
+    by_product, by_category, everywhere = {}, {}, []
+    coupons, shipping = {}, []
+    for rule in rules:
+        _validate(rule)
+        if rule['kind'] == 'shipping':
+            shipping.append(rule)
+        elif rule['kind'] == 'coupon':
+            code = rule['code'].strip().upper()
+            if code in coupons:
+                raise InvalidRule(f'Duplicate coupon code {code!r}')
+            coupons[code] = rule
+        elif rule.get('product_id') is not None:
+            by_product.setdefault(int(rule['product_id']), []).append(rule)
+        elif rule.get('category') is not None:
+            by_category.setdefault(rule['category'], []).append(rule)
+        else:
+            everywhere.append(rule)
+    # Within a min_subtotal, the cheapest shipping sorts last and wins
+    shipping.sort(key=lambda rule: (rule.get('min_subtotal', 0), -rule['amount']))
+    return (
+        version,
+        {product_id: _tiers(rules) for product_id, rules in by_product.items()},
+        {category: _tiers(rules) for category, rules in by_category.items()},
+        _tiers(everywhere),
+        coupons,
+        ([rule.get('min_subtotal', 0) for rule in shipping], shipping),
+    )
+
+
+def _discount(rule, price, quantity):
+    if 'percent' in rule:
+        return price * quantity * rule['percent'] // 100
+    return min(rule['amount_off'], price) * quantity
+
+
+def _covers(rule, line):
+    if rule.get('product_id') is not None:
+        return int(rule['product_id']) == line['id']
+    if rule.get('category') is not None:
+        return rule['category'] == line['category']
+    return True
+
+
+class PricingEngine:
+
+    def __init__(self, catalog, rules=(), memo_size=10000):
+        self.catalog = catalog
+        self.memo_size = memo_size
+        self._lock = threading.Lock()
+        self._memo = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._state = compile_rules(rules)
+
+    def load(self, rules):
+        """Swap in a new rule set; quotes priced under the old one are not reused."""
+        state = compile_rules(rules, self._state[0] + 1)
+        with self._lock:
+            self._state = state
+            self._memo.clear()
+
+    # -------------------- Pricing --------------------
+
+    def quote(self, cart, coupon=None, cart_key=None):
+        """Price a cart ({product_id: qty}); cart_key (e.g. (cart_id, version)) memoizes it."""
+        state = self._state
+        key = None
+        if cart_key is not None:
+            key = (cart_key, coupon, state[0], self.catalog.version)
+            with self._lock:
+                quote = self._memo.get(key)
+                if quote is not None:
+                    self._memo.move_to_end(key)
+                    self.hits += 1
+                    return quote
+                self.misses += 1
+        quote = self._price(state, cart, coupon)
+        if key is not None:
+            with self._lock:
+                self._memo[key] = quote
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        return quote
+
+    def _price(self, state, cart, coupon):
+        _, by_product, by_category, everywhere, coupons, (shipping_thresholds, shipping) = state
+        found = self.catalog.get_many(cart.keys())
+        items = []
+        subtotal = discount = 0
+        for product_id, quantity in cart.items():
+            product = found.get(int(product_id))
+            if product is None:
+                continue
+            price = product['price']
+            best, offer = 0, None
+            for thresholds, tiers in (by_product.get(product['id'], ((), ())),
+                                      by_category.get(product.get('category'), ((), ())),
+                                      everywhere):
+                reached = bisect.bisect_right(thresholds, quantity)
+                if not reached:
+                    continue
+                for rule in tiers[reached - 1]:
+                    if rule is not None:
+                        amount = _discount(rule, price, quantity)
+                        if amount > best:
+                            best, offer = amount, rule['id']
+            items.append({
+                'id': product['id'],
+                'name': product['name'],
+                'category': product.get('category'),
+                'quantity': quantity,
+                'price': price,
+                'image': product['image'],
+                'discount': best,
+                'offer': offer,
+                'coupon_discount': 0,
+                'total': price * quantity - best
+            })
+            subtotal += price * quantity
+            discount += best
+
+        merchandise = subtotal - discount
+        coupon_code, coupon_discount, coupon_error = None, 0, None
+        if coupon:
+            coupon_code, coupon_discount, coupon_error = self._apply_coupon(coupons, coupon, items, merchandise)
+            merchandise -= coupon_discount
+
+        shipping_cost = 0
+        if items:
+            tier = bisect.bisect_right(shipping_thresholds, merchandise)
+            if tier:
+                shipping_cost = shipping[tier - 1]['amount']
+        return {
+            'items': items,
+            'subtotal': subtotal,
+            'discount': discount + coupon_discount,
+            'coupon': coupon_code,
+            'coupon_discount': coupon_discount,
+            'coupon_error': coupon_error,
+            'shipping': shipping_cost,
+            'total': merchandise + shipping_cost,
+        }
+
+    def _apply_coupon(self, coupons, code, items, merchandise):
+        """(code, discount, error); the discount is spread over the covered lines."""
+        rule = coupons.get(code.strip().upper())
+        if rule is None:
+            return None, 0, f'Coupon {code} is not valid.'
+        if merchandise < rule.get('min_subtotal', 0):
+            return None, 0, f"Coupon {rule['code']} needs an order of at least ₹{rule['min_subtotal']}."
+        covered = [item for item in items if _covers(rule, item) and item['total'] > 0]
+        base = sum(item['total'] for item in covered)
+        if not base:
+            return None, 0, f"Coupon {rule['code']} doesn't apply to anything in your cart."
+        if 'percent' in rule:
+            amount = base * rule['percent'] // 100
+        else:
+            amount = min(rule['amount_off'], base)
+        # Cumulative rounding: shares add up to the amount and none exceeds its line
+        spread = running = 0
+        for item in covered:
+            running += item['total']
+            share = amount * running // base - spread
+            spread += share
+            item['coupon_discount'] = share
+            item['total'] -= share
+        return rule['code'], amount, None
@@ -0,0 +1,220 @@
+"""Per-product star-rating aggregates.
+
+    python ratings.py check
+    python ratings.py rebuild
+
+The product_ratings table has one row per rated product: rating_count,
+rating_sum and stars_1..stars_5. Writing a rated review bumps all three
+with a single atomic ADD update, so averages never need the reviews
+themselves. Each worker keeps the whole table in memory next to the
+catalog, re-reading it (one row per product, never any reviews) every
+`refresh_interval` seconds, so the product grid shows ratings for every
+product without touching the reviews table.
+
+A review and its aggregate update are two writes: a worker dying between
+them leaves the aggregate one review short. `check` recomputes every
+aggregate in one streaming pass over the reviews table and lists the
+products that disagree; `rebuild` writes the recomputed rows.
+"""
+import argparse
+import threading
+import time
+
+
+STARS = (1, 2, 3, 4, 5)
+
+
+class InvalidRating(ValueError):
+    pass
+
+
+def _empty():
+    return {'count': 0, 'sum': 0, 'histogram': [0] * len(STARS)}
+
+
+def _from_item(item):
+    return {
+        'count': int(item.get('rating_count', 0)),
+        'sum': int(item.get('rating_sum', 0)),
+        'histogram': [int(item.get(f'stars_{stars}', 0)) for stars in STARS],
+    }
+
+
+def _to_item(product_id, row):
+    item = {'product_id': product_id, 'rating_count': row['count'], 'rating_sum': row['sum']}
+    for stars, count in zip(STARS, row['histogram']):
+        item[f'stars_{stars}'] = count
+    return item
+
+
+def _summary(row):
+    return {'average': round(row['sum'] / row['count'], 1), 'count': row['count']}
+
+
+def parse_rating(value):
+    try:
+        rating = int(value)
+    except (TypeError, ValueError):
+        raise InvalidRating(value)
+    if rating not in STARS:
+        raise InvalidRating(value)
+    return rating
+
+
+def iter_reviews(reviews_table, page_size=1000):
+    """Every review in the table, one page in memory at a time."""
+    kwargs = {'Limit': page_size}
+    while True:
+        response = reviews_table.scan(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def aggregate(reviews):
+    """{product_id: row} from an iterable of reviews; memory grows with products, not reviews."""
+    rows = {}
+    for review in reviews:
+        if 'product_id' not in review or 'rating' not in review:
+            continue
+        row = rows.get(int(review['product_id']))
+        if row is None:
+            row = rows[int(review['product_id'])] = _empty()
+        rating = int(review['rating'])
+        row['count'] += 1
+        row['sum'] += rating
+        row['histogram'][rating - 1] += 1
+    return rows
+
+
+class RatingAggregates:
+
+    def __init__(self, table, refresh_interval=30.0):
+        self.table = table
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._summaries = {}
+        self._loaded_at = None
+        self._listeners = []
+
+    def on_change(self, listener):
+        self._listeners.append(listener)
+        return listener
+
+    def _changed(self):
+        for listener in list(self._listeners):
+            listener(self)
+
+    def _set_rows(self, rows):
+        # Averages are computed once per change, not once per page view
+        self._rows = rows
+        self._summaries = {product_id: _summary(row) for product_id, row in rows.items() if row['count']}
+
+    # -------------------- Writes --------------------
+
+    def record(self, product_id, rating):
+        """Count one more review of `product_id` with `rating` stars."""
+        rating = parse_rating(rating)
+        response = self.table.update_item(
+            Key={'product_id': product_id},
+            UpdateExpression=f'ADD rating_count :one, rating_sum :rating, stars_{rating} :one',
+            ExpressionAttributeValues={':one': 1, ':rating': rating},
+            ReturnValues='ALL_NEW'
+        )
+        row = _from_item(response['Attributes'])
+        with self._lock:
+            # Copied, not mutated, so a grid being rendered keeps a consistent view
+            self._rows = dict(self._rows)
+            self._rows[product_id] = row
+            self._summaries = dict(self._summaries)
+            self._summaries[product_id] = _summary(row)
+        self._changed()
+
+    # -------------------- Reads --------------------
+
+    def _load(self):
+        rows = {}
+        kwargs = {}
+        while True:
+            response = self.table.scan(**kwargs)
+            for item in response['Items']:
+                rows[int(item['product_id'])] = _from_item(item)
+            if 'LastEvaluatedKey' not in response:
+                return rows
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def refresh(self, force=False):
+        """Pick up other workers' updates; at most once per refresh_interval unless forced."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._loaded_at is not None and now - self._loaded_at < self.refresh_interval:
+                return
+            self._loaded_at = now
+        rows = self._load()
+        with self._lock:
+            changed = rows != self._rows
+            if changed:
+                self._set_rows(rows)
+        if changed:
+            self._changed()
+
+    def summaries(self):
+        """{product_id: {'average', 'count'}} for every rated product."""
+        self.refresh()
+        return self._summaries
+
+    def get(self, product_id):
+        self.refresh()
+        row = self._rows.get(product_id)
+        return None if row is None else dict(row, histogram=list(row['histogram']))
+
+    # -------------------- Repair --------------------
+
+    def check(self, reviews_table):
+        """[(product_id, stored, recomputed)] for every product whose aggregate is wrong."""
+        computed = aggregate(iter_reviews(reviews_table))
+        stored = self._load()
+        return [(product_id, stored.get(product_id, _empty()), computed.get(product_id, _empty()))
+                for product_id in sorted(set(stored) | set(computed))
+                if stored.get(product_id, _empty()) != computed.get(product_id, _empty())]
+
+    def rebuild(self, reviews_table):
+        """Rewrite the mismatched aggregates from a streaming pass; returns how many rows changed.
+
+        Reviews written while the pass runs may be counted by the ADD and
+        then overwritten, so run it when writes are quiet (or run check
+        again afterwards).
+        """
+        mismatches = self.check(reviews_table)
+        for product_id, _, computed in mismatches:
+            if computed['count']:
+                self.table.put_item(Item=_to_item(product_id, computed))
+            else:
+                self.table.delete_item(Key={'product_id': product_id})
+        self.refresh(force=True)
+        return len(mismatches)
+
+
+# -------------------- CLI --------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check or rebuild per-product rating aggregates')
+    parser.add_argument('command', choices=('check', 'rebuild'))
+    args = parser.parse_args(argv)
+
+    from app import product_ratings, reviews_table
+    if args.command == 'rebuild':
+        print(f'{product_ratings.rebuild(reviews_table)} product aggregates rewritten')
+        return
+    mismatches = product_ratings.check(reviews_table)
+    for product_id, stored, computed in mismatches:
+        print(f"product {product_id}: stored {stored['count']} reviews / {stored['sum']} stars, "
+              f"reviews say {computed['count']} / {computed['sum']}")
+    print(f'{len(mismatches)} inconsistent aggregates')
+    raise SystemExit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+from flask import make_response, request
+
+
+CachedFragment = namedtuple('CachedFragment', 'body etag last_modified expires')
+Reservation = namedtuple('Reservation', 'generation etag last_modified')
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU cache for rendered pages and page fragments.
+
+    Entries are per process: explicit invalidation only reaches the worker
+    that handled the write, so the TTL bounds staleness everywhere else.
+
+    Every invalidation bumps a generation. A render reserves the key's
+    generation before it reads its inputs, and its body is only stored if
+    nothing invalidated the key in the meantime.
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # invalidate_prefix/clear bump the epoch; invalidate bumps single keys
+        self._epoch = 0
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _generation(self, key):
+        return self._epoch, self._generations.get(key, 0)
+
+    def reserve(self, key):
+        """Start a render of `key`: fixes its generation, Last-Modified and a streaming ETag up front.
+
+        A streamed response sends these validators before its body exists;
+        a body rendered in one piece is tagged by its content instead.
+        """
+        with self._lock:
+            generation = self._generation(key)
+        # HTTP dates have one-second resolution
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        return Reservation(generation, make_etag(key, uuid.uuid4().hex), now)
+
+    def set(self, key, body, ttl=None, reservation=None, etag=None):
+        """Store a rendered body; one rendered under a since-invalidated reservation is returned but not stored."""
+        if reservation is None:
+            reservation = self.reserve(key)
+        entry = CachedFragment(
+            body=body,
+            etag=etag or make_etag(key, body),
+            last_modified=reservation.last_modified,
+            expires=time.monotonic() + (self.ttl if ttl is None else ttl)
+        )
+        with self._lock:
+            if reservation.generation != self._generation(key):
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get_or_render(self, key, render, ttl=None):
+        entry = self.get(key)
+        if entry is None:
+            reservation = self.reserve(key)
+            entry = self.set(key, render(), ttl=ttl, reservation=reservation)
+        return entry
+
+    def tee(self, key, chunks, reservation, ttl=None):
+        """Pass chunks through while streaming and cache the whole body once it completes.
+
+        `reservation` must come from reserve() before the chunks' inputs were read.
+        """
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        # Only reached if the client read everything; aborted streams aren't cached
+        self.set(key, ''.join(parts), ttl=ttl, reservation=reservation, etag=reservation.etag)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix):
+        with self._lock:
+            self._epoch += 1
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        # Weak comparison (RFC 9110): the compression middleware weakens ETags
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified <= since
+
+
+def conditional_response(etag, last_modified, render, private=True):
+    """Answer 304 when the client copy is current, otherwise call render().
+
+    The ETag is computed from cached inputs so a revalidation costs no
+    rendering at all.
+    """
+    if not_modified(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(render())
+    return with_validators(response, etag, last_modified, private)
+
+
+def with_validators(response, etag, last_modified, private=True):
+    """Set the ETag, Last-Modified and revalidation headers a cacheable page carries."""
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
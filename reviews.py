@@ -0,0 +1,193 @@
+import base64
+import binascii
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from boto3.dynamodb.conditions import Key
+
+
+# GSI on the reviews table: partition "feed", sort "created_at" (ISO-8601 UTC)
+REVIEWS_INDEX = 'feed-created_at-index'
+ALL_REVIEWS = 'all'
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# Incremental refreshes re-read this far behind the watermark so reviews
+# stamped by a worker with a slightly slow clock are still picked up
+WATERMARK_OVERLAP = timedelta(seconds=2)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(key):
+    raw = json.dumps(key, sort_keys=True, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(key, dict) or set(key) != {'id', 'feed', 'created_at'}:
+        raise InvalidCursor(cursor)
+    if not isinstance(key['id'], str) or key['feed'] != ALL_REVIEWS or not isinstance(key['created_at'], str):
+        raise InvalidCursor(cursor)
+    try:
+        datetime.strptime(key['created_at'], TIMESTAMP_FORMAT)
+    except ValueError:
+        raise InvalidCursor(cursor)
+    return key
+
+
+def _cursor_key(item):
+    return {'id': item['id'], 'feed': item['feed'], 'created_at': item['created_at']}
+
+
+class ReviewStore:
+    """Newest-first review pages read through a GSI query instead of a table scan.
+
+    The newest `cache_size` reviews are kept in memory. The cache refreshes at
+    most every `refresh_interval` seconds and only pulls reviews newer than
+    its watermark (the newest created_at read back from the table), so a page
+    view costs a bounded number of item reads no matter how large the table
+    grows.
+    """
+
+    def __init__(self, table, index_name=REVIEWS_INDEX, page_size=20, cache_size=200, refresh_interval=5.0):
+        self.table = table
+        self.index_name = index_name
+        self.page_size = page_size
+        self.cache_size = cache_size
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._cache = []
+        self._positions = {}
+        self._complete = False
+        self._watermark = None
+        self._refreshed_at = None
+
+    # -------------------- Writes --------------------
+
+    def add(self, user, review, feed=ALL_REVIEWS, **attributes):
+        item = dict(attributes)
+        item.update({
+            'id': str(uuid.uuid4()),
+            'feed': feed,
+            'created_at': datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT),
+            'user': user,
+            'review': review
+        })
+        self.table.put_item(Item=item)
+        if feed == ALL_REVIEWS:
+            with self._lock:
+                self._merge([item])
+        return item
+
+    # -------------------- Reads --------------------
+
+    def page(self, cursor=None, limit=None):
+        """Return (items, next_cursor) for the newest-first feed."""
+        limit = limit or self.page_size
+        start_key = decode_cursor(cursor) if cursor else None
+
+        self._refresh()
+        with self._lock:
+            if start_key is None:
+                offset = 0
+            else:
+                offset = self._positions.get(start_key['id'], -1) + 1
+            if offset > 0 or start_key is None:
+                cached = self._cache[offset:offset + limit]
+                if len(cached) == limit or self._complete:
+                    next_cursor = None
+                    if len(cached) == limit and (offset + limit < len(self._cache) or not self._complete):
+                        next_cursor = encode_cursor(_cursor_key(cached[-1]))
+                    return cached, next_cursor
+
+        return self._query_page(start_key, limit)
+
+    def _query_page(self, start_key, limit):
+        kwargs = {
+            'IndexName': self.index_name,
+            'KeyConditionExpression': Key('feed').eq(ALL_REVIEWS),
+            'ScanIndexForward': False,
+            'Limit': limit
+        }
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+        response = self.table.query(**kwargs)
+        last_key = response.get('LastEvaluatedKey')
+        return response.get('Items', []), encode_cursor(last_key) if last_key else None
+
+    def _refresh(self):
+        # Queries run outside the lock so readers keep serving the cached
+        # pages meanwhile; the first caller past the interval claims the
+        # refresh and only the merge is done under the lock
+        with self._lock:
+            now = time.monotonic()
+            if self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+                return
+            self._refreshed_at = now
+            watermark = self._watermark
+
+        if watermark is None:
+            # Cold cache: newest page of up to cache_size reviews
+            response = self.table.query(
+                IndexName=self.index_name,
+                KeyConditionExpression=Key('feed').eq(ALL_REVIEWS),
+                ScanIndexForward=False,
+                Limit=self.cache_size
+            )
+            items = response.get('Items', [])
+            with self._lock:
+                self._merge(items)
+                self._complete = 'LastEvaluatedKey' not in response
+                if items:
+                    self._watermark = max(self._watermark or '', items[0]['created_at'])
+            return
+
+        # Warm cache: only reviews newer than the watermark; the overlap
+        # window re-reads a few already cached ones, which ids dedupe
+        since = datetime.strptime(watermark, TIMESTAMP_FORMAT) - WATERMARK_OVERLAP
+        start_key = None
+        fresh = []
+        while True:
+            kwargs = {
+                'IndexName': self.index_name,
+                'KeyConditionExpression': Key('feed').eq(ALL_REVIEWS) & Key('created_at').gte(since.strftime(TIMESTAMP_FORMAT)),
+                'ScanIndexForward': True,
+                'Limit': self.cache_size
+            }
+            if start_key:
+                kwargs['ExclusiveStartKey'] = start_key
+            response = self.table.query(**kwargs)
+            fresh.extend(response.get('Items', []))
+            start_key = response.get('LastEvaluatedKey')
+            if not start_key:
+                break
+        with self._lock:
+            self._merge(fresh)
+            if fresh:
+                self._watermark = max(self._watermark, fresh[-1]['created_at'])
+
+    def _merge(self, items):
+        new = [item for item in items if item['id'] not in self._positions]
+        if not new:
+            return
+        merged = sorted(new + self._cache, key=lambda item: (item['created_at'], item['id']), reverse=True)
+        if len(merged) > self.cache_size:
+            merged = merged[:self.cache_size]
+            self._complete = False
+        self._cache = merged
+        self._positions = {item['id']: i for i, item in enumerate(merged)}
+
+    def invalidate(self):
+        with self._lock:
+            self._refreshed_at = None
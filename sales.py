@@ -0,0 +1,215 @@
+"""Daily sales rollups maintained as orders are written.
+
+    python sales.py report [--days 30]
+    python sales.py rebuild --from 2024-01-01 --to 2024-01-31
+
+The rollups table holds one row per (day, product_id) with revenue,
+units and orders, plus a product_id 0 row with the day's totals. Each
+batch of orders the OrderWriter flushes is folded into per-row deltas
+and applied with one ADD update per row touched, so a dashboard reads a
+handful of aggregate rows per day instead of scanning every order.
+
+ADD is not idempotent: deltas whose update fails are kept and retried
+with the next batch (and once more when the order writer stops). The
+order writer acknowledges a batch in its journal before the rollups see
+it, so a crash in between leaves those orders out of the rollups rather
+than counting them twice on replay.
+`rebuild` recomputes chosen days from the orders table. Stop every
+worker first: their ADDs landing between the rebuild's scan and its
+puts would be lost or counted twice, and the lock here only covers one
+process.
+"""
+import argparse
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Attr, Key
+
+
+logger = logging.getLogger(__name__)
+
+# product_id of the per-day totals row
+DAY_TOTAL = 0
+FIELDS = ('revenue', 'units', 'orders')
+
+
+def order_day(order):
+    # created_at is ISO-8601 UTC; the day is its date part
+    return str(order['created_at'])[:10]
+
+
+def order_deltas(orders):
+    """Fold orders into {(day, product_id): {'revenue', 'units', 'orders'}}."""
+    deltas = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+    for order in orders:
+        day = order_day(order)
+        total = deltas[(day, DAY_TOTAL)]
+        total['orders'] += 1
+        for item in order.get('items', ()):
+            quantity = int(item['quantity'])
+            # Net of the line's offer and coupon share; shipping isn't revenue here
+            revenue = int(item['price']) * quantity - int(item.get('discount', 0))
+            row = deltas[(day, int(item['id']))]
+            row['revenue'] += revenue
+            row['units'] += quantity
+            row['orders'] += 1
+            total['revenue'] += revenue
+            total['units'] += quantity
+    return deltas
+
+
+class SalesRollups:
+
+    def __init__(self, table):
+        self.table = table
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.updates = 0
+
+    # -------------------- Writes --------------------
+
+    def apply(self, orders):
+        """Add a batch of written orders to the rollups (an OrderWriter flush listener)."""
+        with self._lock:
+            for key, delta in order_deltas(orders).items():
+                pending = self._pending.setdefault(key, dict.fromkeys(FIELDS, 0))
+                for field in FIELDS:
+                    pending[field] += delta[field]
+            self._flush()
+
+    def _flush(self):
+        for key in list(self._pending):
+            day, product_id = key
+            delta = self._pending[key]
+            try:
+                self.table.update_item(
+                    Key={'day': day, 'product_id': product_id},
+                    UpdateExpression='ADD revenue :r, units :u, orders :o',
+                    ExpressionAttributeValues={':r': delta['revenue'], ':u': delta['units'], ':o': delta['orders']}
+                )
+            except Exception as e:
+                # Kept for the next batch; raising would make the writer re-put the orders
+                logger.error("Sales rollup update for %s/%s failed, will retry: %s", day, product_id, e)
+                return
+            del self._pending[key]
+            self.updates += 1
+
+    def flush(self, attempts=3, backoff=0.5):
+        """Retry deltas left over from failed updates (at shutdown); returns rows still pending."""
+        for attempt in range(attempts):
+            with self._lock:
+                self._flush()
+                if not self._pending:
+                    return 0
+            time.sleep(backoff * 2 ** attempt)
+        with self._lock:
+            for (day, product_id), delta in self._pending.items():
+                logger.error("Sales rollup delta for %s/%s lost, rebuild that day: %s", day, product_id, delta)
+            return len(self._pending)
+
+    def pending_rows(self):
+        with self._lock:
+            return len(self._pending)
+
+    # -------------------- Reads --------------------
+
+    def day(self, day):
+        """{product_id: row} for one day; product 0 is the day's total."""
+        rows = {}
+        kwargs = {'KeyConditionExpression': Key('day').eq(day)}
+        while True:
+            response = self.table.query(**kwargs)
+            for item in response['Items']:
+                rows[int(item['product_id'])] = {field: int(item.get(field, 0)) for field in FIELDS}
+            if 'LastEvaluatedKey' not in response:
+                return rows
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def report(self, start, end):
+        """Per-day totals and per-product sums for start..end (inclusive `date`s)."""
+        days = []
+        products = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+        current = start
+        while current <= end:
+            rows = self.day(current.isoformat())
+            total = rows.pop(DAY_TOTAL, dict.fromkeys(FIELDS, 0))
+            days.append(dict(total, day=current.isoformat()))
+            for product_id, row in rows.items():
+                for field in FIELDS:
+                    products[product_id][field] += row[field]
+            current += timedelta(days=1)
+        return {
+            'days': days,
+            'products': sorted(({'product_id': product_id, **row} for product_id, row in products.items()),
+                               key=lambda row: row['revenue'], reverse=True),
+            'revenue': sum(day['revenue'] for day in days),
+            'units': sum(day['units'] for day in days),
+            'orders': sum(day['orders'] for day in days),
+        }
+
+    # -------------------- Repair --------------------
+
+    def rebuild(self, orders_table, start, end):
+        """Recompute start..end from a full scan of the orders table; returns rows written.
+
+        Only run this with the app's workers stopped: an order flushed by
+        another process between the scan and the puts is lost or counted twice.
+        """
+        first, last = start.isoformat(), (end + timedelta(days=1)).isoformat()
+        orders = []
+        kwargs = {'FilterExpression': Attr('created_at').between(first, last)}
+        while True:
+            response = orders_table.scan(**kwargs)
+            orders.extend(order for order in response['Items'] if first <= order_day(order) < last)
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        with self._lock:
+            current = start
+            while current <= end:
+                for product_id in self.day(current.isoformat()):
+                    self.table.delete_item(Key={'day': current.isoformat(), 'product_id': product_id})
+                current += timedelta(days=1)
+            written = 0
+            with self.table.batch_writer() as writer:
+                for (day, product_id), row in order_deltas(orders).items():
+                    writer.put_item(Item={'day': day, 'product_id': product_id,
+                                          **{field: Decimal(row[field]) for field in FIELDS}})
+                    written += 1
+        return written
+
+
+# -------------------- CLI --------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Daily sales rollups')
+    commands = parser.add_subparsers(dest='command', required=True)
+    report_cmd = commands.add_parser('report', help='print totals for the last N days')
+    report_cmd.add_argument('--days', type=int, default=30)
+    rebuild_cmd = commands.add_parser(
+        'rebuild', help='recompute days from the orders table (scans it); stop the app workers first')
+    rebuild_cmd.add_argument('--from', dest='start', type=date.fromisoformat, required=True)
+    rebuild_cmd.add_argument('--to', dest='end', type=date.fromisoformat, required=True)
+    args = parser.parse_args(argv)
+
+    from app import catalog, orders_table, sales_rollups
+    if args.command == 'rebuild':
+        print(f'{sales_rollups.rebuild(orders_table, args.start, args.end)} rollup rows written')
+        return
+    end = date.today()
+    report = sales_rollups.report(end - timedelta(days=args.days - 1), end)
+    for day in report['days']:
+        print(f"{day['day']}  ₹{day['revenue']:>10,}  {day['units']:>6} units  {day['orders']:>5} orders")
+    for row in report['products'][:10]:
+        product = catalog.get(row['product_id'])
+        name = product['name'] if product else f"#{row['product_id']}"
+        print(f"{name:<30} ₹{row['revenue']:>10,}  {row['units']:>6} units")
+
+
+if __name__ == '__main__':
+    main()
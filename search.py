@@ -0,0 +1,305 @@
+import base64
+import binascii
+import bisect
+import json
+import math
+import re
+import threading
+from collections import Counter, namedtuple
+
+
+TOKEN = re.compile(r'\w+')
+SORTS = ('relevance', 'price_asc', 'price_desc', 'name')
+# Name matches count this many times a description match
+NAME_WEIGHT = 3
+# Above this share of the catalog, walking a presorted array and
+# skipping non-matches beats sorting the matches
+SCAN_RATIO = 0.05
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower()) if text else []
+
+
+def _encode_cursor(sort, key):
+    raw = json.dumps([sort, list(key)], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor, sort):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, key = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidQuery('Invalid cursor')
+    if cursor_sort != sort or not isinstance(key, list) or len(key) != 2:
+        raise InvalidQuery('Cursor does not match this query')
+    first, product_id = key
+    if sort == 'name':
+        valid_first = isinstance(first, str)
+    elif sort == 'relevance':
+        valid_first = isinstance(first, int) and not isinstance(first, bool)
+    else:
+        valid_first = isinstance(first, (int, float)) and not isinstance(first, bool) and math.isfinite(first)
+    if not valid_first or not isinstance(product_id, int) or isinstance(product_id, bool):
+        raise InvalidQuery('Invalid cursor')
+    return tuple(key)
+
+
+# One consistent version of the index; replaced whole, never mutated
+_Snapshot = namedtuple('_Snapshot', 'version postings vocabulary weights categories docs by_price by_name')
+
+# Up to this many keys are removed, a sorted array drops them with
+# bisect and del; past it, one filtering pass over the array is cheaper
+PATCH_LIMIT = 64
+
+
+def _weigh(product):
+    weights = Counter()
+    for token in tokenize(product.get('name')):
+        weights[token] += NAME_WEIGHT
+    for token in tokenize(product.get('description')):
+        weights[token] += 1
+    return weights
+
+
+def _doc(product):
+    product_id = product['id']
+    return product.get('category'), (product['price'], product_id), (product['name'].lower(), product_id)
+
+
+def _patched(keys, removed, added):
+    """A new sorted list: `keys` without `removed`, plus `added`.
+
+    Built from bisects and slice copies rather than one big sort, so no
+    single step holds the GIL long enough to stall concurrent queries.
+    """
+    if len(removed) <= PATCH_LIMIT:
+        keys = list(keys)
+        for key in removed:
+            del keys[bisect.bisect_left(keys, key)]
+    else:
+        removed = set(removed)
+        keys = [key for key in keys if key not in removed]
+    merged, start = [], 0
+    for key in sorted(added):
+        end = bisect.bisect_left(keys, key, start)
+        merged += keys[start:end]
+        merged.append(key)
+        start = end
+    merged += keys[start:]
+    return merged
+
+
+def _own(sets, key, copied):
+    # Sets are shared with the previous snapshot; copy one before its first write
+    if key not in copied:
+        copied.add(key)
+        sets[key] = set(sets.get(key, ()))
+    return sets[key]
+
+
+class SearchIndex:
+    """Inverted index over product name/description plus presorted price and name arrays.
+
+    Built once from the catalog, then kept current from the catalog's
+    change log: an upsert or remove re-indexes just those products, and
+    only a full catalog replace triggers a rebuild. Either way the new
+    index is built beside the current one and swapped in with a single
+    assignment, so queries never wait on maintenance.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        # Serializes maintenance only; queries read self._state without it
+        self._lock = threading.Lock()
+        self._state = None
+        self._rebuild()
+        catalog.on_change(self._catalog_changed)
+
+    @property
+    def version(self):
+        return self._state.version
+
+    # -------------------- Maintenance --------------------
+
+    def _rebuild(self):
+        with self._lock:
+            self._state = self._build()
+
+    def _build(self):
+        version = self.catalog.version
+        products = list(self.catalog.all())
+        postings, weights, categories, docs = {}, {}, {}, {}
+        for product in products:
+            product_id = product['id']
+            weights[product_id] = _weigh(product)
+            for token in weights[product_id]:
+                postings.setdefault(token, set()).add(product_id)
+            docs[product_id] = _doc(product)
+            categories.setdefault(docs[product_id][0], set()).add(product_id)
+        return _Snapshot(version, postings, sorted(postings), weights, categories, docs,
+                         sorted(doc[1] for doc in docs.values()), sorted(doc[2] for doc in docs.values()))
+
+    def _catalog_changed(self, catalog):
+        with self._lock:
+            state = self._state
+            changed = catalog.changes_since(state.version)
+            if changed is None:
+                self._state = self._build()
+            else:
+                self._state = self._patch(state, catalog.version, {product_id: catalog.get(product_id)
+                                                                    for product_id in changed})
+
+    def _patch(self, state, version, changed):
+        """A copy of `state` with the products in `changed` (None: removed) re-indexed.
+
+        Dicts are copied shallowly and a posting or category set only when
+        one of its members changes, so the cost follows the batch size plus
+        one pass over each presorted array.
+        """
+        postings, weights = dict(state.postings), dict(state.weights)
+        categories, docs = dict(state.categories), dict(state.docs)
+        copied_tokens, copied_categories = set(), set()
+        removed_prices, removed_names, added_prices, added_names = [], [], [], []
+        for product_id, product in changed.items():
+            doc = docs.pop(product_id, None)
+            if doc is not None:
+                category, price_key, name_key = doc
+                for token in weights.pop(product_id):
+                    _own(postings, token, copied_tokens).discard(product_id)
+                _own(categories, category, copied_categories).discard(product_id)
+                removed_prices.append(price_key)
+                removed_names.append(name_key)
+            if product is not None:
+                weights[product_id] = _weigh(product)
+                for token in weights[product_id]:
+                    _own(postings, token, copied_tokens).add(product_id)
+                docs[product_id] = doc = _doc(product)
+                _own(categories, doc[0], copied_categories).add(product_id)
+                added_prices.append(doc[1])
+                added_names.append(doc[2])
+
+        for token in copied_tokens:
+            if not postings[token]:
+                del postings[token]
+        dropped = [token for token in copied_tokens if token in state.postings and token not in postings]
+        fresh = [token for token in copied_tokens if token in postings and token not in state.postings]
+        return _Snapshot(version, postings, _patched(state.vocabulary, dropped, fresh), weights, categories, docs,
+                         _patched(state.by_price, removed_prices, added_prices),
+                         _patched(state.by_name, removed_names, added_names))
+
+    # -------------------- Queries --------------------
+
+    def _prefix_postings(self, state, prefix):
+        # The last query term matches as a prefix ("mang" finds "mango")
+        start = bisect.bisect_left(state.vocabulary, prefix)
+        matched = set()
+        for token in state.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matched |= state.postings[token]
+        return matched
+
+    def _candidates(self, state, terms, category):
+        sets = []
+        for i, term in enumerate(terms):
+            last = i == len(terms) - 1
+            postings = self._prefix_postings(state, term) if last else state.postings.get(term, set())
+            sets.append(postings)
+        if category is not None:
+            sets.append(state.categories.get(category, set()))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        candidates = set(sets[0])
+        for other in sets[1:]:
+            candidates &= other
+            if not candidates:
+                break
+        return candidates
+
+    def search(self, q=None, category=None, min_price=None, max_price=None, sort=None, limit=20, cursor=None):
+        """Return (products, next_cursor)."""
+        terms = tokenize(q)
+        sort = sort or ('relevance' if terms else 'price_asc')
+        if sort not in SORTS:
+            raise InvalidQuery(f'sort must be one of {", ".join(SORTS)}')
+        if sort == 'relevance' and not terms:
+            raise InvalidQuery('relevance sort needs a search query')
+        after = _decode_cursor(cursor, sort) if cursor else None
+        low = float('-inf') if min_price is None else min_price
+        high = float('inf') if max_price is None else max_price
+
+        state = self._state
+        candidates = self._candidates(state, terms, category)
+        if sort == 'relevance':
+            keys = self._ranked(state, candidates, terms, low, high, after, limit + 1)
+        else:
+            keys = self._ordered(state, candidates, sort, low, high, after, limit + 1)
+
+        page = keys[:limit]
+        next_cursor = _encode_cursor(sort, page[-1]) if len(keys) > limit else None
+        found = self.catalog.get_many(key[1] for key in page)
+        return [found[key[1]] for key in page if key[1] in found], next_cursor
+
+    def _ranked(self, state, candidates, terms, low, high, after, count):
+        keys = []
+        for product_id in candidates:
+            price = state.docs[product_id][1][0]
+            if not low <= price <= high:
+                continue
+            weights = state.weights[product_id]
+            score = sum(weights.get(term, 0) for term in terms[:-1])
+            last = terms[-1]
+            score += weights.get(last) or max((w for t, w in weights.items() if t.startswith(last)), default=0)
+            # Sorted ascending on (-score, id) so the best match comes first
+            key = (-score, product_id)
+            if after is None or key > after:
+                keys.append(key)
+        keys.sort()
+        return keys[:count]
+
+    def _ordered(self, state, candidates, sort, low, high, after, count):
+        descending = sort == 'price_desc'
+        ordered = state.by_name if sort == 'name' else state.by_price
+        by_price = sort != 'name'
+
+        if candidates is not None and len(candidates) < len(ordered) * SCAN_RATIO:
+            # Few matches: sort just those
+            slot = 1 if by_price else 2
+            keys = [state.docs[product_id][slot] for product_id in candidates
+                    if low <= state.docs[product_id][1][0] <= high]
+            keys.sort(reverse=descending)
+            if after is not None:
+                keys = [key for key in keys if (key < after if descending else key > after)]
+            return keys[:count]
+
+        # Many matches: walk the presorted array from the right place
+        if by_price:
+            start = bisect.bisect_left(ordered, (low,))
+            end = bisect.bisect_right(ordered, (high, float('inf')))
+        else:
+            start, end = 0, len(ordered)
+        if after is not None:
+            position = bisect.bisect_right(ordered, after) if not descending else bisect.bisect_left(ordered, after)
+            if descending:
+                end = min(end, position)
+            else:
+                start = max(start, position)
+        indexes = range(end - 1, start - 1, -1) if descending else range(start, end)
+        keys = []
+        for i in indexes:
+            key = ordered[i]
+            if candidates is not None and key[1] not in candidates:
+                continue
+            if not by_price and not low <= state.docs[key[1]][1][0] <= high:
+                continue
+            keys.append(key)
+            if len(keys) >= count:
+                break
+        return keys
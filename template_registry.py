@@ -0,0 +1,94 @@
+import os
+
+from flask import before_render_template, current_app, render_template, stream_with_context, template_rendered
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+
+PAGES = (
+    'products',
+    'cart',
+    'checkout',
+    'contact',
+    'reviews',
+    'login',
+    'register',
+    'success',
+    'orders',
+    'sales',
+    '_product_grid',
+    '_review_list',
+)
+
+
+def init_templates(app, cache_dir=None):
+    """Compile every page template once and keep the compiled objects on the app.
+
+    Must run before the first request: the bytecode cache can only be set
+    while app.jinja_env has not been created yet.
+    """
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(cache_dir))
+
+    env = app.jinja_env
+    env.auto_reload = False
+
+    registry = {}
+    for name in PAGES:
+        registry[name] = env.get_template(f'pages/{name}.html')
+    app.extensions['page_templates'] = registry
+    return registry
+
+
+def render_page(name, **context):
+    if current_app.debug:
+        # Go through the loader so template edits show up without a restart
+        return render_template(f'pages/{name}.html', **context)
+    # render_template() accepts a Template object and skips the loader lookup
+    return render_template(current_app.extensions['page_templates'][name], **context)
+
+
+def _template(name):
+    if current_app.debug:
+        return current_app.jinja_env.get_template(f'pages/{name}.html')
+    return current_app.extensions['page_templates'][name]
+
+
+def _buffered(chunks, first=1024, size=16 * 1024):
+    # Jinja yields one tiny string per template node; send the page head
+    # early, then batch the rest into socket-sized writes
+    buffer = []
+    buffered = 0
+    limit = first
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= limit:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+            limit = size
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_fragment(name, **context):
+    """Yield a fragment's output as Markup chunks, for a page to loop over."""
+    template = _template(name)
+    for chunk in template.generate(**context):
+        yield Markup(chunk)
+
+
+def stream_page(name, **context):
+    """Stream a page as it renders, so the first bytes leave before long lists are done."""
+    app = current_app._get_current_object()
+    template = _template(name)
+    app.update_template_context(context)
+    before_render_template.send(app, _async_wrapper=app.ensure_sync, template=template, context=context)
+
+    def generate():
+        yield from _buffered(template.generate(context))
+        template_rendered.send(app, _async_wrapper=app.ensure_sync, template=template, context=context)
+
+    return app.response_class(stream_with_context(generate()), mimetype='text/html')
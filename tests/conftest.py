@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('AWS_ENDPOINT_URL', 'inprocess')
+    monkeypatch.setenv('USER_STORE_URL', 'sqlite:///users.db')
+    monkeypatch.setenv('LOG_CONSOLE', '0')
+    import app
+    return app.app.test_client()
@@ -0,0 +1,82 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from inventory import EXPIRY_INDEX, Inventory, OutOfStock, ReservationConflict
+from local_aws import LocalTable
+
+
+@pytest.fixture
+def shopper(client):
+    import app
+    with client.session_transaction() as sess:
+        sess['username'] = 'asha'
+    app.inventory.set_stock(1, 50)
+    client.get('/add_to_cart/1')
+    return client
+
+
+def conflict(monkeypatch):
+    import app
+
+    def hold(cart_id, product_id, quantity):
+        raise ReservationConflict(f'Reservation for cart {cart_id} is being modified concurrently')
+    monkeypatch.setattr(app.inventory, 'hold', hold)
+
+
+@pytest.mark.parametrize('path', ['/add_to_cart/1', '/update_cart/1/1', '/remove_from_cart/1'])
+def test_cart_routes_turn_a_reservation_conflict_into_a_retry(shopper, monkeypatch, path):
+    conflict(monkeypatch)
+    response = shopper.get(path)
+    assert response.status_code == 302
+    with shopper.session_transaction() as sess:
+        assert any('try again' in message for _, message in sess['_flashes'])
+
+
+def test_batch_update_conflict_is_409_for_json(shopper, monkeypatch):
+    conflict(monkeypatch)
+    response = shopper.post('/cart/update', json={'items': {'1': 2}})
+    assert response.status_code == 409
+    assert 'try again' in response.get_json()['error']
+    assert shopper.post('/cart/update', data={'qty-1': '2'}).status_code == 302
+
+
+@pytest.mark.parametrize('batch_size', [1, 20])
+def test_concurrent_checkouts_never_oversell(batch_size):
+    # benchmarks/bench_inventory.py scaled down: workers with separate
+    # pools share one inventory item; stock runs out partway through
+    stock, checkouts, workers = 300, 400, 4
+    stock_table = LocalTable('inventory', 'product_id')
+    reservations = LocalTable('stock_reservations', 'cart_id', 'product_id',
+                              indexes={EXPIRY_INDEX: ('expiry_bucket', 'expires_at')})
+    pools = [Inventory(stock_table, reservations, batch_size=batch_size, pool_idle=0.2, reservation_ttl=1,
+                       sweep_interval=0.2) for _ in range(workers)]
+    pools[0].set_stock(7, stock)
+    rng = random.Random(1)
+    plans = [(pools[i % workers], rng.randint(1, 3), rng.random() < 0.1) for i in range(checkouts)]
+    sold, refused = [], []
+
+    def shopper(i):
+        inventory, quantity, abandon = plans[i]
+        try:
+            inventory.hold(f'cart-{i}', 7, quantity)
+            if not abandon:
+                sold.append(inventory.checkout(f'cart-{i}', {7: quantity}).get(7, 0))
+        except OutOfStock:
+            refused.append(quantity)
+
+    with ThreadPoolExecutor(32) as executor:
+        list(executor.map(shopper, range(checkouts)))
+    # Abandoned carts expire and are swept back; then every pool drains
+    time.sleep(1.2)
+    for inventory in pools:
+        inventory.sweep()
+        inventory.stop()
+
+    left = int(stock_table.get_item(Key={'product_id': 7})['Item']['available'])
+    assert refused, 'stock should run out'
+    assert sum(sold) <= stock
+    assert sum(sold) + left == stock
+    assert reservations.item_count() == 0
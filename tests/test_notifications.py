@@ -0,0 +1,72 @@
+import smtplib
+import threading
+import time
+
+import pytest
+
+from notifications import NotificationDispatcher
+
+
+class StuckConnection:
+    """An SMTP connection whose send blocks until released."""
+
+    def __init__(self, release):
+        self.release = release
+
+    def send(self, msg):
+        self.release.wait(5)
+
+    def close(self):
+        pass
+
+
+def test_stop_with_a_full_queue_returns_within_its_timeout(tmp_path):
+    release = threading.Event()
+    dispatcher = NotificationDispatcher(lambda: StuckConnection(release), sns_client=None, sender='shop@example.com',
+                                        workers=1, queue_size=2, dead_letter_file=str(tmp_path / 'dead.jsonl'))
+    dispatcher.email('first@example.com', 'Order', 'Thanks')
+    time.sleep(0.1)
+    # The worker is stuck on the first job; these fill the queue
+    assert dispatcher.email('second@example.com', 'Order', 'Thanks')
+    assert dispatcher.email('third@example.com', 'Order', 'Thanks')
+
+    started = time.monotonic()
+    dispatcher.stop(timeout=0.3)
+    assert time.monotonic() - started < 1
+    # The lock isn't held: later submits are dead-lettered, not blocked
+    assert dispatcher.email('late@example.com', 'Order', 'Thanks') is False
+    release.set()
+
+
+class RefusingConnection:
+
+    def __init__(self, error):
+        self.error = error
+        self.attempts = 0
+
+    def send(self, msg):
+        self.attempts += 1
+        raise self.error
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize('error, attempts', [
+    (smtplib.SMTPDataError(550, b'Mailbox unavailable'), 1),
+    (smtplib.SMTPSenderRefused(553, b'Sender rejected', 'shop@example.com'), 1),
+    (smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'No such user')}), 1),
+    (smtplib.SMTPDataError(451, b'Try again later'), 3),
+    (smtplib.SMTPServerDisconnected('Connection unexpectedly closed'), 3),
+])
+def test_only_transient_smtp_errors_are_retried(tmp_path, error, attempts):
+    connection = RefusingConnection(error)
+    dead_letters = tmp_path / 'dead.jsonl'
+    dispatcher = NotificationDispatcher(lambda: connection, sns_client=None, sender='shop@example.com', workers=1,
+                                        max_attempts=3, backoff=0.001, dead_letter_file=str(dead_letters))
+    dispatcher.email('a@example.com', 'Order', 'Thanks')
+    dispatcher.stop(timeout=5)
+
+    assert connection.attempts == attempts
+    assert dispatcher.failed == 1
+    assert len(dead_letters.read_text().splitlines()) == 1
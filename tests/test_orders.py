@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+
+from local_aws import LocalTable
+from orders import InvalidCursor, OrderHistory, OrderJournal, OrderWriter
+
+
+@pytest.fixture
+def shopper(client):
+    with client.session_transaction() as sess:
+        sess['username'] = 'asha'
+    return client
+
+
+def test_api_orders_lists_an_empty_history(shopper):
+    response = shopper.get('/api/orders')
+    assert response.status_code == 200
+    assert response.get_json() == {'items': [], 'next_cursor': None}
+
+
+def test_api_orders_rejects_a_bad_limit(shopper):
+    assert shopper.get('/api/orders?limit=0').status_code == 400
+    assert shopper.get('/api/orders?limit=ten').status_code == 400
+
+
+def order_cursor(key):
+    return OrderHistory.encode_cursor(key)
+
+
+GOOD_KEY = {'order_id': 'o-1', 'username': 'asha', 'created_at': '2024-05-01T10:00:00.000001'}
+
+
+def test_decode_cursor_round_trips_a_well_typed_key():
+    assert OrderHistory.decode_cursor(order_cursor(GOOD_KEY), 'asha') == GOOD_KEY
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64 !',
+    order_cursor(['o-1', 'asha']),
+    order_cursor({'order_id': 'o-1', 'username': 'asha'}),
+    order_cursor(dict(GOOD_KEY, order_id=7)),
+    order_cursor(dict(GOOD_KEY, order_id={'S': 'o-1'})),
+    order_cursor(dict(GOOD_KEY, created_at=20240501)),
+    order_cursor(dict(GOOD_KEY, created_at='yesterday')),
+    order_cursor(dict(GOOD_KEY, username='ravi')),
+])
+def test_decode_cursor_rejects_malformed_and_foreign_cursors(cursor):
+    with pytest.raises(InvalidCursor):
+        OrderHistory.decode_cursor(cursor, 'asha')
+
+
+def test_api_orders_pages_with_its_cursor_and_rejects_others(client):
+    import app
+    for i in range(3):
+        app.orders_table.put_item(Item={
+            'order_id': f'pager-{i}', 'username': 'pager', 'created_at': f'2024-05-0{i + 1}T10:00:00',
+            'total': 100 + i, 'items': [{'id': 1, 'name': 'Mango pickle', 'quantity': 1, 'price': 100 + i}],
+        })
+    with client.session_transaction() as sess:
+        sess['username'] = 'pager'
+
+    first = client.get('/api/orders?limit=2').get_json()
+    assert [order['order_id'] for order in first['items']] == ['pager-2', 'pager-1']
+    second = client.get(f"/api/orders?limit=2&cursor={first['next_cursor']}").get_json()
+    assert [order['order_id'] for order in second['items']] == ['pager-0']
+
+    foreign = order_cursor(dict(GOOD_KEY, username='asha'))
+    assert client.get(f'/api/orders?cursor={foreign}').status_code == 400
+    mistyped = order_cursor({'order_id': 1, 'username': 'pager', 'created_at': '2024-05-02T10:00:00'})
+    assert client.get(f'/api/orders?cursor={mistyped}').status_code == 400
+    assert client.get('/orders?cursor=garbage').status_code == 400
+
+
+def test_stop_leaves_the_journal_to_a_writer_still_flushing(tmp_path):
+    table = LocalTable('orders', 'order_id', latency=0.3)
+    writer = OrderWriter(table, str(tmp_path), flush_interval=0.01)
+    writer.submit({'order_id': 'slow-1', 'username': 'asha', 'total': 100})
+    time.sleep(0.1)
+
+    writer.stop(timeout=0.05)
+    assert os.path.exists(writer._journal.path)
+    writer._thread.join(5)
+    assert writer.stats()['flush_errors'] == 0
+    assert table.get_item(Key={'order_id': 'slow-1'})['Item']['total'] == 100
+    assert OrderJournal.replay(writer._journal.path) == []
@@ -0,0 +1,66 @@
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from catalog import Catalog
+from search import InvalidQuery, SearchIndex
+
+
+PRODUCTS = [
+    {'id': 1, 'category': 'veg', 'name': 'Mango pickle', 'price': 250, 'description': 'Raw mango'},
+    {'id': 2, 'category': 'nonveg', 'name': 'Chicken pickle', 'price': 450, 'description': 'Boneless'},
+    {'id': 3, 'category': 'veg', 'name': 'Lemon pickle', 'price': 200, 'description': 'Tangy lemon'},
+]
+
+
+def cursor(sort, key):
+    raw = json.dumps([sort, key]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+@pytest.fixture
+def index():
+    return SearchIndex(Catalog(PRODUCTS))
+
+
+@pytest.mark.parametrize('sort, q, key', [
+    ('price_asc', None, ['a', 'b']),
+    ('price_desc', None, [250, 'x']),
+    ('price_asc', None, [float('nan'), 1]),
+    ('relevance', 'pickle', [{}, 1]),
+    ('relevance', 'pickle', [-3, True]),
+    ('name', None, [1, 2]),
+    ('name', None, ['mango pickle', [1]]),
+])
+def test_cursor_with_wrong_key_types_is_invalid_query(index, sort, q, key):
+    with pytest.raises(InvalidQuery):
+        index.search(q=q, sort=sort, cursor=cursor(sort, key))
+
+
+def test_well_typed_cursors_still_page(index):
+    page, next_cursor = index.search(sort='price_asc', limit=1)
+    assert [p['id'] for p in page] == [3]
+    page, _ = index.search(sort='price_asc', limit=1, cursor=next_cursor)
+    assert [p['id'] for p in page] == [1]
+    page, _ = index.search(sort='price_asc', limit=1, cursor=cursor('price_asc', [200.0, 3]))
+    assert [p['id'] for p in page] == [1]
+    page, _ = index.search(sort='name', limit=1, cursor=cursor('name', ['chicken pickle', 2]))
+    assert [p['id'] for p in page] == [3]
+
+
+@pytest.mark.parametrize('query', [
+    'min_price=nan', 'max_price=nan', 'min_price=inf', 'max_price=-inf', 'min_price=100&max_price=NaN',
+])
+def test_api_products_rejects_non_finite_prices(client, query):
+    response = client.get(f'/api/products?{query}')
+    assert response.status_code == 400
+
+
+def test_api_products_rejects_mistyped_cursor(client):
+    response = client.get(f"/api/products?sort=price_asc&cursor={cursor('price_asc', ['a', 'b'])}")
+    assert response.status_code == 400
@@ -0,0 +1,224 @@
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from botocore.exceptions import ClientError
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class LoginBusy(Exception):
+    """Too many password hashes are already queued; shed the attempt."""
+
+
+# -------------------- Backends --------------------
+
+class DynamoUserBackend:
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, username):
+        return self.table.get_item(Key={'username': username}).get('Item')
+
+    def create(self, username, password_hash):
+        try:
+            self.table.put_item(
+                Item={'username': username, 'password_hash': password_hash, 'created_at': int(time.time())},
+                ConditionExpression='attribute_not_exists(username)'
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def set_hash(self, username, password_hash):
+        self.table.update_item(
+            Key={'username': username},
+            UpdateExpression='SET password_hash = :h',
+            ExpressionAttributeValues={':h': password_hash}
+        )
+
+
+class SQLiteUserBackend:
+    """Local fallback for development and single-host deployments."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS users ('
+            ' username TEXT PRIMARY KEY,'
+            ' password_hash TEXT NOT NULL,'
+            ' created_at INTEGER NOT NULL)'
+        )
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def get(self, username):
+        row = self._connect().execute(
+            'SELECT username, password_hash FROM users WHERE username = ?', (username,)).fetchone()
+        return {'username': row[0], 'password_hash': row[1]} if row else None
+
+    def create(self, username, password_hash):
+        cursor = self._connect().execute(
+            'INSERT OR IGNORE INTO users (username, password_hash, created_at) VALUES (?, ?, ?)',
+            (username, password_hash, int(time.time())))
+        return cursor.rowcount == 1
+
+    def set_hash(self, username, password_hash):
+        self._connect().execute('UPDATE users SET password_hash = ? WHERE username = ?', (password_hash, username))
+
+
+# -------------------- Throttling --------------------
+
+class AttemptThrottle:
+    """Sliding-window attempt counter per key (username or client IP)."""
+
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            return None
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        return attempts
+
+    def blocked(self, key):
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._recent(key, now)
+            return attempts is not None and len(attempts) >= self.limit
+
+    def record(self, key):
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._recent(key, now)
+            if attempts is None:
+                attempts = self._attempts[key] = deque()
+            attempts.append(now)
+            self._attempts.move_to_end(key)
+            while len(self._attempts) > self.max_keys:
+                self._attempts.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+
+# -------------------- User store --------------------
+
+class UserStore:
+    """Hashed credentials with hashing/verification on a bounded thread pool.
+
+    pbkdf2 and scrypt release the GIL, so the pool runs hashes in parallel
+    while request threads only wait. At most `max_pending` hashes may be
+    queued; beyond that login/registration raise LoginBusy instead of
+    piling up CPU work. Successful verifications are remembered for
+    `cache_ttl` seconds under an HMAC with a per-process key, so repeat
+    logins skip the slow hash without keeping passwords in memory.
+    """
+
+    def __init__(self, backend, hash_method='scrypt:32768:8:1', hash_workers=4, max_pending=64,
+                 timeout=10.0, cache_ttl=300, cache_size=10000):
+        self.backend = backend
+        self.hash_method = hash_method
+        self.hash_workers = hash_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._executor = None
+        self._executor_pid = None
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._cache_key = os.urandom(32)
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Thread pools don't survive fork; build one per process on first use
+        with self._lock:
+            if self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.hash_workers, thread_name_prefix='pwhash')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._pending.acquire(blocking=False):
+            raise LoginBusy()
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._pending.release()
+            raise
+        # The slot is held until the hash really finishes, even if we stop waiting
+        future.add_done_callback(lambda _: self._pending.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise LoginBusy()
+
+    def _fingerprint(self, username, password, password_hash):
+        message = '\0'.join((username, password, password_hash)).encode('utf-8')
+        return hmac.new(self._cache_key, message, hashlib.sha256).digest()
+
+    def create(self, username, password):
+        if self.backend.get(username) is not None:
+            return False
+        password_hash = self._run(generate_password_hash, password, self.hash_method)
+        return self.backend.create(username, password_hash)
+
+    def verify(self, username, password):
+        user = self.backend.get(username)
+        if user is None:
+            # Hash anyway so unknown usernames cost the same as wrong passwords
+            self._run(check_password_hash, self._dummy_hash(), password)
+            return False
+        password_hash = user['password_hash']
+
+        fingerprint = self._fingerprint(username, password, password_hash)
+        now = time.monotonic()
+        with self._lock:
+            expires = self._verified.get(fingerprint)
+            if expires is not None and expires > now:
+                self._verified.move_to_end(fingerprint)
+                return True
+
+        if not self._run(check_password_hash, password_hash, password):
+            return False
+
+        with self._lock:
+            self._verified[fingerprint] = now + self.cache_ttl
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+
+        if not password_hash.startswith(self.hash_method + '$'):
+            # Work factor changed since this hash was made: upgrade it now
+            self.backend.set_hash(username, self._run(generate_password_hash, password, self.hash_method))
+        return True
+
+    def _dummy_hash(self):
+        dummy = getattr(self, '_dummy', None)
+        if dummy is None or not dummy.startswith(self.hash_method + '$'):
+            dummy = self._dummy = generate_password_hash(os.urandom(16).hex(), self.hash_method)
+        return dummy